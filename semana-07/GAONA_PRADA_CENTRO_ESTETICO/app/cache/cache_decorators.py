@@ -1,28 +1,134 @@
 # app/cache/cache_decorators.py
 from functools import wraps
-from .redis_config import cache_manager
-import hashlib
+from typing import Any, Callable, List, Optional
+from sqlalchemy.orm import Session
+from .redis_config import cache_manager, last_payload_size
+from .metrics import cache_metrics
+from .single_flight import single_flight as single_flight_group
+from .cache_keys import CacheKeyBuilder, is_injected_parameter
+import inspect
+import math
+import random
+import time
+
+# Marca de las entradas guardadas con metadatos para stale-while-revalidate
+SWR_MARKER = "__swr__"
+
+def _should_refresh_early(entry: dict, soft_ttl: int, beta: float) -> bool:
+    """
+    Expiración temprana probabilística (XFetch): cuanto más cerca del soft TTL y más
+    costoso el recálculo (`delta`), más probable es refrescar antes de que expire.
+    """
+    if beta <= 0:
+        return False
+    expiry = entry["stored_at"] + soft_ttl
+    return time.time() - entry["delta"] * beta * math.log(1.0 - random.random()) >= expiry
+
+def cache_result(ttl_type: str = 'citas_disponibles', key_prefix: str = "", tags: Optional[List[str]] = None,
+                 single_flight: bool = False, distributed_lock: bool = False,
+                 soft_ttl: Optional[int] = None, hard_ttl: Optional[int] = None,
+                 early_refresh_beta: float = 0.0, key_exclude: Optional[List[str]] = None,
+                 session_factory: Optional[Callable[[], Session]] = None):
+    """
+    Decorator para cachear resultados de funciones específicas de tu Clínica Estética.
+    `tags` son plantillas con los parámetros de la función (ej. "tratamiento:{tratamiento_id}")
+    que permiten invalidar la entrada con cache_manager.invalidate_tags.
+    Con `single_flight` solo una corrutina por clave recalcula tras un miss (las demás
+    esperan su resultado); `distributed_lock` extiende esa garantía a varios workers.
+    Con `soft_ttl` la entrada vive `hard_ttl` segundos (por defecto el doble): pasado el
+    soft TTL se sirve el valor obsoleto y se recalcula en segundo plano, y con
+    `early_refresh_beta` > 0 se refresca de forma probabilística antes de expirar (XFetch).
+    El recálculo en segundo plano no puede usar recursos propios del request: los
+    parámetros de tipo Session reciben una sesión nueva de `session_factory` (por defecto
+    SessionLocal) y otros parámetros inyectados (Request, Response...) no se admiten con SWR.
+    La clave se construye con la firma de la función, ignorando parámetros inyectados
+    (Depends, Session, Request) y los indicados en `key_exclude`.
+    """
+    stale_while_revalidate = soft_ttl is not None
+    entry_ttl = (hard_ttl or soft_ttl * 2) if stale_while_revalidate else None
 
-def cache_result(ttl_type: str = 'citas_disponibles', key_prefix: str = ""):
-    """Decorator para cachear resultados de funciones específicas de tu Clínica Estética"""
     def decorator(func):
+        key_builder = CacheKeyBuilder(func, key_prefix, exclude=key_exclude)
+
+        # Parámetros que el recálculo en segundo plano debe volver a inyectar
+        injected = {name: parameter for name, parameter in key_builder.signature.parameters.items()
+                    if is_injected_parameter(parameter)}
+        session_params = [name for name, parameter in injected.items()
+                          if inspect.isclass(parameter.annotation) and issubclass(parameter.annotation, Session)]
+        request_scoped = sorted(set(injected) - set(session_params))
+        if stale_while_revalidate and request_scoped:
+            raise ValueError(f"{func.__name__}: stale-while-revalidate no admite parámetros del request "
+                             f"({', '.join(request_scoped)}) porque el recálculo corre tras cerrar el request")
+
+        def unwrap(entry: Any) -> Any:
+            if isinstance(entry, dict) and SWR_MARKER in entry:
+                return entry["value"]
+            return entry
+
+        def make_load(args, kwargs):
+            # Genera clave única basada en función y parámetros
+            arguments = key_builder.bind(args, kwargs)
+            cache_key = key_builder.build(arguments)
+
+            # Ejecuta la función y guarda el resultado (devuelve la entrada tal como se guardó)
+            async def store(call):
+                started = time.time()
+                result = await call() # Asumiendo que las funciones decoradas son async
+                entry = result
+                if stale_while_revalidate:
+                    entry = {SWR_MARKER: 1, "value": result, "stored_at": time.time(),
+                             "delta": time.time() - started}
+                resolved_tags = [tag.format(**arguments) for tag in tags or []]
+                await cache_manager.aset_cache(cache_key, entry, ttl_type, tags=resolved_tags, ttl=entry_ttl)
+                return entry
+
+            async def load():
+                return await store(lambda: func(*args, **kwargs))
+
+            async def background_load():
+                # El request ya terminó y cerró su sesión: el recálculo abre y cierra la suya
+                factory = session_factory
+                if factory is None:
+                    from ..dependencies import SessionLocal as factory
+                db = factory()
+                try:
+                    call_arguments = {**arguments, **{name: db for name in session_params}}
+                    return await store(lambda: func(**call_arguments))
+                finally:
+                    db.close()
+            return cache_key, load, (background_load if session_params else load)
+
         @wraps(func)
         async def wrapper(*args, **kwargs): # Asegúrate de que el wrapper sea async si la función decorada lo es
-            # Genera clave única basada en función y parámetros
-            func_name = func.__name__
-            # Incluye todos los args y kwargs en la clave de cache para asegurar unicidad
-            args_str = str(args) + str(sorted(kwargs.items()))
-            key_hash = hashlib.md5(args_str.encode()).hexdigest()[:8]
-            cache_key = f"{key_prefix}:{func_name}:{key_hash}"
-
-            # Intenta obtener del cache
-            cached_result = cache_manager.get_cache(cache_key)
-            if cached_result is not None:
-                return cached_result
-
-            # Si no existe, ejecuta función y guarda resultado
-            result = await func(*args, **kwargs) # Asumiendo que las funciones decoradas son async
-            cache_manager.set_cache(cache_key, result, ttl_type)
-            return result
+            cache_key, load, background_load = make_load(args, kwargs)
+
+            # Intenta obtener del cache (hit/miss, latencia y tamaño se acumulan en memoria)
+            lookup_started = time.perf_counter()
+            cached_result = await cache_manager.aget_cache(cache_key, ttl_type)
+            hit = cached_result is not None
+            cache_metrics.record(ttl_type, key_prefix, hit, time.perf_counter() - lookup_started,
+                                 last_payload_size.get() if hit else 0)
+            if hit:
+                if stale_while_revalidate and isinstance(cached_result, dict) and SWR_MARKER in cached_result:
+                    is_stale = time.time() - cached_result["stored_at"] >= soft_ttl
+                    if is_stale or _should_refresh_early(cached_result, soft_ttl, early_refresh_beta):
+                        single_flight_group.refresh_in_background(cache_key, background_load)
+                return unwrap(cached_result)
+
+            if distributed_lock:
+                return unwrap(await single_flight_group.do_distributed(cache_key, load, ttl_type))
+            if single_flight:
+                return unwrap(await single_flight_group.do(cache_key, load))
+            return unwrap(await load())
+
+        async def refresh(*args, **kwargs):
+            """Recalcula y guarda la entrada sin leer el cache (precalentamiento)"""
+            cache_key, load, _ = make_load(args, kwargs)
+            return unwrap(await single_flight_group.do(cache_key, load))
+
+        # El precalentamiento deriva su cadencia del TTL con que vive la entrada
+        wrapper.refresh = refresh
+        wrapper.ttl_type = ttl_type
+        wrapper.soft_ttl = soft_ttl
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
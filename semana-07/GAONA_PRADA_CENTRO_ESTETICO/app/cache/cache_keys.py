@@ -0,0 +1,67 @@
+# app/cache/cache_keys.py
+import hashlib
+import inspect
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Iterable, Optional
+from uuid import UUID
+from fastapi import BackgroundTasks, Request, Response, params
+from sqlalchemy.orm import Session
+
+# Parámetros que inyecta FastAPI: no forman parte de la identidad del resultado
+INJECTED_TYPES = (Session, Request, Response, BackgroundTasks)
+
+def is_injected_parameter(parameter: inspect.Parameter) -> bool:
+    """True si el parámetro lo resuelve la inyección de dependencias (Depends, Session, Request...)"""
+    if isinstance(parameter.default, params.Depends):
+        return True
+    annotation = parameter.annotation
+    return inspect.isclass(annotation) and issubclass(annotation, INJECTED_TYPES)
+
+def canonicalize(value: Any) -> Any:
+    """Convierte un argumento en una estructura JSON estable (sin direcciones de memoria)"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return canonicalize(value.value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((canonicalize(v) for v in value), key=repr)
+    if hasattr(value, "model_dump"):  # Modelos Pydantic
+        return canonicalize(value.model_dump())
+    return f"{type(value).__qualname__}:{value}"
+
+class CacheKeyBuilder:
+    """Construye claves de cache estables a partir de la firma de la función decorada"""
+
+    def __init__(self, func, key_prefix: str = "", exclude: Optional[Iterable[str]] = None):
+        self.func_name = func.__name__
+        self.key_prefix = key_prefix
+        self.signature = inspect.signature(func)
+        excluded = set(exclude or ())
+        self.skipped = {
+            name for name, parameter in self.signature.parameters.items()
+            if name in excluded or is_injected_parameter(parameter)
+        }
+
+    def bind(self, args: tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Argumentos ligados a la firma, con valores por defecto aplicados"""
+        bound = self.signature.bind_partial(*args, **kwargs)
+        bound.apply_defaults()
+        return bound.arguments
+
+    def build(self, arguments: Dict[str, Any]) -> str:
+        key_args = {name: canonicalize(value) for name, value in arguments.items() if name not in self.skipped}
+        payload = json.dumps(key_args, sort_keys=True, separators=(',', ':'))
+        # blake2b de 128 bits: rápido y sin colisiones prácticas (antes md5 truncado a 8 hex)
+        key_hash = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+        return f"{self.key_prefix}:{self.func_name}:{key_hash}"
@@ -1,27 +1,216 @@
 # app/cache/domain_strategies.py
-from .redis_config import cache_manager
+from .redis_config import DomainCacheConfig, cache_manager
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import os
+import random
+import uuid
+
+@dataclass
+class WarmupJob:
+    """
+    Entradas a precalentar de un endpoint decorado con cache_result. `targets` devuelve
+    los kwargs de cada entrada (None = una sola entrada sin parámetros).
+    """
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    targets: Optional[Callable[[], Awaitable[List[Dict[str, Any]]]]] = None
+
+class CacheWarmupScheduler:
+    """
+    Precalentamiento del cache: al arrancar recalcula todas las entradas registradas y
+    después repite cada trabajo antes de que caduquen, cada `refresh_ratio` del TTL de su
+    ttl_type (o del soft TTL si usa stale-while-revalidate), con jitter para que los workers
+    no coincidan. Un lease en Redis por trabajo y ciclo evita que varios workers repitan el
+    mismo precalentamiento, y un semáforo limita las consultas simultáneas a la BD.
+    """
+
+    def __init__(self, manager: DomainCacheConfig, session_factory: Optional[Callable[[], Any]] = None,
+                 concurrency: Optional[int] = None, jitter: Optional[float] = None,
+                 refresh_ratio: Optional[float] = None):
+        self.manager = manager
+        self.session_factory = session_factory
+        self.concurrency = concurrency or int(os.getenv('CACHE_WARMUP_CONCURRENCY', 4))
+        self.jitter = jitter if jitter is not None else float(os.getenv('CACHE_WARMUP_JITTER', 0.1))
+        self.refresh_ratio = refresh_ratio or float(os.getenv('CACHE_WARMUP_REFRESH_RATIO', 0.8))
+        self.jobs: Dict[str, WarmupJob] = {}
+        self._token = uuid.uuid4().hex
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {'runs': 0, 'entries_warmed': 0, 'errors': 0, 'skipped_leases': 0}
+
+    def add_job(self, job: WarmupJob):
+        self.jobs[job.name] = job
+
+    def interval(self, job: WarmupJob) -> float:
+        """Segundos entre precalentamientos: una fracción de la vida útil de la entrada"""
+        lifetime = job.func.soft_ttl or self.manager.cache_ttl.get(job.func.ttl_type, 300)
+        return max(1.0, lifetime * self.refresh_ratio)
+
+    def _next_delay(self, job: WarmupJob) -> float:
+        return self.interval(job) * (1 + random.uniform(-self.jitter, self.jitter))
+
+    # --- Ejecución ---
+
+    async def _claim(self, job: WarmupJob) -> bool:
+        """Lease SET NX por ciclo; si Redis no responde se precalienta igualmente"""
+        lease_key = self.manager.get_cache_key("warmup", job.name)
+        lease_ttl = max(1, int(self.interval(job) * 0.9))
+        try:
+            client = self.manager.async_redis_client
+            if client is None:
+                return bool(await asyncio.to_thread(self.manager.redis_client.set, lease_key, self._token,
+                                                    nx=True, ex=lease_ttl))
+            return bool(await client.set(lease_key, self._token, nx=True, ex=lease_ttl))
+        except Exception as e:
+            print(f"Error obteniendo lease de precalentamiento '{job.name}': {e}")
+            return True
+
+    async def _refresh_entry(self, job: WarmupJob, kwargs: Dict[str, Any]) -> bool:
+        async with self._semaphore:
+            db = self.session_factory() if self.session_factory is not None else None
+            try:
+                if db is not None:
+                    kwargs = {**kwargs, 'db': db}
+                await job.func.refresh(**kwargs)
+                return True
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Error precalentando '{job.name}' {kwargs}: {e}")
+                return False
+            finally:
+                if db is not None:
+                    db.close()
+
+    async def warm(self, job: WarmupJob, claim: bool = True) -> int:
+        """Recalcula todas las entradas del trabajo; devuelve cuántas se guardaron"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if claim and not await self._claim(job):
+            self.stats['skipped_leases'] += 1
+            return 0
+        try:
+            targets = await job.targets() if job.targets is not None else [{}]
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Error obteniendo entradas de precalentamiento '{job.name}': {e}")
+            return 0
+        results = await asyncio.gather(*[self._refresh_entry(job, kwargs) for kwargs in targets])
+        warmed = sum(results)
+        self.stats['runs'] += 1
+        self.stats['entries_warmed'] += warmed
+        return warmed
+
+    async def warm_all(self, claim: bool = True) -> Dict[str, int]:
+        names = list(self.jobs)
+        results = await asyncio.gather(*[self.warm(self.jobs[name], claim) for name in names])
+        return dict(zip(names, results))
+
+    async def _job_loop(self, job: WarmupJob):
+        while True:
+            await asyncio.sleep(self._next_delay(job))
+            try:
+                await self.warm(job)
+            except Exception as e:
+                print(f"Error en el precalentamiento '{job.name}': {e}")
+
+    # --- Ciclo de vida ---
+
+    async def start(self, startup_timeout: Optional[float] = None):
+        """
+        Programa los ciclos de precalentamiento. La primera pasada corre en segundo plano;
+        con `startup_timeout` > 0 (o CACHE_WARMUP_STARTUP_TIMEOUT) se espera antes de
+        aceptar tráfico, como máximo ese número de segundos
+        """
+        if self._tasks:
+            return
+        if startup_timeout is None:
+            startup_timeout = float(os.getenv('CACHE_WARMUP_STARTUP_TIMEOUT', 0))
+        if startup_timeout > 0:
+            try:
+                await asyncio.wait_for(self.warm_all(), startup_timeout)
+            except asyncio.TimeoutError:
+                print("Error precalentando el cache al arrancar: se superó el tiempo máximo")
+        else:
+            self._tasks.append(asyncio.create_task(self.warm_all(), name="cache-warmup:startup"))
+        self._tasks += [asyncio.create_task(self._job_loop(job), name=f"cache-warmup:{job.name}")
+                        for job in self.jobs.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+def availability_targets(esteticista_ids: Callable[[], Awaitable[List[int]]], days: int = 7):
+    """Entradas de disponibilidad de los próximos `days` días para cada esteticista"""
+    async def targets() -> List[Dict[str, Any]]:
+        today = date.today()
+        fechas = [(today + timedelta(days=offset)).isoformat() for offset in range(days)]
+        return [{'fecha': fecha, 'esteticista_id': esteticista_id}
+                for esteticista_id in await esteticista_ids() for fecha in fechas]
+    return targets
+
+async def get_active_esteticista_ids() -> List[int]:
+    """
+    IDs de esteticistas (CACHE_WARMUP_ESTETICISTAS="1,2,3" o consulta a la BD). Sin la
+    tabla beauty_esteticistas (ej. la base SQLite por defecto) no hay nada que precalentar
+    """
+    configured = os.getenv('CACHE_WARMUP_ESTETICISTAS')
+    if configured:
+        return [int(value) for value in configured.split(',') if value.strip()]
+
+    from sqlalchemy import inspect, text
+    from ..dependencies import SessionLocal
+
+    def query() -> List[int]:
+        db = SessionLocal()
+        try:
+            if not inspect(db.get_bind()).has_table("beauty_esteticistas"):
+                return []
+            return [row.id for row in db.execute(text("SELECT id FROM beauty_esteticistas ORDER BY id"))]
+        finally:
+            db.close()
+    return await asyncio.to_thread(query)
+
+def build_warmup_scheduler(manager: DomainCacheConfig = cache_manager) -> CacheWarmupScheduler:
+    """Scheduler con los datos que deben estar calientes desde el primer request"""
+    from ..dependencies import SessionLocal
+    from ..routers.beauty_optimized import (get_catalogo_tratamientos, get_citas_disponibles,
+                                            get_configuracion_clinica)
+
+    scheduler = CacheWarmupScheduler(manager, session_factory=SessionLocal)
+    scheduler.add_job(WarmupJob('catalogo_tratamientos', get_catalogo_tratamientos))
+    scheduler.add_job(WarmupJob('configuracion_clinica', get_configuracion_clinica))
+    scheduler.add_job(WarmupJob(
+        'citas_disponibles', get_citas_disponibles,
+        availability_targets(get_active_esteticista_ids, days=int(os.getenv('CACHE_WARMUP_DAYS', 7)))
+    ))
+    return scheduler
 
 class DomainSpecificCaching:
 
+    scheduler: Optional[CacheWarmupScheduler] = None
+
+    @staticmethod
+    def get_scheduler() -> CacheWarmupScheduler:
+        if DomainSpecificCaching.scheduler is None:
+            DomainSpecificCaching.scheduler = build_warmup_scheduler()
+        return DomainSpecificCaching.scheduler
+
     @staticmethod
     async def cache_available_appointments():
-        """Cachea la disponibilidad de citas, crítico para la Clínica Estética."""
-        # Lógica para obtener citas disponibles (ej. para la próxima semana)
-        # y almacenarlas en cache con un TTL corto.
-        # from app.services.citas_service import get_all_future_citas_availability
-        # citas_data = await get_all_future_citas_availability()
-        # cache_manager.set_cache("citas:disponibilidad_general", citas_data, 'citas_disponibles')
-        print("Estrategia: Cacheando disponibilidad general de citas.")
-        pass
+        """Cachea la disponibilidad de citas de los próximos días, crítico para la Clínica Estética."""
+        scheduler = DomainSpecificCaching.get_scheduler()
+        return await scheduler.warm(scheduler.jobs['citas_disponibles'], claim=False)
 
     @staticmethod
     async def cache_treatment_catalog():
         """Cachea el catálogo de tratamientos, datos estables."""
-        # from app.services.tratamientos_service import get_all_tratamientos_details
-        # catalogo_data = await get_all_tratamientos_details()
-        # cache_manager.set_cache("catalogo:general", catalogo_data, 'catalogo_servicios')
-        print("Estrategia: Cacheando catálogo de tratamientos.")
-        pass
+        scheduler = DomainSpecificCaching.get_scheduler()
+        return await scheduler.warm(scheduler.jobs['catalogo_tratamientos'], claim=False)
 
     @staticmethod
     async def cache_client_treatment_history(client_id: int):
@@ -35,19 +224,14 @@ class DomainSpecificCaching:
     @staticmethod
     async def implement_domain_cache():
         """
-        Implementa caching específico para el dominio de Clínica Estética,
-        focalizándose en Citas y procedimientos.
+        Implementa caching específico para el dominio de Clínica Estética: precalienta
+        catálogo, configuración y disponibilidad al arrancar y los mantiene calientes.
         """
         print("Implementando estrategias de caching para Clínica Estética...")
-        # Caching para datos de alta frecuencia y vitales: disponibilidad de citas
-        await DomainSpecificCaching.cache_available_appointments()
-        
-        # Caching para datos estables pero consultados: catálogo de tratamientos
-        await DomainSpecificCaching.cache_treatment_catalog()
-
-        # Otros cachés según las consultas lentas identificadas:
-        # Cache para reportes precalculados o complejos (ej. ocupación)
-        # cache_manager.set_cache("reporte:ocupacion_semanal", await get_ocupacion_semanal(), 'stable_data')
-        
-        # Puedes añadir más lógicas aquí según tus necesidades específicas.
-        print("Estrategias de caching iniciales aplicadas para Clínica Estética.")
\ No newline at end of file
+        await DomainSpecificCaching.get_scheduler().start()
+        print("Estrategias de caching iniciales aplicadas para Clínica Estética.")
+
+    @staticmethod
+    async def stop_domain_cache():
+        if DomainSpecificCaching.scheduler is not None:
+            await DomainSpecificCaching.scheduler.stop()
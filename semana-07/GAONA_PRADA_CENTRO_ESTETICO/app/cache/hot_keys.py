@@ -0,0 +1,145 @@
+# app/cache/hot_keys.py
+from array import array
+from typing import Dict, NamedTuple, Optional, Tuple
+import os
+
+class CountMinSketch:
+    """
+    Sketch count-min con envejecimiento: estima cuántas veces se accedió a cada clave en
+    memoria constante (`width` x `depth` contadores de 16 bits). Cada `sample_size`
+    incrementos todos los contadores se dividen a la mitad, de modo que la frecuencia
+    refleja la tasa de acceso reciente y no el histórico completo.
+    Los conteos son aproximados (solo sobreestiman); no usa locks.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4, sample_size: Optional[int] = None):
+        # Ancho potencia de dos para indexar con una máscara
+        self.width = 1 << max(1, (width - 1).bit_length())
+        self.depth = depth
+        self.sample_size = sample_size or self.width * 10
+        self._mask = self.width - 1
+        self._counters = array('H', bytes(2 * self.width * depth))
+        self._additions = 0
+        self.resets = 0
+
+    def _indexes(self, key: str):
+        # Doble hashing: depth índices a partir de un único hash de la clave
+        h = hash(key)
+        h1, h2 = h & 0xFFFFFFFF, ((h >> 32) & 0xFFFFFFFF) | 1
+        width, mask = self.width, self._mask
+        return [row * width + ((h1 + row * h2) & mask) for row in range(self.depth)]
+
+    def increment(self, key: str) -> int:
+        """Suma un acceso (actualización conservadora) y devuelve la frecuencia estimada"""
+        counters = self._counters
+        indexes = self._indexes(key)
+        estimate = min(counters[i] for i in indexes)
+        if estimate < 0xFFFF:
+            estimate += 1
+            for i in indexes:
+                if counters[i] < estimate:
+                    counters[i] = estimate
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        counters = self._counters
+        return min(counters[i] for i in self._indexes(key))
+
+    def _age(self):
+        counters = self._counters
+        for i in range(len(counters)):
+            counters[i] >>= 1
+        self._additions //= 2
+        self.resets += 1
+
+class Admission(NamedTuple):
+    """Decisión para una clave: TTL en Redis, TTL en L1 (0 = no entra) y temperatura"""
+    ttl: int
+    l1_ttl: int
+    temperature: str
+
+class HotKeyTracker:
+    """
+    Detección de claves calientes para DomainCacheConfig. Con la frecuencia reciente de
+    cada clave decide:
+    - TTL en Redis: el máximo de su ttl_type para claves calientes, el mínimo para las
+      frías y el TTL base para el resto (y para claves sin lecturas previas, ej. la que
+      se acaba de recalcular tras un miss o las precalentadas). Una clave es fría con
+      menos de `cold_threshold` lecturas previas (sin contar la actual); con el valor por
+      defecto (1) la segunda lectura ya cuenta como reutilización y no se penaliza
+    - L1: las claves frías no ocupan el L1 y las calientes de tipos volátiles entran con
+      un TTL corto (`hot_l1_ttl`) para absorber los picos sin servir datos muy obsoletos
+    Las decisiones se cuentan por (ttl_type, decisión) en `decisions`.
+    """
+
+    def __init__(self, ttl_bounds: Dict[str, Tuple[int, int]], hot_threshold: Optional[int] = None,
+                 cold_threshold: Optional[int] = None, hot_l1_ttl: Optional[int] = None,
+                 sketch: Optional[CountMinSketch] = None):
+        self.ttl_bounds = ttl_bounds
+        self.hot_threshold = hot_threshold or int(os.getenv('CACHE_HOT_KEY_THRESHOLD', 16))
+        self.cold_threshold = cold_threshold if cold_threshold is not None else int(os.getenv('CACHE_COLD_KEY_THRESHOLD', 1))
+        self.hot_l1_ttl = hot_l1_ttl if hot_l1_ttl is not None else int(os.getenv('CACHE_HOT_L1_TTL', 2))
+        self.sketch = sketch or CountMinSketch(width=int(os.getenv('CACHE_SKETCH_WIDTH', 4096)))
+        self.decisions: Dict[Tuple[str, str], int] = {}
+
+    def record(self, cache_key: str) -> int:
+        return self.sketch.increment(cache_key)
+
+    def _previous_reads(self, cache_key: str) -> int:
+        # Las decisiones se toman justo después de la lectura que las provoca (el miss
+        # antes del set o el hit de Redis): esa lectura no cuenta para la temperatura
+        return max(0, self.sketch.estimate(cache_key) - 1)
+
+    def temperature(self, frequency: int) -> str:
+        if frequency == 0:
+            return 'unseen'
+        if frequency >= self.hot_threshold:
+            return 'hot'
+        if frequency < self.cold_threshold:
+            return 'cold'
+        return 'warm'
+
+    def _count(self, ttl_type: str, decision: str):
+        key = (ttl_type, decision)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def decide_ttl(self, cache_key: str, ttl_type: str, base_ttl: int) -> Admission:
+        """TTL en Redis y en L1 al guardar una entrada"""
+        temperature = self.temperature(self._previous_reads(cache_key))
+        lower, upper = self.ttl_bounds.get(ttl_type, (base_ttl, base_ttl))
+        if temperature == 'hot':
+            ttl = max(base_ttl, upper)
+            self._count(ttl_type, 'ttl_extended')
+        elif temperature == 'cold':
+            ttl = min(base_ttl, lower)
+            self._count(ttl_type, 'ttl_shortened')
+        else:
+            ttl = base_ttl
+            self._count(ttl_type, 'ttl_base')
+        return Admission(ttl, 0, temperature)
+
+    def decide_l1(self, cache_key: str, ttl_type: str, ttl: int, l1_type: bool,
+                  temperature: Optional[str] = None) -> int:
+        """TTL con que la entrada entra en el L1 (0 si no se admite)"""
+        if temperature is None:
+            temperature = self.temperature(self._previous_reads(cache_key))
+        if l1_type:
+            if temperature == 'cold':
+                self._count(ttl_type, 'l1_rejected')
+                return 0
+            self._count(ttl_type, 'l1_admitted')
+            return ttl
+        if temperature == 'hot' and self.hot_l1_ttl > 0:
+            self._count(ttl_type, 'l1_promoted')
+            return min(ttl, self.hot_l1_ttl)
+        return 0
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Decisiones de admisión agrupadas por ttl_type"""
+        stats: Dict[str, Dict[str, int]] = {}
+        for (ttl_type, decision), count in sorted(self.decisions.items()):
+            stats.setdefault(ttl_type, {})[decision] = count
+        return stats
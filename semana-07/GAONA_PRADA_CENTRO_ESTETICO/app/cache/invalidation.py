@@ -1,4 +1,5 @@
 # app/cache/invalidation.py
+from typing import Optional
 from .redis_config import cache_manager
 
 class DomainCacheInvalidation:
@@ -6,26 +7,24 @@ class DomainCacheInvalidation:
     @staticmethod
     async def on_tratamiento_update(tratamiento_id: str):
         """Invalida cache cuando se actualiza un tratamiento de la Clínica Estética"""
-        # Invalida detalles del tratamiento específico
-        cache_manager.invalidate_cache(f"data:tratamientos_:{tratamiento_id}*")
-        # Invalida el catálogo completo, ya que puede haber cambiado
-        cache_manager.invalidate_cache(f"data:catalogo_:general*") # O el patrón específico de tu catálogo
+        # Invalida detalles del tratamiento específico y el catálogo completo, ya que puede haber cambiado
+        await cache_manager.ainvalidate_tags(f"tratamiento:{tratamiento_id}", "catalogo")
         print(f"Invalidando cache de tratamiento {tratamiento_id} y catálogo.")
 
     @staticmethod
     async def on_cita_change(cita_id: str, client_id: Optional[str] = None):
         """Invalida cache cuando se crea, actualiza o cancela una cita."""
-        # Invalida la disponibilidad general de citas
-        cache_manager.invalidate_cache(f"data:citas_:disponibilidad_general*") # O un patrón más específico de fechas
-        # Si la cita afecta a un cliente, invalida su historial
+        # Invalida la disponibilidad de citas y, si la cita afecta a un cliente, su historial
+        tags = ["citas"]
         if client_id:
-            cache_manager.invalidate_cache(f"data:cliente:{client_id}:historial*")
+            tags.append(f"cliente:{client_id}:historial")
+        await cache_manager.ainvalidate_tags(*tags)
         print(f"Invalidando cache de citas para {cita_id} y, opcionalmente, historial de cliente {client_id}.")
 
     @staticmethod
     async def on_clinica_config_change():
         """Invalida cache de configuración general de la Clínica Estética"""
-        cache_manager.invalidate_cache(f"data:clinica_:configuracion_clinica*")
+        await cache_manager.ainvalidate_tags("configuracion_clinica")
         print("Invalidando cache de configuración de la clínica.")
 
 # Ejemplo de uso en endpoints de actualización (asumiendo que los routers importan estos)
@@ -1,31 +1,284 @@
 # app/cache/metrics.py
 from .redis_config import cache_manager
+from .single_flight import single_flight
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily
+from typing import Dict, Optional, Tuple
+import asyncio
+import os
+import threading
 import time
 
+METRICS_PREFIX = "beauty_metrics"
+BUCKET_SECONDS = 300      # buckets de 5 minutos en Redis
+RETENTION_SECONDS = 3600  # se conservan 12 buckets (1 hora)
+
+# Posiciones de los contadores locales de cada namespace
+HITS, MISSES, LATENCY, BYTES = range(4)
+
+class AdmissionCollector:
+    """Exporta las decisiones del TTL adaptativo / admisión en L1 al hacer scrape"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def _family(self):
+        return CounterMetricFamily('beauty_cache_admission_decisions', 'Decisiones de TTL adaptativo y admisión en L1',
+                                   labels=['ttl_type', 'decision'])
+
+    def describe(self):
+        return [self._family()]
+
+    def collect(self):
+        family = self._family()
+        for ttl_type, decisions in self.manager.get_admission_stats().items():
+            for decision, count in decisions.items():
+                family.add_metric([ttl_type, decision], count)
+        yield family
+
 class CacheMetrics:
+    """
+    Métricas del cache por namespace (ttl_type, key_prefix) acumuladas en memoria del
+    proceso: registrar un acceso no hace E/S. Los deltas se envían a Redis en un único
+    pipeline cada `flush_interval` segundos (agregado entre workers) y además se exportan
+    como métricas Prometheus.
+    """
 
-    @staticmethod
-    def track_cache_hit(key: str):
+    def __init__(self, manager, flush_interval: Optional[float] = None, registry=REGISTRY):
+        self.manager = manager
+        self.flush_interval = flush_interval or float(os.getenv('CACHE_METRICS_FLUSH_INTERVAL', 5))
+        self._lock = threading.Lock()
+        # namespace -> [hits, misses, latencia acumulada (s), bytes servidos]
+        self._totals: Dict[Tuple[str, str], list] = {}
+        self._pending: Dict[Tuple[str, str], list] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flush_stats = {'flushes': 0, 'flush_errors': 0}
+
+        self.requests = Counter('beauty_cache_requests_total', 'Accesos al cache por namespace y resultado',
+                                ['ttl_type', 'key_prefix', 'result'], registry=registry)
+        self.latency = Histogram('beauty_cache_latency_seconds', 'Latencia de lectura del cache por namespace',
+                                 ['ttl_type', 'key_prefix'], registry=registry,
+                                 buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1])
+        self.payload_bytes = Counter('beauty_cache_payload_bytes_total', 'Bytes servidos desde el cache por namespace',
+                                     ['ttl_type', 'key_prefix'], registry=registry)
+        # Hijos de Prometheus ya enlazados por namespace (evita .labels() en cada acceso)
+        self._children: Dict[Tuple[str, str], tuple] = {}
+        registry.register(AdmissionCollector(manager))
+
+    # --- Registro (sin E/S) ---
+
+    def _namespace_children(self, namespace: Tuple[str, str]) -> tuple:
+        children = self._children.get(namespace)
+        if children is None:
+            ttl_type, key_prefix = namespace
+            children = self._children.setdefault(namespace, (
+                self.requests.labels(ttl_type=ttl_type, key_prefix=key_prefix, result='hit'),
+                self.requests.labels(ttl_type=ttl_type, key_prefix=key_prefix, result='miss'),
+                self.latency.labels(ttl_type=ttl_type, key_prefix=key_prefix),
+                self.payload_bytes.labels(ttl_type=ttl_type, key_prefix=key_prefix)
+            ))
+        return children
+
+    def record(self, ttl_type: str, key_prefix: str, hit: bool, latency: float = 0.0, size: int = 0):
+        """Acumula un acceso al cache del namespace"""
+        namespace = (ttl_type or 'unknown', key_prefix or '')
+        with self._lock:
+            for counters in (self._pending, self._totals):
+                values = counters.get(namespace)
+                if values is None:
+                    values = counters[namespace] = [0, 0, 0.0, 0]
+                values[HITS if hit else MISSES] += 1
+                values[LATENCY] += latency
+                values[BYTES] += size
+
+        hit_child, miss_child, latency_child, bytes_child = self._namespace_children(namespace)
+        (hit_child if hit else miss_child).inc()
+        latency_child.observe(latency)
+        if size:
+            bytes_child.inc(size)
+
+    def track_cache_hit(self, key: str, ttl_type: str = None, key_prefix: str = "", latency: float = 0.0, size: int = 0):
         """Registra un hit de cache para Clínica Estética"""
-        metric_key = f"beauty_metrics:cache_hits:{int(time.time() // 300)}"  # 5 min buckets
-        cache_manager.redis_client.incr(metric_key)
-        cache_manager.redis_client.expire(metric_key, 3600)  # Expira en 1 hora
+        self.record(ttl_type, key_prefix, True, latency, size)
 
-    @staticmethod
-    def track_cache_miss(key: str):
+    def track_cache_miss(self, key: str, ttl_type: str = None, key_prefix: str = "", latency: float = 0.0):
         """Registra un miss de cache para Clínica Estética"""
-        metric_key = f"beauty_metrics:cache_misses:{int(time.time() // 300)}"
-        cache_manager.redis_client.incr(metric_key)
-        cache_manager.redis_client.expire(metric_key, 3600)
+        self.record(ttl_type, key_prefix, False, latency)
+
+    async def atrack_cache_hit(self, key: str, **kwargs):
+        """Versión asyncio de track_cache_hit (no hace E/S)"""
+        self.track_cache_hit(key, **kwargs)
+
+    async def atrack_cache_miss(self, key: str, **kwargs):
+        """Versión asyncio de track_cache_miss (no hace E/S)"""
+        self.track_cache_miss(key, **kwargs)
+
+    # --- Envío a Redis ---
 
     @staticmethod
-    def get_cache_stats():
-        """Obtiene estadísticas de cache de Redis relevantes para Clínica Estética"""
-        info = cache_manager.redis_client.info()
+    def _bucket_key(namespace: Tuple[str, str], bucket: int) -> str:
+        ttl_type, key_prefix = namespace
+        return f"{METRICS_PREFIX}:ns:{ttl_type}:{key_prefix}:{bucket}"
+
+    def _take_pending(self) -> Dict[Tuple[str, str], list]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore_pending(self, pending: Dict[Tuple[str, str], list]):
+        """Devuelve los deltas no enviados para el próximo intento"""
+        with self._lock:
+            for namespace, values in pending.items():
+                current = self._pending.setdefault(namespace, [0, 0, 0.0, 0])
+                for index, value in enumerate(values):
+                    current[index] += value
+
+    def _queue_flush(self, pipe, pending: Dict[Tuple[str, str], list]):
+        bucket = int(time.time() // BUCKET_SECONDS)
+        namespaces_key = f"{METRICS_PREFIX}:namespaces"
+        for namespace, (hits, misses, latency, size) in pending.items():
+            key = self._bucket_key(namespace, bucket)
+            pipe.hincrby(key, 'hits', hits)
+            pipe.hincrby(key, 'misses', misses)
+            pipe.hincrby(key, 'latency_us', int(latency * 1_000_000))
+            pipe.hincrby(key, 'bytes', size)
+            pipe.expire(key, RETENTION_SECONDS)
+            pipe.sadd(namespaces_key, f"{namespace[0]}:{namespace[1]}")
+        pipe.expire(namespaces_key, RETENTION_SECONDS)
+
+    def flush(self) -> int:
+        """Envía los deltas acumulados en un único pipeline; devuelve los namespaces enviados"""
+        pending = self._take_pending()
+        if not pending:
+            return 0
+        try:
+            pipe = self.manager.redis_client.pipeline(transaction=False)
+            self._queue_flush(pipe, pending)
+            pipe.execute()
+            self.flush_stats['flushes'] += 1
+            return len(pending)
+        except Exception as e:
+            self._restore_pending(pending)
+            self.flush_stats['flush_errors'] += 1
+            print(f"Error enviando métricas de cache: {e}")
+            return 0
+
+    async def aflush(self) -> int:
+        """Versión asyncio de flush"""
+        client = self.manager.async_redis_client
+        if client is None:
+            return await asyncio.to_thread(self.flush)
+        pending = self._take_pending()
+        if not pending:
+            return 0
+        try:
+            pipe = client.pipeline(transaction=False)
+            self._queue_flush(pipe, pending)
+            await pipe.execute()
+            self.flush_stats['flushes'] += 1
+            return len(pending)
+        except Exception as e:
+            self._restore_pending(pending)
+            self.flush_stats['flush_errors'] += 1
+            print(f"Error enviando métricas de cache: {e}")
+            return 0
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.aflush()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop(), name="cache-metrics-flush")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.aflush()
+
+    # --- Estadísticas ---
+
+    @staticmethod
+    def _summarize(hits: int, misses: int, latency: float, size: int) -> dict:
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else 0.0,
+            'avg_latency_ms': round(latency / total * 1000, 3) if total else 0.0,
+            'avg_payload_bytes': size // hits if hits else 0
+        }
+
+    def get_namespace_stats(self) -> Dict[str, dict]:
+        """Hit ratio, latencia y tamaño medio por namespace en este proceso"""
+        with self._lock:
+            totals = {namespace: list(values) for namespace, values in self._totals.items()}
+        return {f"{ttl_type}:{key_prefix}": self._summarize(*values)
+                for (ttl_type, key_prefix), values in totals.items()}
+
+    @staticmethod
+    def _global_keys(namespaces) -> Dict[str, list]:
+        current = int(time.time() // BUCKET_SECONDS)
+        buckets = range(current - RETENTION_SECONDS // BUCKET_SECONDS + 1, current + 1)
+        keys = {}
+        for namespace in namespaces:
+            name = namespace.decode() if isinstance(namespace, bytes) else namespace
+            keys[name] = [f"{METRICS_PREFIX}:ns:{name}:{bucket}" for bucket in buckets]
+        return keys
+
+    def _summarize_global(self, keys: Dict[str, list], hashes: list) -> Dict[str, dict]:
+        """Suma los buckets de la última hora de cada namespace (todos los workers)"""
+        stats, position = {}, 0
+        for name, bucket_keys in keys.items():
+            totals = {'hits': 0, 'misses': 0, 'latency_us': 0, 'bytes': 0}
+            for values in hashes[position:position + len(bucket_keys)]:
+                for field, value in (values or {}).items():
+                    field = field.decode() if isinstance(field, bytes) else field
+                    if field in totals:
+                        totals[field] += int(value)
+            position += len(bucket_keys)
+            stats[name] = self._summarize(totals['hits'], totals['misses'], totals['latency_us'] / 1_000_000, totals['bytes'])
+        return stats
+
+    def _build_stats(self, info: dict, global_namespaces: Dict[str, dict]):
         return {
             'connected_clients': info.get('connected_clients', 0),
             'used_memory': info.get('used_memory_human', '0B'),
             'keyspace_hits': info.get('keyspace_hits', 0),
             'keyspace_misses': info.get('keyspace_misses', 0),
-            'hit_rate_percentage': (info.get('keyspace_hits', 0) / (info.get('keyspace_hits', 0) + info.get('keyspace_misses', 1))) * 100 if (info.get('keyspace_hits', 0) + info.get('keyspace_misses', 1)) > 0 else 0
-        }
\ No newline at end of file
+            'hit_rate_percentage': (info.get('keyspace_hits', 0) / (info.get('keyspace_hits', 0) + info.get('keyspace_misses', 1))) * 100 if (info.get('keyspace_hits', 0) + info.get('keyspace_misses', 1)) > 0 else 0,
+            'namespaces': self.get_namespace_stats(),
+            'namespaces_global': global_namespaces,
+            'tiers': self.manager.get_tier_stats(),
+            'admission': self.manager.get_admission_stats(),
+            'single_flight': dict(single_flight.stats),
+            'codec': self.manager.codec.describe(),
+            'flush': dict(self.flush_stats)
+        }
+
+    def get_cache_stats(self):
+        """Obtiene estadísticas de cache de Redis relevantes para Clínica Estética"""
+        client = self.manager.redis_client
+        keys = self._global_keys(client.smembers(f"{METRICS_PREFIX}:namespaces"))
+        pipe = client.pipeline(transaction=False)
+        for bucket_keys in keys.values():
+            for key in bucket_keys:
+                pipe.hgetall(key)
+        return self._build_stats(client.info(), self._summarize_global(keys, pipe.execute()))
+
+    async def aget_cache_stats(self):
+        """Versión asyncio de get_cache_stats"""
+        client = self.manager.async_redis_client
+        if client is None:
+            return await asyncio.to_thread(self.get_cache_stats)
+        keys = self._global_keys(await client.smembers(f"{METRICS_PREFIX}:namespaces"))
+        pipe = client.pipeline(transaction=False)
+        for bucket_keys in keys.values():
+            for key in bucket_keys:
+                pipe.hgetall(key)
+        return self._build_stats(await client.info(), self._summarize_global(keys, await pipe.execute()))
+
+cache_metrics = CacheMetrics(cache_manager)
@@ -1,18 +1,152 @@
 # app/cache/redis_config.py
+import asyncio
 import redis
-import json
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable, List
+from collections import OrderedDict
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+import threading
+import time
 import os
+from .serializers import CacheCodec
+from .hot_keys import HotKeyTracker
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis-py < 4.2: se usa el cliente síncrono en un hilo
+    redis_asyncio = None
+
+# Tamaño en bytes del último valor leído o escrito por la tarea actual (para métricas por namespace)
+last_payload_size: ContextVar[int] = ContextVar("cache_last_payload_size", default=0)
+
+class LocalLRUCache:
+    """Cache L1 en memoria del proceso, acotado por número de entradas y bytes, con desalojo LRU"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        # clave -> (expira_en, tamaño_en_bytes, valor)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Devuelve el valor si existe y no ha expirado (None en caso contrario)"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """(valor, tamaño_en_bytes) si existe y no ha expirado"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value, size
+
+    def set(self, key: str, value: Any, ttl: int, size: int) -> bool:
+        """Guarda un valor; los valores más grandes que el límite de bytes no se admiten"""
+        if ttl <= 0 or size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self.current_bytes += size
+            # Desaloja las entradas menos usadas hasta respetar ambos límites
+            while len(self._data) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._data))
+                self._remove(oldest_key)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def delete_matching(self, pattern: str):
+        """Elimina las claves que coinciden con un patrón estilo Redis (glob)"""
+        with self._lock:
+            for key in [k for k in self._data if fnmatchcase(k, pattern)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self.current_bytes -= size
+
+# Invalida atómicamente todas las entradas registradas bajo las etiquetas (KEYS) y
+# devuelve las claves borradas para poder limpiar también el L1 del proceso. Los miembros
+# con expiración <= ARGV[1] (ahora) ya no existen en Redis y no se devuelven
+INVALIDATE_TAGS_SCRIPT = """
+local deleted = {}
+for _, tag_key in ipairs(KEYS) do
+    local members = redis.call('ZRANGEBYSCORE', tag_key, '(' .. ARGV[1], '+inf')
+    for i = 1, #members, 500 do
+        redis.call('DEL', unpack(members, i, math.min(i + 499, #members)))
+    end
+    for _, member in ipairs(members) do
+        table.insert(deleted, member)
+    end
+    redis.call('DEL', tag_key)
+end
+return deleted
+"""
+
+# Pools de conexiones compartidos por proceso (cache, métricas y middlewares). Son pools
+# bloqueantes: con el pool agotado se espera hasta REDIS_POOL_TIMEOUT en lugar de fallar.
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 5))
+REDIS_ASYNC_ENABLED = os.getenv('REDIS_ASYNC_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+_connection_pools: Dict[tuple, Any] = {}
+
+def _redis_url() -> str:
+    return os.getenv('REDIS_URL') or f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{int(os.getenv('REDIS_PORT', 6379))}/0"
+
+def get_redis_client(decode_responses: bool = False) -> redis.Redis:
+    """Cliente síncrono sobre el pool de conexiones compartido"""
+    pool_key = ('sync', decode_responses)
+    if pool_key not in _connection_pools:
+        _connection_pools[pool_key] = redis.BlockingConnectionPool.from_url(
+            _redis_url(), max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT,
+            decode_responses=decode_responses
+        )
+    return redis.Redis(connection_pool=_connection_pools[pool_key])
+
+def get_async_redis_client(decode_responses: bool = False) -> Optional["redis_asyncio.Redis"]:
+    """
+    Cliente asyncio sobre el pool compartido. Devuelve None si redis.asyncio no está
+    disponible o REDIS_ASYNC_ENABLED=false: los llamadores usan entonces el cliente
+    síncrono en un hilo para no bloquear el event loop.
+    """
+    if redis_asyncio is None or not REDIS_ASYNC_ENABLED:
+        return None
+    pool_key = ('async', decode_responses)
+    if pool_key not in _connection_pools:
+        _connection_pools[pool_key] = redis_asyncio.BlockingConnectionPool.from_url(
+            _redis_url(), max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT,
+            decode_responses=decode_responses
+        )
+    return redis_asyncio.Redis(connection_pool=_connection_pools[pool_key])
 
 class DomainCacheConfig:
-    def __init__(self, domain_prefix: str):
+    def __init__(self, domain_prefix: str, l1_enabled: Optional[bool] = None):
         self.domain_prefix = domain_prefix  # Tu prefijo específico: beauty_
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=int(os.getenv('REDIS_PORT', 6379)),
-            db=0,
-            decode_responses=True
-        )
+        # Los valores llevan byte de formato y pueden ir comprimidos: clientes en modo bytes
+        self.redis_client = get_redis_client(decode_responses=False)
+        self.async_redis_client = get_async_redis_client(decode_responses=False)
+        self.codec = CacheCodec.from_env()
 
         # TTL específicos para los datos de Clínica Estética
         self.cache_ttl = {
@@ -24,49 +158,276 @@ class DomainCacheConfig:
             'promociones_activas': 300 # 5 minutos para promociones (cambian, pero no tan rápido como las citas)
         }
 
+        # Límites (mínimo, máximo) del TTL adaptativo: las claves frías bajan al mínimo y
+        # las calientes suben al máximo según su frecuencia de acceso reciente
+        self.ttl_bounds = {
+            'citas_disponibles': (60, 240),
+            'detalle_tratamiento': (120, 3600),
+            'catalogo_servicios': (600, 4 * 3600),
+            'configuracion_clinica': (3600, 2 * 86400),
+            'historial_cliente': (60, 900),
+            'promociones_activas': (60, 900)
+        }
+        adaptive_ttl = os.getenv('CACHE_ADAPTIVE_TTL', 'true').lower() in ('1', 'true', 'yes')
+        self.hot_keys = HotKeyTracker(self.ttl_bounds) if adaptive_ttl else None
+
+        # Cache L1 en proceso delante de Redis, solo para datos estables: la invalidación
+        # limpia el L1 del proceso actual, los demás workers lo renuevan al expirar el TTL.
+        # Por eso el TTL en L1 nunca supera CACHE_L1_MAX_TTL segundos (ni lo que le queda a
+        # la clave en Redis): es lo máximo que otro worker sirve un dato ya invalidado.
+        if l1_enabled is None:
+            l1_enabled = os.getenv('CACHE_L1_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.l1_enabled = l1_enabled
+        self.l1_max_ttl = float(os.getenv('CACHE_L1_MAX_TTL', 5))
+        self.l1_ttl_types = {'detalle_tratamiento', 'catalogo_servicios', 'configuracion_clinica'}
+        self.l1_cache = LocalLRUCache(
+            max_entries=int(os.getenv('CACHE_L1_MAX_ENTRIES', 1024)),
+            max_bytes=int(os.getenv('CACHE_L1_MAX_BYTES', 16 * 1024 * 1024))
+        )
+        self.tier_stats = {'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0}
+
+        # Índice de etiquetas: cada etiqueta es un ZSET con las claves que dependen de ella
+        # puntuadas por su expiración; cada escritura poda los miembros ya expirados, así que
+        # el índice de una etiqueta caliente no crece más que sus entradas vivas. La clave
+        # vive tanto como el TTL más largo para no perder miembros de larga duración.
+        self.tag_ttl = max(max(self.cache_ttl.values()), max(upper for _, upper in self.ttl_bounds.values()))
+        self._invalidate_tags_script = self.redis_client.register_script(INVALIDATE_TAGS_SCRIPT)
+        self._async_invalidate_tags_script = (
+            self.async_redis_client.register_script(INVALIDATE_TAGS_SCRIPT)
+            if self.async_redis_client is not None else None
+        )
+
     def get_cache_key(self, category: str, identifier: str) -> str:
         """Genera claves de cache específicas para tu dominio de Clínica Estética"""
         return f"{self.domain_prefix}:{category}:{identifier}"
 
-    def set_cache(self, key: str, value: Any, ttl_type: str = 'citas_disponibles') -> bool:
-        """Almacena datos en cache con TTL específico"""
+    def _use_l1(self, ttl_type: Optional[str]) -> bool:
+        return self.l1_enabled and ttl_type in self.l1_ttl_types
+
+    def _l1_ttl(self, cache_key: str, ttl_type: Optional[str], ttl: float, temperature: Optional[str] = None) -> float:
+        """TTL con que la entrada entra en el L1 (0 si no se admite), acotado por `l1_max_ttl`"""
+        if not self.l1_enabled or ttl_type is None:
+            return 0
+        if self.hot_keys is None:
+            l1_ttl = ttl if self._use_l1(ttl_type) else 0
+        else:
+            l1_ttl = self.hot_keys.decide_l1(cache_key, ttl_type, ttl, ttl_type in self.l1_ttl_types, temperature)
+        return min(l1_ttl, self.l1_max_ttl)
+
+    def _reads_remaining_ttl(self, ttl_type: Optional[str]) -> bool:
+        # Solo hace falta el TTL restante de la clave si la lectura puede entrar en el L1
+        return self.l1_enabled and ttl_type is not None
+
+    def get_tag_key(self, tag: str) -> str:
+        """Clave del ZSET que indexa las entradas asociadas a una etiqueta"""
+        # "tags" y no "tag": las claves "tag" de versiones anteriores son SETs (WRONGTYPE con ZADD)
+        return self.get_cache_key("tags", tag)
+
+    def _prepare_set(self, cache_key: str, value: Any, ttl_type: str, ttl: Optional[int]) -> tuple:
+        """Serializa el valor, resuelve el TTL (adaptativo si no es explícito) y lo guarda en L1 si corresponde"""
+        serialized_value = self.codec.encode(value)
+        last_payload_size.set(len(serialized_value))
+        temperature = None
+        if ttl is None:
+            ttl = self.cache_ttl.get(ttl_type, 300) # Valor por defecto si no se encuentra el tipo
+            if self.hot_keys is not None:
+                ttl, _, temperature = self.hot_keys.decide_ttl(cache_key, ttl_type, ttl)
+        l1_ttl = self._l1_ttl(cache_key, ttl_type, ttl, temperature)
+        if l1_ttl:
+            self.l1_cache.set(cache_key, value, l1_ttl, len(serialized_value))
+        return serialized_value, ttl
+
+    def _queue_set(self, pipe, cache_key: str, serialized_value: bytes, ttl: int, tags: Iterable[str]):
+        """Valor e índice de etiquetas en un solo round trip"""
+        now = time.time()
+        pipe.setex(cache_key, ttl, serialized_value)
+        for tag in tags:
+            tag_key = self.get_tag_key(tag)
+            pipe.zadd(tag_key, {cache_key: now + ttl})
+            pipe.zremrangebyscore(tag_key, '-inf', now)
+            pipe.expire(tag_key, self.tag_ttl)
+
+    def _get_local(self, cache_key: str) -> Optional[Any]:
+        # Cada lectura cuenta para la frecuencia de la clave, la sirva el L1 o Redis
+        if self.hot_keys is not None:
+            self.hot_keys.record(cache_key)
+        if not self.l1_enabled:
+            return None
+        local_entry = self.l1_cache.get_entry(cache_key)
+        if local_entry is not None:
+            self.tier_stats['l1_hits'] += 1
+            last_payload_size.set(local_entry[1])
+            return local_entry[0]
+        self.tier_stats['l1_misses'] += 1
+        return None
+
+    def _decode_remote(self, cache_key: str, cached_value: Optional[bytes], ttl_type: Optional[str],
+                       remaining_ms: Optional[int] = None) -> Optional[Any]:
+        if not cached_value:
+            self.tier_stats['l2_misses'] += 1
+            last_payload_size.set(0)
+            return None
+        self.tier_stats['l2_hits'] += 1
+        last_payload_size.set(len(cached_value))
+        value = self.codec.decode(cached_value)
+        ttl = self.cache_ttl.get(ttl_type, 300)
+        if remaining_ms is not None and remaining_ms >= 0:
+            # El L1 no debe sobrevivir a la clave en Redis (PTTL -1 = sin expiración)
+            ttl = min(ttl, remaining_ms / 1000)
+        l1_ttl = self._l1_ttl(cache_key, ttl_type, ttl)
+        if l1_ttl:
+            self.l1_cache.set(cache_key, value, l1_ttl, len(cached_value))
+        return value
+
+    def _forget_local(self, deleted_keys) -> int:
+        for cache_key in deleted_keys:
+            if isinstance(cache_key, bytes):
+                cache_key = cache_key.decode()
+            self.l1_cache.delete(cache_key)
+        return len(deleted_keys)
+
+    def set_cache(self, key: str, value: Any, ttl_type: str = 'citas_disponibles',
+                  tags: Optional[Iterable[str]] = None, ttl: Optional[int] = None) -> bool:
+        """Almacena datos en cache con TTL específico (o `ttl` explícito), registrándolos bajo sus etiquetas"""
         try:
             cache_key = self.get_cache_key("data", key)
-            serialized_value = json.dumps(value)
-            ttl = self.cache_ttl.get(ttl_type, 300) # Valor por defecto si no se encuentra el tipo
-            return self.redis_client.setex(cache_key, ttl, serialized_value)
+            serialized_value, ttl = self._prepare_set(cache_key, value, ttl_type, ttl)
+            if not tags:
+                return self.redis_client.setex(cache_key, ttl, serialized_value)
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_set(pipe, cache_key, serialized_value, ttl, tags)
+            return bool(pipe.execute()[0])
+        except Exception as e:
+            print(f"Error setting cache for key '{key}': {e}")
+            return False
+
+    async def aset_cache(self, key: str, value: Any, ttl_type: str = 'citas_disponibles',
+                         tags: Optional[Iterable[str]] = None, ttl: Optional[int] = None) -> bool:
+        """Versión asyncio de set_cache"""
+        if self.async_redis_client is None:
+            return await asyncio.to_thread(self.set_cache, key, value, ttl_type, tags, ttl)
+        try:
+            cache_key = self.get_cache_key("data", key)
+            serialized_value, ttl = self._prepare_set(cache_key, value, ttl_type, ttl)
+            if not tags:
+                return bool(await self.async_redis_client.setex(cache_key, ttl, serialized_value))
+            pipe = self.async_redis_client.pipeline(transaction=False)
+            self._queue_set(pipe, cache_key, serialized_value, ttl, tags)
+            return bool((await pipe.execute())[0])
         except Exception as e:
             print(f"Error setting cache for key '{key}': {e}")
             return False
 
-    def get_cache(self, key: str) -> Optional[Any]:
-        """Recupera datos del cache"""
+    def _fetch_remote(self, cache_key: str, ttl_type: Optional[str]) -> tuple:
+        """(valor, ttl_type, ms restantes) desde Redis; GET y PTTL en un solo round trip"""
+        if not self._reads_remaining_ttl(ttl_type):
+            return self.redis_client.get(cache_key), ttl_type, None
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(cache_key)
+        pipe.pttl(cache_key)
+        cached_value, remaining_ms = pipe.execute()
+        return cached_value, ttl_type, remaining_ms
+
+    def get_cache(self, key: str, ttl_type: Optional[str] = None) -> Optional[Any]:
+        """Recupera datos del cache (primero L1 en memoria, luego Redis)"""
         try:
             cache_key = self.get_cache_key("data", key)
-            cached_value = self.redis_client.get(cache_key)
-            if cached_value:
-                return json.loads(cached_value)
+            local_value = self._get_local(cache_key)
+            if local_value is not None:
+                return local_value
+            return self._decode_remote(cache_key, *self._fetch_remote(cache_key, ttl_type))
+        except Exception as e:
+            print(f"Error getting cache for key '{key}': {e}")
             return None
+
+    async def aget_cache(self, key: str, ttl_type: Optional[str] = None) -> Optional[Any]:
+        """Versión asyncio de get_cache: los hits de L1 no esperan ninguna E/S"""
+        try:
+            cache_key = self.get_cache_key("data", key)
+            local_value = self._get_local(cache_key)
+            if local_value is not None:
+                return local_value
+            if self.async_redis_client is None:
+                remote = await asyncio.to_thread(self._fetch_remote, cache_key, ttl_type)
+                return self._decode_remote(cache_key, *remote)
+            if not self._reads_remaining_ttl(ttl_type):
+                return self._decode_remote(cache_key, await self.async_redis_client.get(cache_key), ttl_type)
+            pipe = self.async_redis_client.pipeline(transaction=False)
+            pipe.get(cache_key)
+            pipe.pttl(cache_key)
+            cached_value, remaining_ms = await pipe.execute()
+            return self._decode_remote(cache_key, cached_value, ttl_type, remaining_ms)
         except Exception as e:
             print(f"Error getting cache for key '{key}': {e}")
             return None
 
+    def get_tier_stats(self) -> Dict[str, Any]:
+        """Contadores de hits/misses por nivel de cache (L1 en proceso, L2 Redis)"""
+        stats = dict(self.tier_stats)
+        for tier in ('l1', 'l2'):
+            total = stats[f'{tier}_hits'] + stats[f'{tier}_misses']
+            stats[f'{tier}_hit_rate_percentage'] = (stats[f'{tier}_hits'] / total) * 100 if total > 0 else 0
+        stats['l1_entries'] = len(self.l1_cache)
+        stats['l1_bytes'] = self.l1_cache.current_bytes
+        return stats
+
+    def get_admission_stats(self) -> Dict[str, Dict[str, int]]:
+        """Decisiones del TTL adaptativo y de admisión en L1 por ttl_type"""
+        return self.hot_keys.get_stats() if self.hot_keys is not None else {}
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Invalida todas las entradas asociadas a las etiquetas (O(entradas etiquetadas), sin escanear)"""
+        if not tags:
+            return 0
+        try:
+            tag_keys = [self.get_tag_key(tag) for tag in tags]
+            return self._forget_local(self._invalidate_tags_script(keys=tag_keys, args=[time.time()]) or [])
+        except Exception as e:
+            print(f"Error invalidating cache tags {tags}: {e}")
+            return 0
+
+    async def ainvalidate_tags(self, *tags: str) -> int:
+        """Versión asyncio de invalidate_tags"""
+        if self._async_invalidate_tags_script is None:
+            return await asyncio.to_thread(self.invalidate_tags, *tags)
+        if not tags:
+            return 0
+        try:
+            tag_keys = [self.get_tag_key(tag) for tag in tags]
+            deleted = await self._async_invalidate_tags_script(keys=tag_keys, args=[time.time()])
+            return self._forget_local(deleted or [])
+        except Exception as e:
+            print(f"Error invalidating cache tags {tags}: {e}")
+            return 0
+
     def invalidate_cache(self, pattern: str = None):
-        """Invalida cache específico o por patrón para Clínica Estética"""
+        """
+        Invalida cache por patrón para Clínica Estética. Recorre el keyspace con SCAN
+        (no bloquea Redis), pero es O(N): en el flujo normal usa invalidate_tags.
+        """
         try:
             if pattern:
                 # Buscamos claves que coincidan con el patrón bajo nuestro prefijo de dominio
                 cache_pattern = f"{self.domain_prefix}:{pattern}"
-                keys = self.redis_client.keys(cache_pattern)
-                if keys:
-                    self.redis_client.delete(*keys)
+                self.l1_cache.delete_matching(cache_pattern)
             else:
                 # Invalida todo el cache de tu dominio
-                domain_keys = self.redis_client.keys(f"{self.domain_prefix}:*")
-                if domain_keys:
-                    self.redis_client.delete(*domain_keys)
+                cache_pattern = f"{self.domain_prefix}:*"
+                self.l1_cache.clear()
+            self._delete_keys(self.redis_client.scan_iter(match=cache_pattern, count=1000))
         except Exception as e:
             print(f"Error invalidating cache: {e}")
 
+    def _delete_keys(self, keys: Iterable[str], batch_size: int = 500):
+        """Borra claves en lotes para no enviar un único DEL gigante"""
+        batch: List[str] = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= batch_size:
+                self.redis_client.delete(*batch)
+                batch = []
+        if batch:
+            self.redis_client.delete(*batch)
+
 # Instancia específica para tu dominio de Clínica Estética
-cache_manager = DomainCacheConfig("beauty_")
\ No newline at end of file
+cache_manager = DomainCacheConfig("beauty_")
@@ -0,0 +1,125 @@
+# app/cache/serializers.py
+import json
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: se usa json de la librería estándar
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Byte de formato: 1 FFFF CCC -> bit alto encendido, formato de serialización y compresión.
+# Las entradas antiguas son JSON en texto ASCII, así que su primer byte nunca tiene el bit alto.
+MARKER_FLAG = 0x80
+
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZ4 = 2
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(',', ':')).encode()
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+SERIALIZERS = {
+    FORMAT_JSON: (_json_dumps, _json_loads),
+    FORMAT_MSGPACK: (_msgpack_dumps, _msgpack_loads),
+}
+
+COMPRESSORS = {
+    COMPRESSION_ZLIB: (lambda data: zlib.compress(data, 6), zlib.decompress),
+    COMPRESSION_LZ4: (lambda data: lz4_frame.compress(data), lambda data: lz4_frame.decompress(data)),
+}
+
+FORMAT_NAMES = {'json': FORMAT_JSON, 'msgpack': FORMAT_MSGPACK}
+COMPRESSION_NAMES = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB, 'lz4': COMPRESSION_LZ4}
+
+class CacheCodec:
+    """
+    Serializa los valores del cache con un byte de formato al inicio, de modo que
+    entradas escritas con distintos formatos (y las antiguas en JSON plano) conviven.
+    """
+
+    def __init__(self, serializer: str = 'json', compression: str = 'none', compress_min_bytes: int = 1024):
+        self.format_id = FORMAT_NAMES[serializer]
+        self.compression_id = COMPRESSION_NAMES[compression]
+        self.compress_min_bytes = compress_min_bytes
+
+        if self.format_id == FORMAT_MSGPACK and msgpack is None:
+            print("msgpack no está instalado, se usa JSON para el cache")
+            self.format_id = FORMAT_JSON
+        if self.compression_id == COMPRESSION_LZ4 and lz4_frame is None:
+            print("lz4 no está instalado, se usa zlib para comprimir el cache")
+            self.compression_id = COMPRESSION_ZLIB
+
+    @classmethod
+    def from_env(cls) -> "CacheCodec":
+        """Configura el codec con CACHE_SERIALIZER, CACHE_COMPRESSION y CACHE_COMPRESS_MIN_BYTES"""
+        return cls(
+            serializer=os.getenv('CACHE_SERIALIZER', 'json'),
+            compression=os.getenv('CACHE_COMPRESSION', 'none'),
+            compress_min_bytes=int(os.getenv('CACHE_COMPRESS_MIN_BYTES', 1024))
+        )
+
+    def encode(self, value: Any) -> bytes:
+        dumps, _ = SERIALIZERS[self.format_id]
+        payload = dumps(value)
+        compression_id = COMPRESSION_NONE
+        # Solo se comprimen valores grandes (catálogo, historial); los pequeños no compensan
+        if self.compression_id != COMPRESSION_NONE and len(payload) >= self.compress_min_bytes:
+            compress, _ = COMPRESSORS[self.compression_id]
+            payload = compress(payload)
+            compression_id = self.compression_id
+        return bytes([MARKER_FLAG | (self.format_id << 3) | compression_id]) + payload
+
+    def decode(self, data: Optional[bytes]) -> Any:
+        if data is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode()
+        marker = data[0]
+        if not marker & MARKER_FLAG:
+            # Entrada antigua: JSON en texto sin byte de formato
+            return json.loads(data)
+
+        format_id = (marker >> 3) & 0x0F
+        compression_id = marker & 0x07
+        payload = data[1:]
+        if compression_id != COMPRESSION_NONE:
+            _, decompress = COMPRESSORS[compression_id]
+            payload = decompress(payload)
+        _, loads = SERIALIZERS[format_id]
+        return loads(payload)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'serializer': next(name for name, fid in FORMAT_NAMES.items() if fid == self.format_id),
+            'json_backend': 'orjson' if orjson is not None else 'json',
+            'compression': next(name for name, cid in COMPRESSION_NAMES.items() if cid == self.compression_id),
+            'compress_min_bytes': self.compress_min_bytes
+        }
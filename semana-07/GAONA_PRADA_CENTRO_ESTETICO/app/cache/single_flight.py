@@ -0,0 +1,115 @@
+# app/cache/single_flight.py
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from .redis_config import DomainCacheConfig, cache_manager
+
+# Libera el lock solo si sigue perteneciendo a quien lo adquirió
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class SingleFlight:
+    """
+    Coalescencia de peticiones: solo una corrutina por clave recalcula el valor y las
+    demás esperan el mismo resultado. La variante distribuida usa un lock en Redis para
+    que entre varios workers también haya un único recálculo.
+    """
+
+    def __init__(self, manager: DomainCacheConfig, lock_ttl: float = 10.0,
+                 lock_timeout: float = 5.0, poll_interval: float = 0.05):
+        self.manager = manager
+        self.lock_ttl = lock_ttl            # Segundos que dura el lock si el worker muere
+        self.lock_timeout = lock_timeout    # Máximo a esperar por otro worker antes de recalcular
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._release_lock_script = manager.redis_client.register_script(RELEASE_LOCK_SCRIPT)
+        self._async_release_lock_script = (
+            manager.async_redis_client.register_script(RELEASE_LOCK_SCRIPT)
+            if manager.async_redis_client is not None else None
+        )
+        self.stats = {'leaders': 0, 'coalesced': 0, 'lock_waits': 0, 'lock_timeouts': 0,
+                      'background_refreshes': 0}
+
+    async def do(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta `load` una sola vez por clave entre las corrutinas concurrentes del proceso"""
+        task = self._inflight.get(key)
+        if task is None:
+            # La carga corre en su propia tarea: si el líder se cancela, los demás siguen esperando
+            task = asyncio.ensure_future(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.stats['leaders'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def refresh_in_background(self, key: str, load: Callable[[], Awaitable[Any]]):
+        """Programa un recálculo sin bloquear al llamador; ignora claves que ya se están recalculando"""
+        if key in self._inflight:
+            return
+        self.stats['background_refreshes'] += 1
+        task = asyncio.ensure_future(self.do(key, load))
+        # Mantiene la referencia hasta que termine y registra el error en lugar de perderlo
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error refreshing cache in background: {task.exception()}")
+
+    async def do_distributed(self, key: str, load: Callable[[], Awaitable[Any]],
+                             ttl_type: Optional[str] = None) -> Any:
+        """Como `do`, pero además coordina a los workers con un lock SET NX en Redis"""
+        return await self.do(key, lambda: self._load_with_lock(key, load, ttl_type))
+
+    async def _load_with_lock(self, key: str, load: Callable[[], Awaitable[Any]],
+                              ttl_type: Optional[str]) -> Any:
+        lock_key = self.manager.get_cache_key("lock", key)
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self._acquire_lock(lock_key, token)
+        except Exception as e:
+            print(f"Error acquiring cache lock '{lock_key}': {e}")
+            return await load()
+
+        if acquired:
+            try:
+                return await load()
+            finally:
+                try:
+                    await self._release_lock(lock_key, token)
+                except Exception as e:
+                    print(f"Error releasing cache lock '{lock_key}': {e}")
+
+        # Otro worker está recalculando: esperamos a que publique el valor en el cache
+        self.stats['lock_waits'] += 1
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            cached_result = await self.manager.aget_cache(key, ttl_type)
+            if cached_result is not None:
+                return cached_result
+        self.stats['lock_timeouts'] += 1
+        return await load()
+
+    async def _acquire_lock(self, lock_key: str, token: str) -> bool:
+        lock_ms = int(self.lock_ttl * 1000)
+        if self.manager.async_redis_client is None:
+            return bool(await asyncio.to_thread(self.manager.redis_client.set, lock_key, token, nx=True, px=lock_ms))
+        return bool(await self.manager.async_redis_client.set(lock_key, token, nx=True, px=lock_ms))
+
+    async def _release_lock(self, lock_key: str, token: str):
+        if self._async_release_lock_script is None:
+            await asyncio.to_thread(self._release_lock_script, keys=[lock_key], args=[token])
+        else:
+            await self._async_release_lock_script(keys=[lock_key], args=[token])
+
+# Instancia compartida por los decoradores de cache de la Clínica Estética
+single_flight = SingleFlight(cache_manager)
@@ -1,37 +1,333 @@
 # app/database/indexes.py
-from sqlalchemy import Index, text
-# Asegúrate de importar tu motor de DB
-# from app.database import engine
+import argparse
+import asyncio
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Engine
+from .optimized_queries import BeautyOptimizedQueries
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """Índice declarado para el dominio; `columns` admite sufijos de orden ("fecha_cita DESC")"""
+    name: str
+    table: str
+    columns: Tuple[str, ...]
+    description: str = ""
+
+    @property
+    def definition(self) -> str:
+        return f"{self.table}({', '.join(self.columns)})"
+
+    def create_sql(self, dialect: str) -> str:
+        """CREATE INDEX según el dialecto: CONCURRENTLY solo existe en PostgreSQL"""
+        if dialect == 'postgresql':
+            return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {self.definition};"
+        if dialect == 'mysql':
+            # MySQL no tiene IF NOT EXISTS; ALGORITHM/LOCK piden la creación en línea
+            return f"CREATE INDEX {self.name} ON {self.definition} ALGORITHM=INPLACE LOCK=NONE;"
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.definition};"
+
+    def drop_sql(self, dialect: str) -> str:
+        if dialect == 'postgresql':
+            return f"DROP INDEX CONCURRENTLY IF EXISTS {self.name};"
+        if dialect == 'mysql':
+            return f"DROP INDEX {self.name} ON {self.table};"
+        return f"DROP INDEX IF EXISTS {self.name};"
+
+    @property
+    def leading_column(self) -> str:
+        return self.columns[0].split()[0]
+
+BEAUTY_INDEXES = [
+    IndexSpec("idx_beauty_citas_esteticista_fecha", "beauty_citas", ("esteticista_id", "fecha_cita"),
+              "Búsquedas de citas por esteticista y fecha (crucial para la app)"),
+    IndexSpec("idx_beauty_citas_estado_fecha", "beauty_citas", ("estado", "fecha_cita DESC"),
+              "Búsquedas de citas por estado (canceladas, completadas, etc.)"),
+    IndexSpec("idx_beauty_historial_cliente", "beauty_procedimientos", ("cliente_id", "fecha_procedimiento DESC"),
+              "Consultas de historial de cliente por ID"),
+    IndexSpec("idx_beauty_tratamientos_tipo", "beauty_tratamientos", ("tipo_tratamiento", "duracion_minutos"),
+              "Consultas para el catálogo de tratamientos por tipo o categoría"),
+]
+
+# Estado de los índices aplicados: qué definición se creó, cuándo y en qué dialecto
+INDEX_STATE_TABLE = "beauty_schema_indexes"
+state_metadata = MetaData()
+index_state = Table(
+    INDEX_STATE_TABLE, state_metadata,
+    Column("name", String(128), primary_key=True),
+    Column("table_name", String(128), nullable=False),
+    Column("definition", String(512), nullable=False),
+    Column("dialect", String(32), nullable=False),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+# Valores de ejemplo para los parámetros de EXPLAIN (los tipos deben ser válidos para el planificador)
+EXPLAIN_SAMPLE_PARAMS = {
+    'fecha_cita': '2025-01-10',
+    'fecha_inicio': '2025-01-01',
+    'fecha_fin': '2025-01-31',
+    'esteticista_id': 1,
+    'cliente_id': 1,
+    'limit': 10
+}
+
+class IndexManager:
+    """
+    Aplica los índices declarados y registra su estado en `beauty_schema_indexes`.
+    En PostgreSQL los índices se crean con CONCURRENTLY fuera de transacción (AUTOCOMMIT);
+    un índice que quedó INVALID por una creación concurrente fallida se elimina y se
+    vuelve a crear. SQLite no admite CONCURRENTLY y usa CREATE INDEX IF NOT EXISTS.
+    """
+
+    def __init__(self, engine: Engine, indexes: Optional[List[IndexSpec]] = None):
+        self.engine = engine
+        self.indexes = indexes if indexes is not None else BEAUTY_INDEXES
+        self.dialect = engine.dialect.name
+
+    # --- Estado ---
+
+    def _applied(self) -> Dict[str, dict]:
+        if not inspect(self.engine).has_table(INDEX_STATE_TABLE):
+            return {}
+        with self.engine.connect() as connection:
+            return {row.name: dict(row._mapping) for row in connection.execute(select(index_state))}
+
+    def _existing_indexes(self) -> Dict[str, set]:
+        inspector = inspect(self.engine)
+        existing = {}
+        for table in {spec.table for spec in self.indexes}:
+            if inspector.has_table(table):
+                existing[table] = {index['name'] for index in inspector.get_indexes(table)}
+        return existing
+
+    def status(self) -> List[dict]:
+        """Estado de cada índice declarado: aplicado, presente en la BD y si cambió su definición"""
+        applied = self._applied()
+        existing = self._existing_indexes()
+        rows = []
+        for spec in self.indexes:
+            record = applied.get(spec.name)
+            rows.append({
+                'name': spec.name,
+                'table': spec.table,
+                'definition': spec.definition,
+                'table_exists': spec.table in existing,
+                'exists': spec.name in existing.get(spec.table, set()),
+                'applied_at': record['applied_at'].isoformat() if record else None,
+                'outdated': bool(record) and record['definition'] != spec.definition
+            })
+        return rows
+
+    # --- Aplicación ---
+
+    def _is_invalid(self, connection, name: str) -> bool:
+        """Índices de PostgreSQL que quedaron a medias tras un CREATE INDEX CONCURRENTLY fallido"""
+        if self.dialect != 'postgresql':
+            return False
+        valid = connection.execute(text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ), {'name': name}).scalar()
+        return valid is False
+
+    def _record(self, connection, spec: IndexSpec):
+        connection.execute(index_state.delete().where(index_state.c.name == spec.name))
+        connection.execute(index_state.insert().values(
+            name=spec.name, table_name=spec.table, definition=spec.definition,
+            dialect=self.dialect, applied_at=datetime.utcnow()
+        ))
+
+    def apply(self, dry_run: bool = False) -> List[dict]:
+        """Crea los índices pendientes o modificados; devuelve el resultado de cada uno"""
+        results = []
+        if not dry_run:
+            state_metadata.create_all(self.engine, tables=[index_state], checkfirst=True)
+        status = self.status()
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for row, spec in zip(status, self.indexes):
+                statements = []
+                if not row['table_exists']:
+                    results.append({'name': spec.name, 'action': 'skipped', 'reason': f"tabla {spec.table} inexistente"})
+                    continue
+                if row['exists'] and (row['outdated'] or self._is_invalid(connection, spec.name)):
+                    statements.append(spec.drop_sql(self.dialect))
+                elif row['exists']:
+                    if not row['applied_at'] and not dry_run:
+                        # Creado a mano antes de que existiera el registro de estado
+                        self._record(connection, spec)
+                    results.append({'name': spec.name, 'action': 'unchanged'})
+                    continue
+                statements.append(spec.create_sql(self.dialect))
+
+                if dry_run:
+                    results.append({'name': spec.name, 'action': 'pending', 'sql': statements})
+                    continue
+                try:
+                    for statement in statements:
+                        connection.execute(text(statement))
+                    self._record(connection, spec)
+                    results.append({'name': spec.name, 'action': 'created', 'sql': statements})
+                except Exception as e:
+                    print(f"❌ Error creando índice {spec.name}: {e}")
+                    results.append({'name': spec.name, 'action': 'error', 'reason': str(e)})
+        return results
+
+    # --- Asesor (EXPLAIN) ---
+
+    def _explain(self, connection, query: str) -> List[str]:
+        """Tablas que el plan recorre completas (seq scan)"""
+        params = {name: EXPLAIN_SAMPLE_PARAMS.get(name, 1) for name in re.findall(r"(?<!:):(\w+)", query)}
+        if self.dialect == 'postgresql':
+            plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), params).scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scanned, nodes = [], [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if node.get('Node Type') == 'Seq Scan':
+                    scanned.append(node.get('Alias') or node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            return scanned
+        if self.dialect == 'sqlite':
+            rows = connection.execute(text(f"EXPLAIN QUERY PLAN {query}"), params).fetchall()
+            # "SCAN c" recorre la tabla; "SEARCH c USING INDEX ..." usa un índice
+            return [match.group(1) for row in rows
+                    if (match := re.match(r"SCAN (?:TABLE )?(\w+)", row[-1])) and 'USING' not in row[-1]]
+        if self.dialect == 'mysql':
+            rows = connection.execute(text(f"EXPLAIN {query}"), params).mappings().fetchall()
+            return [row['table'] for row in rows if row['type'] == 'ALL']
+        return []
+
+    @staticmethod
+    def _aliases(query: str) -> Dict[str, str]:
+        """alias -> tabla a partir de FROM/JOIN"""
+        aliases = {}
+        for table, alias in re.findall(r"(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b)(\w+))?", query, re.IGNORECASE):
+            aliases[alias or table] = table
+            aliases[table] = table
+        return aliases
+
+    @staticmethod
+    def _suggest_columns(query: str, alias: str) -> Tuple[List[str], List[str]]:
+        """Columnas de igualdad y columnas candidatas (igualdad, luego rangos y por último ORDER BY)"""
+        where = re.split(r"\bORDER\s+BY\b", query, flags=re.IGNORECASE)
+        predicates = where[0]
+        order_by = where[1] if len(where) > 1 else ""
+        prefix = re.escape(alias)
+        equality = re.findall(rf"\b{prefix}\.(\w+)\s*=\s*(?::\w+|'[^']*'|\d+)", predicates)
+        ranges = re.findall(rf"\b{prefix}\.(\w+)\s*(?:>=|<=|>|<)", predicates)
+        ordered = re.findall(rf"\b{prefix}\.(\w+)", order_by)
+        columns = []
+        for column in equality + ranges + ordered:
+            if column not in columns:
+                columns.append(column)
+        return equality, columns
+
+    def advise(self) -> List[dict]:
+        """Ejecuta EXPLAIN sobre las consultas del dominio y sugiere índices para los seq scans"""
+        queries = BeautyOptimizedQueries.get_queries_for_domain()
+        inspector = inspect(self.engine)
+        findings = []
+        with self.engine.connect() as connection:
+            for query_name, query in queries.items():
+                aliases = self._aliases(query)
+                try:
+                    scanned = self._explain(connection, query)
+                except Exception as e:
+                    findings.append({'query': query_name, 'error': str(e)})
+                    continue
+                for alias in scanned:
+                    table = aliases.get(alias, alias)
+                    equality, columns = self._suggest_columns(query, alias)
+                    finding = {'query': query_name, 'table': table, 'seq_scan': True, 'columns': columns}
+                    if columns:
+                        declared = next((spec for spec in self.indexes
+                                         if spec.table == table and spec.leading_column in (equality or columns[:1])), None)
+                        existing = {index['name'] for index in inspector.get_indexes(table)} if inspector.has_table(table) else set()
+                        if declared is not None and declared.name not in existing:
+                            finding['suggestion'] = f"aplicar {declared.name} (declarado y pendiente)"
+                        elif declared is None:
+                            finding['suggestion'] = (f"CREATE INDEX idx_{table}_{'_'.join(columns[:3])} "
+                                                     f"ON {table}({', '.join(columns[:3])});")
+                        else:
+                            finding['suggestion'] = (f"{declared.name} existe pero el planificador no lo usa "
+                                                     f"(ejecuta ANALYZE o revisa la selectividad)")
+                    findings.append(finding)
+        return findings
+
+    def report(self) -> str:
+        """Estado de los índices y hallazgos del asesor en texto"""
+        lines = [f"Índices del dominio beauty_ ({self.dialect})"]
+        for row in self.status():
+            mark = "✅" if row['exists'] and not row['outdated'] else "❌"
+            detail = "tabla inexistente" if not row['table_exists'] else (
+                "definición modificada" if row['outdated'] else
+                f"aplicado {row['applied_at']}" if row['applied_at'] else
+                "presente (sin registro)" if row['exists'] else "pendiente")
+            lines.append(f"  {mark} {row['name']:<40} {row['definition']:<55} {detail}")
+        lines.append("")
+        lines.append("Asesor (EXPLAIN de BeautyOptimizedQueries)")
+        findings = self.advise()
+        if not findings:
+            lines.append("  ✅ Ninguna consulta recorre tablas completas")
+        for finding in findings:
+            if 'error' in finding:
+                lines.append(f"  ❌ {finding['query']}: error en EXPLAIN: {finding['error']}")
+                continue
+            lines.append(f"  ❌ {finding['query']}: seq scan sobre {finding['table']}")
+            if finding.get('suggestion'):
+                lines.append(f"       sugerencia: {finding['suggestion']}")
+        return "\n".join(lines)
 
 class BeautyDomainIndexes:
     """Índices específicos para optimizar consultas de tu Clínica Estética"""
 
     @staticmethod
-    def create_beauty_indexes():
+    def create_beauty_indexes(dialect: str = 'postgresql') -> List[str]:
         """Índices específicos para Citas, Clientes y Procedimientos"""
-        indexes = [
-            # Búsquedas de citas por esteticista y fecha (crucial para la app)
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_beauty_citas_esteticista_fecha ON beauty_citas(esteticista_id, fecha_cita);",
-            # Búsquedas de citas por estado (canceladas, completadas, etc.)
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_beauty_citas_estado_fecha ON beauty_citas(estado, fecha_cita DESC);",
-            # Consultas de historial de cliente por ID
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_beauty_historial_cliente ON beauty_procedimientos(cliente_id, fecha_procedimiento DESC);",
-            # Consultas para el catálogo de tratamientos por tipo o categoría
-            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_beauty_tratamientos_tipo ON beauty_tratamientos(tipo_tratamiento, duracion_minutos);",
-        ]
-        return indexes
+        return [spec.create_sql(dialect) for spec in BEAUTY_INDEXES]
 
     @staticmethod
-    async def create_indexes_for_domain():
+    async def create_indexes_for_domain(engine: Optional[Engine] = None) -> List[dict]:
         """Crea índices específicos para tu dominio de Clínica Estética"""
-        indexes = BeautyDomainIndexes.create_beauty_indexes()
-
-        # Asume que 'engine' es tu motor de base de datos SQLAlchemy
-        # with engine.connect() as connection:
-        #     for index_sql in indexes:
-        #         try:
-        #             connection.execute(text(index_sql))
-        #             print(f"✅ Índice creado: {index_sql[:50]}...")
-        #         except Exception as e:
-        #             print(f"❌ Error creando índice: {e}")
-        print("Ejecuta manualmente los scripts SQL para crear los índices en tu base de datos.")
\ No newline at end of file
+        if engine is None:
+            from ..dependencies import engine
+        results = await asyncio.to_thread(IndexManager(engine).apply)
+        for result in results:
+            if result['action'] == 'created':
+                print(f"✅ Índice creado: {result['name']}")
+            elif result['action'] == 'skipped':
+                print(f"❌ Índice omitido {result['name']}: {result['reason']}")
+        return results
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.database.indexes",
+                                     description="Gestión de índices del dominio beauty_")
+    parser.add_argument("command", choices=["report", "apply", "status"])
+    parser.add_argument("--database-url", help="por defecto DATABASE_URL")
+    parser.add_argument("--dry-run", action="store_true", help="con apply: muestra el SQL sin ejecutarlo")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.database_url)
+    else:
+        from ..dependencies import engine
+    manager = IndexManager(engine)
+
+    if args.command == "report":
+        print(manager.report())
+    elif args.command == "status":
+        print(json.dumps(manager.status(), indent=2, ensure_ascii=False))
+    else:
+        for result in manager.apply(dry_run=args.dry_run):
+            print(f"{result['action']:<10} {result['name']}")
+            for statement in result.get('sql', []):
+                print(f"           {statement}")
+            if result.get('reason'):
+                print(f"           {result['reason']}")
+
+if __name__ == "__main__":
+    main()
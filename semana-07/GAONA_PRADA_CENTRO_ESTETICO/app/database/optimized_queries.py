@@ -1,39 +1,65 @@
 # app/database/optimized_queries.py
 from typing import Dict, Any
+from sqlalchemy import Integer, String, bindparam, text
+from sqlalchemy.sql.elements import TextClause
+
+# SQL de las consultas del dominio 'beauty_' (se define una sola vez por proceso)
+BEAUTY_QUERIES: Dict[str, str] = {
+    'citas_disponibles': """
+        SELECT c.*, t.nombre_tratamiento
+        FROM beauty_citas c
+        JOIN beauty_tratamientos t ON c.tratamiento_id = t.id
+        WHERE c.fecha_cita = :fecha_cita
+        AND c.esteticista_id = :esteticista_id
+        AND c.estado = 'disponible'
+        ORDER BY c.hora_inicio
+    """,
+    'historial_cliente': """
+        SELECT p.fecha_procedimiento, t.nombre_tratamiento, p.observaciones, e.nombre as esteticista_nombre
+        FROM beauty_procedimientos p
+        JOIN beauty_citas c ON p.cita_id = c.id
+        JOIN beauty_tratamientos t ON c.tratamiento_id = t.id
+        JOIN beauty_esteticistas e ON c.esteticista_id = e.id
+        WHERE p.cliente_id = :cliente_id
+        ORDER BY p.fecha_procedimiento DESC
+        LIMIT :limit
+    """,
+    'reporte_ocupacion_esteticista': """
+        SELECT e.nombre, COUNT(c.id) as total_citas
+        FROM beauty_esteticistas e
+        JOIN beauty_citas c ON e.id = c.esteticista_id
+        WHERE c.fecha_cita >= :fecha_inicio AND c.fecha_cita <= :fecha_fin
+        AND c.estado = 'completada'
+        GROUP BY e.nombre
+        ORDER BY total_citas DESC
+    """
+}
+
+# Tipo de cada parámetro: las fechas llegan como texto ISO ('2025-01-10')
+BEAUTY_QUERY_PARAMS: Dict[str, Dict[str, Any]] = {
+    'citas_disponibles': {'fecha_cita': String, 'esteticista_id': Integer},
+    'historial_cliente': {'cliente_id': Integer, 'limit': Integer},
+    'reporte_ocupacion_esteticista': {'fecha_inicio': String, 'fecha_fin': String}
+}
+
+def _build_statement(name: str) -> TextClause:
+    params = [bindparam(param, type_=type_) for param, type_ in BEAUTY_QUERY_PARAMS[name].items()]
+    return text(BEAUTY_QUERIES[name]).bindparams(*params)
+
+# Registro de sentencias construidas una vez con parámetros tipados. Al reutilizar el
+# mismo objeto, su cache key es estable y SQLAlchemy compila cada sentencia una sola vez
+# por dialecto (compiled cache del engine) en lugar de volver a parsear el SQL en cada llamada.
+BEAUTY_STATEMENTS: Dict[str, TextClause] = {name: _build_statement(name) for name in BEAUTY_QUERIES}
 
 class BeautyOptimizedQueries:
     """Consultas optimizadas para tu Clínica Estética"""
 
     @staticmethod
-    def get_queries_for_domain():
+    def get_queries_for_domain() -> Dict[str, str]:
         """Obtiene las consultas optimizadas para el dominio 'beauty_'"""
-        return {
-            'citas_disponibles': """
-                SELECT c.*, t.nombre_tratamiento
-                FROM beauty_citas c
-                JOIN beauty_tratamientos t ON c.tratamiento_id = t.id
-                WHERE c.fecha_cita = :fecha_cita
-                AND c.esteticista_id = :esteticista_id
-                AND c.estado = 'disponible'
-                ORDER BY c.hora_inicio
-            """,
-            'historial_cliente': """
-                SELECT p.fecha_procedimiento, t.nombre_tratamiento, p.observaciones, e.nombre as esteticista_nombre
-                FROM beauty_procedimientos p
-                JOIN beauty_citas c ON p.cita_id = c.id
-                JOIN beauty_tratamientos t ON c.tratamiento_id = t.id
-                JOIN beauty_esteticistas e ON c.esteticista_id = e.id
-                WHERE p.cliente_id = :cliente_id
-                ORDER BY p.fecha_procedimiento DESC
-                LIMIT :limit
-            """,
-            'reporte_ocupacion_esteticista': """
-                SELECT e.nombre, COUNT(c.id) as total_citas
-                FROM beauty_esteticistas e
-                JOIN beauty_citas c ON e.id = c.esteticista_id
-                WHERE c.fecha_cita >= :fecha_inicio AND c.fecha_cita <= :fecha_fin
-                AND c.estado = 'completada'
-                GROUP BY e.nombre
-                ORDER BY total_citas DESC
-            """
-        }
\ No newline at end of file
+        return dict(BEAUTY_QUERIES)
+
+    @staticmethod
+    def get_statement(name: str) -> TextClause:
+        """Sentencia precompilable del registro (parámetros tipados)"""
+        return BEAUTY_STATEMENTS[name]
\ No newline at end of file
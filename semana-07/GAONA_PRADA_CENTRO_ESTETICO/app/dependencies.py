@@ -0,0 +1,24 @@
+# app/dependencies.py
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import os
+
+# URL de la base de datos de la Clínica Estética
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./beauty_clinic.db")
+
+# Crear engine (check_same_thread solo aplica a SQLite)
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+)
+
+# Crear sesión
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Función para obtener la sesión de base de datos
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
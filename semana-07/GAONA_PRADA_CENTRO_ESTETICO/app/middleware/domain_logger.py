@@ -1,27 +1,43 @@
 # app/middleware/domain_logger.py
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-import logging
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import json
+import os
+import random
 import time
-from typing import Dict, Any
-
-class DomainLogger(BaseHTTPMiddleware):
-    def __init__(self, app, domain_prefix: str):
-        super().__init__(app)
+from datetime import datetime
+from typing import Dict, Any, Optional
+from ..cache.serializers import orjson
+from .log_writer import AsyncLogWriter
+from .route_policies import DOMAIN_ROUTE_PATTERNS, RoutePolicyMatcher, get_route_policy_matcher
+
+class DomainLogger:
+    """Middleware ASGI puro que registra los requests relevantes del dominio"""
+
+    def __init__(self, app: ASGIApp, domain_prefix: str, route_policies: Optional[RoutePolicyMatcher] = None,
+                 writer: Optional[AsyncLogWriter] = None):
+        self.app = app
         self.domain_prefix = domain_prefix
-
-        # Configurar logger específico para el dominio
-        self.logger = logging.getLogger(f"{domain_prefix}domain_logger")
-        self.logger.setLevel(logging.INFO)
-
-        # Handler específico para archivos del dominio
-        handler = logging.FileHandler(f"logs/{domain_prefix}domain.log")
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        self.path_prefix = f"/{domain_prefix.rstrip('_')}"
+        # Matcher precompilado compartido con el rate limiter y el validador
+        self.route_policies = route_policies or get_route_policy_matcher(domain_prefix)
+
+        # Logs estructurados (una línea JSON por evento) escritos en lotes por un hilo en
+        # segundo plano: el request solo encola la línea y nunca espera al disco
+        self.logger_name = f"{domain_prefix}domain_logger"
+        self.writer = writer or AsyncLogWriter.from_env(f"logs/{domain_prefix}domain.log")
+
+        # Muestreo: los requests exitosos se registran con la tasa de su patrón (cabeza);
+        # errores y requests lentos se conservan siempre (cola)
+        self.sampling_enabled = os.getenv('LOG_SAMPLING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.slow_threshold = float(os.getenv('LOG_SLOW_THRESHOLD_MS', 1000)) / 1000
+        self._random = random.random
+        self.sampling_stats = {
+            'kept_head': 0,
+            'kept_error': 0,
+            'kept_slow': 0,
+            'sampled_out': 0
+        }
 
         # Configurar qué endpoints loggear por dominio
         self.logged_endpoints = self._get_logged_endpoints(domain_prefix)
@@ -29,23 +45,26 @@ class DomainLogger(BaseHTTPMiddleware):
     def _get_logged_endpoints(self, domain_prefix: str) -> Dict[str, str]:
         """Define qué endpoints requieren logging específico para 'beauty_'"""
 
-        logging_configs = {
-            "beauty_": {
-                "/procedimientos/create": "WARNING", # Creación de nuevos procedimientos
-                "/procedimientos/update": "WARNING", # Modificación de procedimientos
-                "/historial": "INFO",                # Acceso a historial de cliente
-                "/citas/book": "INFO",               # Creación de citas
-                "/precios": "CRITICAL"               # Acceso a datos sensibles
-            }
-        }
-        return logging_configs.get(domain_prefix, {})
+        return DOMAIN_ROUTE_PATTERNS.get(domain_prefix, {}).get("log_levels", {})
 
     def _should_log_endpoint(self, path: str) -> tuple[bool, str]:
         """Determina si el endpoint debe ser loggeado y su nivel"""
-        for endpoint_pattern, level in self.logged_endpoints.items():
-            if endpoint_pattern in path:
-                return True, level
-        return False, "INFO"
+        policy = self.route_policies.resolve(path)
+        return policy.should_log, policy.log_level
+
+    def _sample_rate(self, path: str) -> float:
+        """Tasa de muestreo de cabeza configurada para el endpoint"""
+        if not self.sampling_enabled:
+            return 1.0
+        return self.route_policies.resolve(path).log_sample_rate
+
+    def _tail_reason(self, status_code: int, process_time: float) -> Optional[str]:
+        """Motivo para conservar un request descartado por el muestreo de cabeza"""
+        if status_code >= 400:
+            return "error"
+        if process_time >= self.slow_threshold:
+            return "slow"
+        return None
 
     def _extract_domain_specific_data(self, request: Request, path: str) -> Dict[str, Any]:
         """Extrae datos específicos del dominio para logging"""
@@ -67,44 +86,99 @@ class DomainLogger(BaseHTTPMiddleware):
 
         return data
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        path = request.url.path
+    def _serialize(self, data: Dict[str, Any]) -> str:
+        """Serializa los datos del request una sola vez; los eventos reutilizan el texto"""
+        if orjson is not None:
+            body = orjson.dumps(data, default=str).decode()
+        else:
+            body = json.dumps(data, ensure_ascii=False, default=str)
+        # Se devuelve sin la llave de apertura para concatenarlo tras los campos del evento
+        return body[1:] if len(body) > 2 else "}"
+
+    def _line(self, event: str, level: str, serialized_data: str, extra: str = "", timestamp: Optional[str] = None) -> str:
+        """Arma la línea JSON del evento sin volver a serializar los datos del request"""
+        timestamp = timestamp or datetime.now().isoformat(timespec='milliseconds')
+        head = f'{{"ts":"{timestamp}","level":"{level}","logger":"{self.logger_name}","event":"{event}"{extra}'
+        return f"{head},{serialized_data}" if serialized_data != "}" else f"{head}}}"
+
+    def _emit(self, event: str, level: str, serialized_data: str, extra: str = "", timestamp: Optional[str] = None):
+        self.writer.write(self._line(event, level, serialized_data, extra, timestamp))
+
+    async def _aemit(self, event: str, level: str, serialized_data: str, extra: str = "", timestamp: Optional[str] = None):
+        # awrite: con la política 'block' la espera no detiene el event loop
+        await self.writer.awrite(self._line(event, level, serialized_data, extra, timestamp))
+
+    def get_log_stats(self) -> Dict[str, int]:
+        """Profundidad de la cola, registros descartados y decisiones de muestreo"""
+        return {**self.writer.get_stats(), **self.sampling_stats}
+
+    def close(self):
+        self.writer.close()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Solo procesar endpoints HTTP del dominio
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
 
-        # Solo procesar endpoints del dominio
-        if not path.startswith(f"/{self.domain_prefix.rstrip('_')}"):
-            return await call_next(request)
+        start_time = time.time()
+        path = scope["path"]
 
         # Verificar si debe ser loggeado
         should_log, log_level = self._should_log_endpoint(path)
-
-        if should_log:
-            request_data = self._extract_domain_specific_data(request, path)
-            self.logger.log(
-                getattr(logging, log_level),
-                f"REQUEST_START: {json.dumps(request_data)}"
-            )
-
-        response = await call_next(request)
-
-        if should_log:
+        if not should_log:
+            await self.app(scope, receive, send)
+            return
+
+        request_data = self._serialize(self._extract_domain_specific_data(Request(scope), path))
+        start_timestamp = datetime.now().isoformat(timespec='milliseconds')
+
+        # Muestreo de cabeza: si el request no entra en la muestra, REQUEST_START se retiene
+        # y solo se escribe si al final resulta ser un error o un request lento
+        sample_rate = self._sample_rate(path)
+        head_sampled = sample_rate >= 1.0 or self._random() < sample_rate
+        sampling = f',"sampling":"head","sample_rate":{sample_rate}'
+        if head_sampled:
+            await self._aemit("REQUEST_START", log_level, request_data, sampling, start_timestamp)
+
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
             process_time = time.time() - start_time
-            response_data = {
-                **request_data,
-                "status_code": response.status_code,
-                "process_time": round(process_time, 3)
-            }
 
-            if response.status_code >= 500:
+            if status_code >= 500:
                 response_level = "CRITICAL"
-            elif response.status_code >= 400:
+            elif status_code >= 400:
                 response_level = "WARNING"
             else:
                 response_level = log_level
 
-            self.logger.log(
-                getattr(logging, response_level),
-                f"REQUEST_END: {json.dumps(response_data)}"
-            )
-
-        return response
\ No newline at end of file
+            keep = head_sampled
+            if head_sampled:
+                self.sampling_stats['kept_head'] += 1
+            else:
+                # Muestreo de cola: los errores y los requests lentos nunca se pierden
+                reason = self._tail_reason(status_code, process_time)
+                keep = reason is not None
+                if keep:
+                    self.sampling_stats[f'kept_{reason}'] += 1
+                    sampling = f',"sampling":"tail","sample_reason":"{reason}","sample_rate":{sample_rate}'
+                    await self._aemit("REQUEST_START", log_level, request_data, sampling, start_timestamp)
+                else:
+                    self.sampling_stats['sampled_out'] += 1
+
+            if keep:
+                await self._aemit(
+                    "REQUEST_END",
+                    response_level,
+                    request_data,
+                    f',"status_code":{status_code},"process_time":{round(process_time, 3)}{sampling}'
+                )
\ No newline at end of file
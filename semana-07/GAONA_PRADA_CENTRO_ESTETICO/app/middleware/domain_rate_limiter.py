@@ -1,16 +1,43 @@
 # app/middleware/domain_rate_limiter.py
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import os
 import redis
-import time
-import json
-from typing import Dict, Optional
-
-class DomainRateLimiter(BaseHTTPMiddleware):
-    def __init__(self, app, domain_prefix: str, redis_client: redis.Redis):
-        super().__init__(app)
+from typing import Dict, Optional, Union
+from ..cache.redis_config import get_async_redis_client, get_redis_client, redis_asyncio
+from .rate_limit_algorithms import RedisRateLimiter, RateLimitResult
+from .local_rate_limiter import LeasedRateLimiter
+from .route_policies import RoutePolicyMatcher, get_route_policy_matcher
+
+class DomainRateLimiter:
+    """Middleware ASGI puro de rate limiting para los endpoints del dominio"""
+
+    def __init__(self, app: ASGIApp, domain_prefix: str, redis_client: Optional[Union[redis.Redis, "redis_asyncio.Redis"]] = None,
+                 algorithm: Optional[str] = None, route_policies: Optional[RoutePolicyMatcher] = None):
+        self.app = app
         self.domain_prefix = domain_prefix
-        self.redis = redis_client
+        self.path_prefix = f"/{domain_prefix.rstrip('_')}"
+        self.route_policies = route_policies or get_route_policy_matcher(domain_prefix)
+        # Por defecto usa el pool asyncio compartido; un cliente síncrono se ejecuta en un hilo
+        self.redis = redis_client or get_async_redis_client(decode_responses=True) or get_redis_client(decode_responses=True)
+        self.is_async_client = redis_asyncio is not None and isinstance(self.redis, redis_asyncio.Redis)
+
+        # Algoritmo: sliding_log (exacto), sliding_window (contadores) o gcra (token bucket)
+        self.limiter = RedisRateLimiter(
+            self.redis,
+            algorithm=algorithm or os.getenv('RATE_LIMIT_ALGORITHM', 'sliding_log'),
+            is_async_client=self.is_async_client
+        )
+        # Modo híbrido para categorías con "local_prelimit": buckets en memoria con cupo
+        # pedido a Redis en lotes (sobre-admisión máxima configurable)
+        self.local_limiter = None
+        if os.getenv('RATE_LIMIT_LOCAL_PRELIMIT', 'true').lower() in ('1', 'true', 'yes'):
+            self.local_limiter = LeasedRateLimiter(
+                self.redis,
+                is_async_client=self.is_async_client,
+                max_over_admission=float(os.getenv('RATE_LIMIT_MAX_OVER_ADMISSION', 0.05))
+            )
 
         # Configuración específica por dominio
         self.rate_limits = self._get_domain_rate_limits(domain_prefix)
@@ -21,12 +48,14 @@ class DomainRateLimiter(BaseHTTPMiddleware):
         rate_configs = {
             "beauty_": {
                 # Límites altos para disponibilidad
-                "availability": {"requests": 400, "window": 60},  # 400 req/min disponibilidad
+                "availability": {"requests": 400, "window": 60, "local_prelimit": True},  # 400 req/min disponibilidad
                 # Límites medios para reservas y historial
                 "booking": {"requests": 100, "window": 60},      # 100 req/min reservas de citas
                 "history": {"requests": 150, "window": 60},      # 150 req/min historial
                 # Límites bajos para admin
-                "admin": {"requests": 50, "window": 60}          # 50 req/min admin
+                "admin": {"requests": 50, "window": 60},         # 50 req/min admin
+                # Resto de endpoints del dominio
+                "general": {"requests": 120, "window": 60}
             }
         }
 
@@ -43,69 +72,58 @@ class DomainRateLimiter(BaseHTTPMiddleware):
 
     def _get_rate_limit_category(self, path: str, method: str) -> str:
         """Determina la categoría de rate limit según el endpoint del dominio 'beauty_'"""
+        # Las reglas viven en route_policies.DOMAIN_ROUTE_PATTERNS; gana la primera que coincide
+        return self.route_policies.resolve(path).rate_limit_category
 
-        if self.domain_prefix == "beauty_":
-            if "/citas/disponibles" in path:
-                return "availability"
-            elif "/citas/book" in path or "/citas/cancel" in path:
-                return "booking"
-            elif "/historial" in path:
-                return "history"
-            elif "/admin" in path:
-                return "admin"
-
-        return "general"
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Solo aplicar rate limiting a endpoints HTTP de tu dominio
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
         # Obtener información del request
-        client_ip = request.client.host
-        path = request.url.path
-        method = request.method
-
-        # Solo aplicar rate limiting a endpoints de tu dominio
-        if not path.startswith(f"/{self.domain_prefix.rstrip('_')}"):
-            return await call_next(request)
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        path = scope["path"]
+        method = scope["method"]
 
         # Determinar categoría de rate limit
         category = self._get_rate_limit_category(path, method)
         rate_config = self.rate_limits.get(category, self.rate_limits["general"])
 
         # Verificar rate limit
-        if not self._check_rate_limit(client_ip, category, rate_config):
-            raise HTTPException(
+        result = await self._check_rate_limit(client_ip, category, rate_config)
+        if not result.allowed:
+            response = JSONResponse(
                 status_code=429,
-                detail={
+                content={"detail": {
                     "error": "Rate limit exceeded",
                     "category": category,
                     "limit": rate_config["requests"],
                     "window": rate_config["window"],
+                    "reset_after": result.reset_after,
                     "domain": self.domain_prefix
-                }
+                }},
+                headers=result.headers()
             )
+            await response(scope, receive, send)
+            return
 
-        # Continuar con el request
-        response = await call_next(request)
-        return response
-
-    def _check_rate_limit(self, client_ip: str, category: str, config: Dict) -> bool:
-        """Verifica si el cliente excede el rate limit"""
-        current_time = int(time.time())
-        window_start = current_time - config["window"]
+        # Continuar con el request añadiendo las cabeceras de cupo a la respuesta
+        rate_limit_headers = result.headers()
 
-        # Clave específica para el dominio y categoría
-        key = f"{self.domain_prefix}:rate_limit:{category}:{client_ip}"
-
-        # Obtener requests en la ventana actual
-        requests = self.redis.zrangebyscore(key, window_start, current_time)
-
-        if len(requests) >= config["requests"]:
-            return False
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(rate_limit_headers)
+            await send(message)
 
-        # Añadir request actual
-        self.redis.zadd(key, {str(current_time): current_time})
-        self.redis.expire(key, config["window"])
+        await self.app(scope, receive, send_with_headers)
 
-        # Limpiar requests antiguos
-        self.redis.zremrangebyscore(key, 0, window_start)
-
-        return True
\ No newline at end of file
+    async def _check_rate_limit(self, client_ip: str, category: str, config: Dict) -> RateLimitResult:
+        """Verifica el rate limit del cliente en un único round trip atómico a Redis"""
+        limiter = self.limiter
+        if config.get("local_prelimit") and self.local_limiter is not None:
+            limiter = self.local_limiter
+        # Clave específica para el dominio y categoría
+        key = f"{self.domain_prefix}:rate_limit:{limiter.algorithm}:{category}:{client_ip}"
+        return await limiter.hit(key, config["requests"], config["window"])
@@ -1,25 +1,32 @@
 # app/middleware/domain_validator.py
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 import json
 from typing import Dict, Any, Optional
 from datetime import datetime
+from .route_policies import DOMAIN_ROUTE_PATTERNS, RoutePolicyMatcher, get_route_policy_matcher
 
-class DomainValidator(BaseHTTPMiddleware):
-    def __init__(self, app, domain_prefix: str):
-        super().__init__(app)
+class DomainValidator:
+    """Middleware ASGI puro con las validaciones de negocio del dominio"""
+
+    def __init__(self, app: ASGIApp, domain_prefix: str, route_policies: Optional[RoutePolicyMatcher] = None):
+        self.app = app
         self.domain_prefix = domain_prefix
+        self.path_prefix = f"/{domain_prefix.rstrip('_')}"
+        self.route_policies = route_policies or get_route_policy_matcher(domain_prefix)
         self.validators = self._get_domain_validators(domain_prefix)
 
     def _get_domain_validators(self, domain_prefix: str) -> Dict[str, Any]:
         """Validadores específicos para el dominio 'beauty_'"""
 
+        route_patterns = DOMAIN_ROUTE_PATTERNS.get("beauty_", {})
         validators = {
             "beauty_": {
                 "required_headers": ["X-Beauty-Cliente-ID"], # ID de cliente para ciertas operaciones
                 "business_hours": (9, 21),                   # 9 AM a 9 PM
-                "consent_required": ["/procedimientos/invasivos"], # Procedimientos que requieren consentimiento
-                "restricted_days": ["/procedimientos/especializados"] # Restricción de días para ciertos procedimientos
+                "consent_required": route_patterns.get("consent_required", []),
+                "restricted_days": route_patterns.get("restricted_days", [])
             }
         }
 
@@ -50,54 +57,62 @@ class DomainValidator(BaseHTTPMiddleware):
     def _validate_domain_specific_rules(self, request: Request, path: str) -> tuple[bool, Optional[str]]:
         """Validaciones específicas del dominio 'beauty_'"""
 
+        policy = self.route_policies.resolve(path)
+
         # Validación 1: Consentimiento requerido para procedimientos invasivos
-        consent_required_endpoints = self.validators.get("consent_required", [])
-        if any(endpoint in path for endpoint in consent_required_endpoints):
+        if policy.consent_required:
             if "X-Consentimiento-ID" not in request.headers:
                 return False, "Procedimiento invasivo requiere consentimiento"
 
         # Validación 2: Restricción de días para procedimientos especializados (ej. solo entre semana)
-        restricted_endpoints = self.validators.get("restricted_days", [])
-        if any(endpoint in path for endpoint in restricted_endpoints):
+        if policy.restricted_days:
             if datetime.now().weekday() >= 5:  # Sábado o Domingo
                 return False, "Procedimiento no disponible los fines de semana"
 
         return True, None
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Solo validar endpoints HTTP del dominio
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        error_response = self._validate(Request(scope), scope["path"])
+        if error_response is not None:
+            await error_response(scope, receive, send)
+            return
 
-        # Solo validar endpoints del dominio
-        if not path.startswith(f"/{self.domain_prefix.rstrip('_')}"):
-            return await call_next(request)
+        await self.app(scope, receive, send)
 
+    def _validate(self, request: Request, path: str) -> Optional[JSONResponse]:
+        """Devuelve la respuesta de error si el request no cumple las reglas del dominio"""
         # Validar horarios de atención
         if not self._validate_business_hours(path):
-            raise HTTPException(
+            return JSONResponse(
                 status_code=403,
-                detail={
+                content={"detail": {
                     "error": "Fuera de horario de atención",
                     "domain": self.domain_prefix,
                     "business_hours": self.validators["business_hours"]
-                }
+                }}
             )
 
         # Validar headers requeridos
         if not self._validate_required_headers(request):
-            raise HTTPException(
+            return JSONResponse(
                 status_code=400,
-                detail={
+                content={"detail": {
                     "error": "Headers requeridos faltantes",
                     "required_headers": self.validators["required_headers"]
-                }
+                }}
             )
 
         # Validaciones específicas del dominio
         is_valid, error_message = self._validate_domain_specific_rules(request, path)
         if not is_valid:
-            raise HTTPException(
+            return JSONResponse(
                 status_code=400,
-                detail={"error": error_message, "domain": self.domain_prefix}
+                content={"detail": {"error": error_message, "domain": self.domain_prefix}}
             )
 
-        return await call_next(request)
\ No newline at end of file
+        return None
@@ -0,0 +1,163 @@
+# app/middleware/local_rate_limiter.py
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from .rate_limit_algorithms import RateLimitResult
+
+# Concede hasta ARGV[2] tokens del cupo de la ventana (contador fijo por ventana)
+LEASE_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local batch = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+
+local used = tonumber(redis.call('GET', key) or '0')
+local granted = math.min(batch, limit - used)
+if granted <= 0 then
+    return {0, used}
+end
+used = redis.call('INCRBY', key, granted)
+redis.call('PEXPIRE', key, ttl)
+return {granted, used}
+"""
+
+# Devuelve ARGV[2i-1] tokens a KEYS[i] solo si la ventana sigue existiendo en Redis: un
+# DECRBY sobre una clave expirada la recrearía en negativo y sin TTL. Si la clave perdió
+# el TTL se le vuelve a poner ARGV[2i] ms
+RETURN_TOKENS_SCRIPT = """
+local returned = 0
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        local tokens = tonumber(ARGV[2 * i - 1])
+        local used = tonumber(redis.call('GET', key) or '0')
+        tokens = math.min(tokens, used)
+        if tokens > 0 then
+            redis.call('DECRBY', key, tokens)
+            returned = returned + tokens
+        end
+        if redis.call('PTTL', key) < 0 then
+            redis.call('PEXPIRE', key, tonumber(ARGV[2 * i]))
+        end
+    end
+end
+return returned
+"""
+
+@dataclass
+class LocalTokenBucket:
+    tokens: int
+    expires_at: float      # Fin de validez del lease en este worker
+    window_index: int      # Ventana de Redis de la que salieron los tokens
+    global_used: int       # Cupo global consumido al momento del lease
+    window: int            # Duración de la ventana en segundos
+
+class LeasedRateLimiter:
+    """
+    Pre-limitador local: cada worker guarda token buckets en memoria por (client_ip, categoría)
+    y pide cupo a Redis en lotes, así la mayoría de los requests no hacen ninguna llamada de red.
+
+    Los tokens de un lease pueden gastarse hasta `lease_ttl` segundos después, incluso si ya
+    empezó la siguiente ventana. Por eso el lote se dimensiona como
+    limit * max_over_admission / expected_workers: la sobre-admisión por ventana queda
+    acotada a `max_over_admission` (fracción del límite). Periódicamente se devuelven
+    a Redis los tokens no usados de leases expirados, en una tarea en segundo plano y con
+    un solo script para todas las claves, sin retrasar el request que la dispara.
+    """
+
+    algorithm = 'leased_token_bucket'
+
+    def __init__(self, redis_client, is_async_client: bool = True, max_over_admission: float = 0.05,
+                 expected_workers: int = None, lease_ttl: float = 1.0, reconcile_interval: float = 5.0,
+                 clock: Callable[[], float] = time.time):
+        self.redis = redis_client
+        self.is_async_client = is_async_client
+        self.max_over_admission = max_over_admission
+        self.expected_workers = expected_workers or int(os.getenv('WEB_CONCURRENCY', 1))
+        self.lease_ttl = lease_ttl
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock
+        self._buckets: Dict[str, LocalTokenBucket] = {}
+        self._last_reconcile = clock()
+        self._lease_script = redis_client.register_script(LEASE_SCRIPT)
+        self._return_script = redis_client.register_script(RETURN_TOKENS_SCRIPT)
+        self._reconcile_task: Optional[asyncio.Task] = None
+        self.stats = {'local_hits': 0, 'leases': 0, 'denied': 0, 'tokens_returned': 0}
+
+    def lease_size(self, limit: int) -> int:
+        return max(1, int(limit * self.max_over_admission / self.expected_workers))
+
+    async def _call(self, func, *args, **kwargs):
+        if self.is_async_client:
+            return await func(*args, **kwargs)
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        """Consume un token local; solo va a Redis cuando el bucket está vacío o expirado"""
+        now = self.clock()
+        window_index = int(now // window)
+        reset_after = (window_index + 1) * window - now
+
+        if now - self._last_reconcile >= self.reconcile_interval and (
+                self._reconcile_task is None or self._reconcile_task.done()):
+            expired = self._release_expired(now)
+            if expired:
+                self._reconcile_task = asyncio.create_task(self._return_tokens(expired))
+
+        bucket = self._buckets.get(key)
+        if bucket is not None and bucket.expires_at > now:
+            if bucket.tokens > 0:
+                bucket.tokens -= 1
+                self.stats['local_hits'] += 1
+                return RateLimitResult(True, limit, max(0, limit - bucket.global_used) + bucket.tokens, reset_after)
+            if bucket.window_index == window_index and bucket.global_used >= limit:
+                # Cupo global agotado: se rechaza localmente hasta que expire el lease
+                self.stats['denied'] += 1
+                return RateLimitResult(False, limit, 0, reset_after)
+
+        granted, used = await self._call(
+            self._lease_script,
+            keys=[f"{key}:{window_index}"],
+            args=[limit, self.lease_size(limit), window * 2000]
+        )
+        self.stats['leases'] += 1
+        granted, used = int(granted), int(used)
+        self._buckets[key] = LocalTokenBucket(
+            tokens=max(0, granted - 1),
+            expires_at=now + self.lease_ttl,
+            window_index=window_index,
+            global_used=used,
+            window=window
+        )
+        if granted == 0:
+            self.stats['denied'] += 1
+            return RateLimitResult(False, limit, 0, reset_after)
+        return RateLimitResult(True, limit, max(0, limit - used) + granted - 1, reset_after)
+
+    def _release_expired(self, now: float) -> List[Tuple[str, int, int]]:
+        """Libera los buckets de leases expirados; devuelve (clave de ventana, tokens, ttl ms)"""
+        self._last_reconcile = now
+        expired = [key for key, bucket in self._buckets.items() if bucket.expires_at <= now]
+        returns = []
+        for key in expired:
+            bucket = self._buckets.pop(key)
+            if bucket.tokens > 0:
+                returns.append((f"{key}:{bucket.window_index}", bucket.tokens, bucket.window * 2000))
+        return returns
+
+    async def _return_tokens(self, returns: List[Tuple[str, int, int]]):
+        args = []
+        for _, tokens, ttl in returns:
+            args.extend((tokens, ttl))
+        try:
+            returned = await self._call(self._return_script, keys=[key for key, _, _ in returns], args=args)
+            self.stats['tokens_returned'] += int(returned)
+        except Exception as e:
+            print(f"Error returning rate limit tokens for {len(returns)} keys: {e}")
+
+    async def reconcile(self):
+        """Devuelve a Redis los tokens de leases expirados y libera sus buckets"""
+        returns = self._release_expired(self.clock())
+        if returns:
+            await self._return_tokens(returns)
@@ -0,0 +1,237 @@
+# app/middleware/log_writer.py
+import asyncio
+import atexit
+import gzip
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+DROP_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+class AsyncLogWriter:
+    """
+    Escritor de logs fuera del request: los middlewares encolan líneas ya serializadas en
+    un buffer acotado y un hilo en segundo plano las escribe en lotes.
+
+    Políticas cuando el buffer está lleno:
+    - drop_newest: descarta la línea nueva (nunca bloquea el event loop)
+    - drop_oldest: descarta la línea más antigua y encola la nueva
+    - block: espera hasta `block_timeout` segundos a que haya espacio (backpressure) y,
+      si no lo hay, descarta la línea nueva. Desde el event loop la espera es `awrite`
+      (asyncio.sleep, el resto de requests sigue avanzando); `write` llamado en el hilo
+      del event loop nunca espera y se comporta como drop_newest
+    """
+
+    def __init__(self, path: str, capacity: int = 10000, batch_size: int = 256, flush_interval: float = 0.5,
+                 policy: str = 'drop_newest', block_timeout: float = 0.05,
+                 max_bytes: Optional[int] = None, backup_count: int = 5, compress: bool = True):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Política de log no soportada: {policy}")
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+        self._writing = False
+        self._file = None
+        self._file_size = 0
+        self.stats: Dict[str, int] = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'rotations': 0,
+            'write_errors': 0,
+            'max_queue_depth': 0
+        }
+
+        self._thread = threading.Thread(target=self._run, name=f"log-writer:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, path: str) -> "AsyncLogWriter":
+        """Configuración por variables de entorno (LOG_QUEUE_CAPACITY, LOG_DROP_POLICY, ...)"""
+        max_bytes = int(os.getenv('LOG_ROTATE_BYTES', 0))
+        return cls(
+            path,
+            capacity=int(os.getenv('LOG_QUEUE_CAPACITY', 10000)),
+            batch_size=int(os.getenv('LOG_BATCH_SIZE', 256)),
+            flush_interval=float(os.getenv('LOG_FLUSH_INTERVAL', 0.5)),
+            policy=os.getenv('LOG_DROP_POLICY', 'drop_newest'),
+            max_bytes=max_bytes or None,
+            backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+            compress=os.getenv('LOG_ROTATE_COMPRESS', 'true').lower() in ('1', 'true', 'yes')
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._buffer)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'queue_depth': self.queue_depth, 'capacity': self.capacity}
+
+    def write(self, line: str) -> bool:
+        """Encola una línea (sin salto de línea final). Devuelve False si se descartó"""
+        # En el hilo del event loop una espera con threading.Condition detendría todos los requests
+        return self._offer(line, wait=self.policy == 'block' and not _in_event_loop())
+
+    async def awrite(self, line: str) -> bool:
+        """Versión asyncio de write: con la política 'block' espera sin bloquear el event loop"""
+        if self.policy != 'block':
+            return self.write(line)
+        deadline = time.monotonic() + self.block_timeout
+        while True:
+            with self._lock:
+                if self._closed or len(self._buffer) < self.capacity:
+                    return self._enqueue_locked(line)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['dropped'] += 1
+                    return False
+            await asyncio.sleep(min(remaining, 0.001))
+
+    def _offer(self, line: str, wait: bool) -> bool:
+        with self._lock:
+            if len(self._buffer) >= self.capacity and not self._closed:
+                if self.policy == 'drop_oldest':
+                    self._buffer.popleft()
+                    self.stats['dropped'] += 1
+                elif wait:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._buffer) >= self.capacity and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not self._not_full.wait(remaining):
+                            break
+                    if len(self._buffer) >= self.capacity:
+                        self.stats['dropped'] += 1
+                        return False
+                else:
+                    self.stats['dropped'] += 1
+                    return False
+            return self._enqueue_locked(line)
+
+    def _enqueue_locked(self, line: str) -> bool:
+        """Añade la línea con el lock tomado (o la descarta si el escritor está cerrado)"""
+        if self._closed:
+            self.stats['dropped'] += 1
+            return False
+        self._buffer.append(line)
+        self.stats['enqueued'] += 1
+        if len(self._buffer) > self.stats['max_queue_depth']:
+            self.stats['max_queue_depth'] = len(self._buffer)
+        if len(self._buffer) >= self.batch_size:
+            self._not_empty.notify()
+        return True
+
+    def flush(self, timeout: float = 5.0):
+        """Espera a que el hilo escritor vacíe el buffer"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._not_empty.notify()
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._buffer and not self._writing:
+                    return
+            time.sleep(0.005)
+
+    def close(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el hilo escritor"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def _take_batch(self) -> List[str]:
+        with self._lock:
+            if not self._buffer and not self._closed:
+                self._not_empty.wait(self.flush_interval)
+            count = min(len(self._buffer), self.batch_size)
+            batch = [self._buffer.popleft() for _ in range(count)]
+            self._writing = bool(batch)
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write_batch(batch)
+            with self._lock:
+                self._writing = False
+                if self._closed and not self._buffer:
+                    break
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._file_size = self._file.tell()
+
+    def _write_batch(self, batch: List[str]):
+        try:
+            if self._file is None:
+                self._open()
+            data = "\n".join(batch) + "\n"
+            self._file.write(data)
+            self._file.flush()
+            self._file_size += len(data)
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+            if self.max_bytes and self._file_size >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            print(f"Error escribiendo logs en {self.path}: {e}")
+
+    def _backup_name(self, index: int) -> str:
+        return f"{self.path}.{index}.gz" if self.compress else f"{self.path}.{index}"
+
+    def _rotate(self):
+        """Rota el archivo actual a `.1(.gz)` desplazando los respaldos anteriores"""
+        self._file.close()
+        self._file = None
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self._backup_name(index)
+            if os.path.exists(source):
+                os.replace(source, self._backup_name(index + 1))
+        if self.backup_count > 0:
+            if self.compress:
+                with open(self.path, 'rb') as source, gzip.open(self._backup_name(1), 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._backup_name(1))
+        else:
+            os.remove(self.path)
+        self.stats['rotations'] += 1
+        self._open()
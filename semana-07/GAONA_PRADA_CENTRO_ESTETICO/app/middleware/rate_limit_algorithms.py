@@ -0,0 +1,134 @@
+# app/middleware/rate_limit_algorithms.py
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+# Todos los scripts trabajan en milisegundos y devuelven {permitido, restantes, reset_ms}.
+# Cada verificación es un único round trip atómico, seguro entre varios workers.
+
+# Registro deslizante exacto: un miembro único por request en un ZSET
+SLIDING_LOG_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    count = count + 1
+    allowed = 1
+end
+redis.call('PEXPIRE', key, window)
+
+local reset = window
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+return {allowed, limit - count, reset}
+"""
+
+# Ventana deslizante aproximada: contador de la ventana actual + peso de la anterior
+SLIDING_WINDOW_COUNTER_SCRIPT = """
+local current_key = KEYS[1]
+local previous_key = KEYS[2]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+
+local current = tonumber(redis.call('GET', current_key) or '0')
+local previous = tonumber(redis.call('GET', previous_key) or '0')
+local estimated = previous * (window - elapsed) / window + current
+
+local allowed = 0
+if estimated < limit then
+    current = redis.call('INCR', current_key)
+    redis.call('PEXPIRE', current_key, window * 2)
+    estimated = estimated + 1
+    allowed = 1
+end
+return {allowed, math.max(0, math.floor(limit - estimated)), window - elapsed}
+"""
+
+# GCRA (token bucket equivalente): guarda solo el "theoretical arrival time"
+GCRA_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local interval = window / limit
+
+local tat = tonumber(redis.call('GET', key) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if now < allow_at then
+    return {0, 0, math.ceil(allow_at - now)}
+end
+redis.call('SET', key, tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.floor((now - allow_at) / interval), math.ceil(new_tat - now)}
+"""
+
+ALGORITHMS = ('sliding_log', 'sliding_window', 'gcra')
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # Segundos hasta que se libera cupo
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(max(0, int(self.reset_after + 0.999)))
+        }
+        if not self.allowed:
+            headers["Retry-After"] = headers["X-RateLimit-Reset"]
+        return headers
+
+class RedisRateLimiter:
+    """Limitador atómico en Redis (un round trip por request) con algoritmo seleccionable"""
+
+    def __init__(self, redis_client, algorithm: str = 'sliding_log', is_async_client: bool = True,
+                 clock: Callable[[], float] = time.time):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Algoritmo de rate limit desconocido: {algorithm}. Opciones: {ALGORITHMS}")
+        self.algorithm = algorithm
+        self.redis = redis_client
+        self.is_async_client = is_async_client
+        self.clock = clock
+        script = {
+            'sliding_log': SLIDING_LOG_SCRIPT,
+            'sliding_window': SLIDING_WINDOW_COUNTER_SCRIPT,
+            'gcra': GCRA_SCRIPT
+        }[algorithm]
+        self._script = redis_client.register_script(script)
+
+    def _script_call(self, key: str, limit: int, window_ms: int, now_ms: int):
+        """Claves y argumentos del script según el algoritmo"""
+        if self.algorithm == 'sliding_log':
+            # Miembro único: varios requests en el mismo milisegundo no se colapsan
+            return [key], [now_ms, window_ms, limit, f"{now_ms}-{uuid.uuid4().hex[:12]}"]
+        if self.algorithm == 'sliding_window':
+            window_index = now_ms // window_ms
+            return ([f"{key}:{window_index}", f"{key}:{window_index - 1}"],
+                    [window_ms, limit, now_ms - window_index * window_ms])
+        return [key], [now_ms, window_ms, limit]
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        """Registra un request y devuelve si está permitido, el cupo restante y el reset"""
+        keys, args = self._script_call(key, limit, window * 1000, int(self.clock() * 1000))
+        if self.is_async_client:
+            allowed, remaining, reset_ms = await self._script(keys=keys, args=args)
+        else:
+            allowed, remaining, reset_ms = await asyncio.to_thread(self._script, keys=keys, args=args)
+        return RateLimitResult(bool(allowed), limit, int(remaining), int(reset_ms) / 1000)
@@ -0,0 +1,164 @@
+# app/middleware/route_policies.py
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+# Patrones de ruta por dominio que usan los middlewares (logger, rate limiter y validator)
+DOMAIN_ROUTE_PATTERNS = {
+    "beauty_": {
+        "log_levels": {
+            "/procedimientos/create": "WARNING", # Creación de nuevos procedimientos
+            "/procedimientos/update": "WARNING", # Modificación de procedimientos
+            "/historial": "INFO",                # Acceso a historial de cliente
+            "/citas/book": "INFO",               # Creación de citas
+            "/precios": "CRITICAL"               # Acceso a datos sensibles
+        },
+        # Fracción de requests exitosos que se registran (muestreo de cabeza); errores y
+        # requests lentos se conservan siempre. Sin entrada = 1.0 (se registra todo)
+        "log_sample_rates": {
+            "/historial": 0.05,
+            "/citas/book": 0.1
+        },
+        # El orden define la prioridad: gana la primera categoría cuyo patrón aparece en la ruta
+        "rate_limit_categories": [
+            ("/citas/disponibles", "availability"),
+            ("/citas/book", "booking"),
+            ("/citas/cancel", "booking"),
+            ("/historial", "history"),
+            ("/admin", "admin")
+        ],
+        "consent_required": ["/procedimientos/invasivos"],         # Procedimientos que requieren consentimiento
+        "restricted_days": ["/procedimientos/especializados"]      # Restricción de días para ciertos procedimientos
+    }
+}
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    """Decisiones de todos los middlewares para una ruta, resueltas en una sola búsqueda"""
+    should_log: bool
+    log_level: str
+    log_sample_rate: float
+    rate_limit_category: str
+    consent_required: bool
+    restricted_days: bool
+
+class PatternTrie:
+    """Autómata Aho-Corasick: encuentra todos los patrones contenidos en un texto en una pasada"""
+
+    def __init__(self, patterns: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        for index, pattern in enumerate(patterns):
+            self._add(pattern, index)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, index: int):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                next_state = len(self._goto) - 1
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] += (index,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                candidate = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> FrozenSet[int]:
+        """Índices de los patrones que aparecen como subcadena de `text`"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        found = set()
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return frozenset(found)
+
+class RoutePolicyMatcher:
+    """
+    Clasificador de rutas precompilado al arrancar y compartido por los middlewares del
+    dominio. Conserva la semántica anterior (el patrón es subcadena de la ruta y gana el
+    primero en orden) con un LRU sobre las rutas concretas.
+    """
+
+    def __init__(self, log_levels: Dict[str, str], rate_limit_categories: Sequence[Tuple[str, str]],
+                 consent_required: Sequence[str] = (), restricted_days: Sequence[str] = (),
+                 log_sample_rates: Optional[Dict[str, float]] = None, cache_size: int = 4096):
+        patterns: List[str] = []
+        index_of: Dict[str, int] = {}
+
+        def register(pattern: str) -> int:
+            if pattern not in index_of:
+                index_of[pattern] = len(patterns)
+                patterns.append(pattern)
+            return index_of[pattern]
+
+        # índice de patrón -> (prioridad, valor); la prioridad es el orden de configuración
+        self._log_rules: Dict[int, Tuple[int, str]] = {}
+        for priority, (pattern, level) in enumerate(log_levels.items()):
+            self._log_rules.setdefault(register(pattern), (priority, level))
+        self._rate_rules: Dict[int, Tuple[int, str]] = {}
+        for priority, (pattern, category) in enumerate(rate_limit_categories):
+            self._rate_rules.setdefault(register(pattern), (priority, category))
+        self._sample_rules: Dict[int, Tuple[int, float]] = {}
+        for priority, (pattern, rate) in enumerate((log_sample_rates or {}).items()):
+            self._sample_rules.setdefault(register(pattern), (priority, rate))
+        self._consent_rules = frozenset(register(pattern) for pattern in consent_required)
+        self._restricted_rules = frozenset(register(pattern) for pattern in restricted_days)
+        self._trie = PatternTrie(patterns)
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    @classmethod
+    def for_domain(cls, domain_prefix: str, cache_size: int = 4096) -> "RoutePolicyMatcher":
+        config = DOMAIN_ROUTE_PATTERNS.get(domain_prefix, {})
+        return cls(
+            log_levels=config.get("log_levels", {}),
+            rate_limit_categories=config.get("rate_limit_categories", []),
+            consent_required=config.get("consent_required", []),
+            restricted_days=config.get("restricted_days", []),
+            log_sample_rates=config.get("log_sample_rates", {}),
+            cache_size=cache_size
+        )
+
+    def _resolve(self, path: str) -> RoutePolicy:
+        matched = self._trie.find_all(path)
+        log_match = min((self._log_rules[index] for index in matched if index in self._log_rules), default=None)
+        rate_match = min((self._rate_rules[index] for index in matched if index in self._rate_rules), default=None)
+        sample_match = min((self._sample_rules[index] for index in matched if index in self._sample_rules), default=None)
+        log_level = log_match[1] if log_match else None
+        category = rate_match[1] if rate_match else "general"
+        return RoutePolicy(
+            should_log=log_level is not None,
+            log_level=log_level or "INFO",
+            log_sample_rate=sample_match[1] if sample_match else 1.0,
+            rate_limit_category=category,
+            consent_required=not self._consent_rules.isdisjoint(matched),
+            restricted_days=not self._restricted_rules.isdisjoint(matched)
+        )
+
+_matchers: Dict[str, RoutePolicyMatcher] = {}
+
+def get_route_policy_matcher(domain_prefix: str) -> RoutePolicyMatcher:
+    """Matcher compartido por dominio: se compila una vez y lo usan los tres middlewares"""
+    if domain_prefix not in _matchers:
+        _matchers[domain_prefix] = RoutePolicyMatcher.for_domain(domain_prefix)
+    return _matchers[domain_prefix]
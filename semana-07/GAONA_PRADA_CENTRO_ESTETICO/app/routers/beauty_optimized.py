@@ -2,17 +2,18 @@
 from fastapi import APIRouter, HTTPException, Depends
 from ..cache.cache_decorators import cache_result
 from ..cache.redis_config import cache_manager
+from ..dependencies import get_db
 from sqlalchemy.orm import Session
 # Asume que tienes un servicio o CRUD para interactuar con la DB
 # from app.services.beauty_service import get_available_citas, get_tratamiento_details, get_clinica_config
-# from app.dependencies import get_db
 
 router = APIRouter(prefix="/beauty_", tags=["Clínica Estética Optimizada"])
 
 # --- Endpoints relacionados con Citas y Procedimientos ---
 
 @router.get("/citas/disponibles")
-@cache_result(ttl_type='citas_disponibles', key_prefix='citas_')
+@cache_result(ttl_type='citas_disponibles', key_prefix='citas_', tags=['citas'], distributed_lock=True,
+              soft_ttl=120, hard_ttl=300, early_refresh_beta=1.0)
 async def get_citas_disponibles(db: Session = Depends(get_db), fecha: str = None, esteticista_id: int = None):
     """
     Obtiene las citas disponibles para tratamientos en la Clínica Estética.
@@ -34,7 +35,7 @@ async def get_citas_disponibles(db: Session = Depends(get_db), fecha: str = None
     return citas
 
 @router.get("/tratamientos/{tratamiento_id}")
-@cache_result(ttl_type='detalle_tratamiento', key_prefix='tratamientos_')
+@cache_result(ttl_type='detalle_tratamiento', key_prefix='tratamientos_', tags=['tratamiento:{tratamiento_id}'])
 async def get_detalle_tratamiento(tratamiento_id: int, db: Session = Depends(get_db)):
     """
     Obtiene los detalles de un tratamiento específico.
@@ -50,7 +51,7 @@ async def get_detalle_tratamiento(tratamiento_id: int, db: Session = Depends(get
     raise HTTPException(status_code=404, detail="Tratamiento no encontrado")
 
 @router.get("/catalogo/tratamientos")
-@cache_result(ttl_type='catalogo_servicios', key_prefix='catalogo_')
+@cache_result(ttl_type='catalogo_servicios', key_prefix='catalogo_', tags=['catalogo'])
 async def get_catalogo_tratamientos(db: Session = Depends(get_db)):
     """
     Obtiene el catálogo completo de tratamientos ofrecidos por la Clínica Estética.
@@ -66,7 +67,7 @@ async def get_catalogo_tratamientos(db: Session = Depends(get_db)):
     return catalogo
 
 @router.get("/configuracion/clinica")
-@cache_result(ttl_type='configuracion_clinica', key_prefix='clinica_')
+@cache_result(ttl_type='configuracion_clinica', key_prefix='clinica_', tags=['configuracion_clinica'])
 async def get_configuracion_clinica(db: Session = Depends(get_db)):
     """
     Obtiene la configuración general de la clínica (horarios, contacto).
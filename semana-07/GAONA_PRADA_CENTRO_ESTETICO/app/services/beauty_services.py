@@ -1,31 +1,35 @@
 # app/services/beauty_service.py
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from typing import List, Dict, Any, Optional
-from ..database.optimized_queries import BeautyOptimizedQueries
+from sqlalchemy.engine import RowMapping
+from typing import Dict, Any, Sequence
+from ..database.optimized_queries import BEAUTY_STATEMENTS
 
 class OptimizedBeautyService:
+    """
+    Consultas del dominio sobre el registro de sentencias precompiladas: no se reconstruye
+    el SQL por instancia ni por llamada. Los resultados son vistas `RowMapping` de solo
+    lectura (acceso por nombre de columna, sin copiar cada fila a un dict); con
+    `as_tuples=True` se devuelven las `Row` (tuplas con nombre).
+    """
+
     def __init__(self, db: Session):
         self.db = db
-        self.queries = BeautyOptimizedQueries.get_queries_for_domain()
 
-    def get_citas_disponibles(self, fecha: str, esteticista_id: int) -> List[Dict]:
+    def _fetch(self, name: str, params: Dict[str, Any], as_tuples: bool) -> Sequence[Any]:
+        result = self.db.execute(BEAUTY_STATEMENTS[name], params)
+        return result.all() if as_tuples else result.mappings().all()
+
+    def get_citas_disponibles(self, fecha: str, esteticista_id: int, as_tuples: bool = False) -> Sequence[RowMapping]:
         """Obtiene citas disponibles de manera optimizada."""
-        query = self.queries['citas_disponibles']
         params = {"fecha_cita": fecha, "esteticista_id": esteticista_id}
-        result = self.db.execute(text(query), params)
-        return [dict(row) for row in result]
+        return self._fetch('citas_disponibles', params, as_tuples)
 
-    def get_historial_cliente(self, cliente_id: int, limit: int = 10) -> List[Dict]:
+    def get_historial_cliente(self, cliente_id: int, limit: int = 10, as_tuples: bool = False) -> Sequence[RowMapping]:
         """Obtiene el historial de tratamientos de un cliente de manera optimizada."""
-        query = self.queries['historial_cliente']
         params = {"cliente_id": cliente_id, "limit": limit}
-        result = self.db.execute(text(query), params)
-        return [dict(row) for row in result]
+        return self._fetch('historial_cliente', params, as_tuples)
 
-    def get_reporte_ocupacion(self, fecha_inicio: str, fecha_fin: str) -> List[Dict]:
+    def get_reporte_ocupacion(self, fecha_inicio: str, fecha_fin: str, as_tuples: bool = False) -> Sequence[RowMapping]:
         """Genera un reporte de ocupación de esteticistas de manera optimizada."""
-        query = self.queries['reporte_ocupacion_esteticista']
         params = {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin}
-        result = self.db.execute(text(query), params)
-        return [dict(row) for row in result]
\ No newline at end of file
+        return self._fetch('reporte_ocupacion_esteticista', params, as_tuples)
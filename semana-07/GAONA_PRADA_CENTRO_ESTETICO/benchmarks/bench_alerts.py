@@ -0,0 +1,75 @@
+# benchmarks/bench_alerts.py
+"""
+Evaluación de 1000 reglas a 1 Hz sobre 100 series con ventanas de 1, 5 y 15 minutos:
+tiempo por tick agrupando reglas por métrica y ventana (un recorrido del ring por métrica,
+agregados compartidos) frente a agregar la ventana por separado para cada regla.
+
+Uso:
+    python -m benchmarks.bench_alerts [--rules 1000] [--series 100] [--ticks 120]
+"""
+import argparse
+import random
+import statistics
+import time
+from monitoring.alerts import AlertManager, AlertRule
+
+AGREGACIONES = ["last", "avg", "max", "min", "rate", "p50", "p95", "p99"]
+VENTANAS = [60, 300, 900]
+
+def build_manager(rules: int, series: int) -> AlertManager:
+    random.seed(5)
+    manager = AlertManager(domain="beauty_")
+    for i in range(rules):
+        manager.add_rule(AlertRule(
+            name=f"regla_{i}", metric_name=f"metrica_{i % series}", threshold=random.uniform(50, 150),
+            comparison=random.choice(["gt", "lt"]), duration=random.choice([0, 30, 60]),
+            action=lambda rule, value: None, aggregation=random.choice(AGREGACIONES),
+            window=random.choice(VENTANAS), clear_threshold=None, cooldown=300
+        ))
+    return manager
+
+def warm_up(manager: AlertManager, series: int, start: float):
+    """Llena las ventanas con 15 minutos de historia a 1 Hz"""
+    for second in range(max(VENTANAS)):
+        for metric in range(series):
+            manager.record(f"metrica_{metric}", random.uniform(0, 200), start + second)
+
+def per_rule_evaluation(manager: AlertManager, now: float):
+    """Sin agrupar: cada regla vuelve a recorrer su ventana"""
+    for rule in manager.rules:
+        stats = manager.series[rule.metric_name].window_stats(rule.window, now)
+        if stats is not None:
+            manager._evaluate_rule(rule, stats.get(rule.aggregation))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--series", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=120)
+    args = parser.parse_args()
+
+    start = 1_700_000_000.0
+    manager = build_manager(args.rules, args.series)
+    warm_up(manager, args.series, start)
+    now = start + max(VENTANAS)
+
+    grouped, naive = [], []
+    for tick in range(args.ticks):
+        samples = {f"metrica_{metric}": random.uniform(0, 200) for metric in range(args.series)}
+        began = time.perf_counter()
+        manager.check_alerts(samples, now=now + tick)
+        grouped.append((time.perf_counter() - began) * 1000)
+
+        began = time.perf_counter()
+        per_rule_evaluation(manager, now + tick)
+        naive.append((time.perf_counter() - began) * 1000)
+
+    groups = sum(len(windows) for windows in manager._rule_groups.values())
+    print(f"{args.rules} reglas, {args.series} series, {groups} grupos (métrica, ventana)")
+    print(f"{'estrategia':<26} | {'p50 ms/tick':>11} | {'max ms/tick':>11} | {'CPU a 1 Hz':>10}")
+    for label, timings in (("agrupada por ventana", grouped), ("una ventana por regla", naive)):
+        p50 = statistics.median(timings)
+        print(f"{label:<26} | {p50:>11.2f} | {max(timings):>11.2f} | {p50 / 10:>9.2f}%")
+
+if __name__ == "__main__":
+    main()
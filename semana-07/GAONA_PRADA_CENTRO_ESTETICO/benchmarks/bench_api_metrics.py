@@ -0,0 +1,50 @@
+# benchmarks/bench_api_metrics.py
+"""
+Coste de APIMetrics.record_request y series generadas: etiqueta con el path concreto y
+.labels() en cada llamada (versión anterior) frente a plantilla de ruta con hijos cacheados.
+
+Uso:
+    python -m benchmarks.bench_api_metrics [--requests 50000]
+"""
+import argparse
+import time
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from monitoring.metricts import APIMetrics
+
+BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+def series(registry: CollectorRegistry) -> int:
+    return sum(len(metric.samples) for metric in registry.collect())
+
+def bench_legacy(total: int):
+    registry = CollectorRegistry()
+    counter = Counter('beauty_requests_total', 'Total', ['method', 'endpoint', 'status'], registry=registry)
+    histogram = Histogram('beauty_response_duration_seconds', 'Tiempo', ['method', 'endpoint'],
+                          buckets=BUCKETS, registry=registry)
+    start = time.perf_counter()
+    for i in range(total):
+        endpoint = f"/beauty_/citas/{i}"
+        counter.labels(method="GET", endpoint=endpoint, status=200).inc()
+        histogram.labels(method="GET", endpoint=endpoint).observe(0.05)
+    return (time.perf_counter() - start) * 1e6 / total, series(registry)
+
+def bench_template(total: int):
+    registry = CollectorRegistry()
+    metrics = APIMetrics("beauty_clinic_api", "beauty", registry=registry)
+    start = time.perf_counter()
+    for _ in range(total):
+        metrics.record_request("GET", "/beauty_/citas/{cita_id}", 200, 0.05)
+    return (time.perf_counter() - start) * 1e6 / total, series(registry)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'estrategia':<34} | {'µs por request':>14} | {'series':>8}")
+    for label, bench in (("path concreto + .labels()", bench_legacy), ("plantilla + hijos cacheados", bench_template)):
+        micros, total_series = bench(args.requests)
+        print(f"{label:<34} | {micros:>14.2f} | {total_series:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_async_redis.py
+"""
+Peticiones/segundo del cache con 200 clientes concurrentes: cliente Redis síncrono
+(bloquea el event loop en cada lookup) frente al cliente redis.asyncio con pool.
+
+Uso:
+    python -m benchmarks.bench_async_redis                 # Redis en REDIS_URL / REDIS_HOST
+    python -m benchmarks.bench_async_redis --fake          # fakeredis con latencia de red simulada
+    python -m benchmarks.bench_async_redis --fake --rtt-ms 1.0
+"""
+import argparse
+import asyncio
+import os
+import time
+import redis.asyncio
+
+CLIENTES = 200
+PETICIONES_POR_CLIENTE = 20
+
+class SimulatedLatency:
+    """Envuelve un cliente fakeredis y añade el round trip de red a cada comando"""
+
+    def __init__(self, client, rtt: float, is_async: bool):
+        self._client = client
+        self._rtt = rtt
+        self._is_async = is_async
+
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+        if self._is_async:
+            async def call(*args, **kwargs):
+                await asyncio.sleep(self._rtt)
+                return await command(*args, **kwargs)
+        else:
+            def call(*args, **kwargs):
+                time.sleep(self._rtt)
+                return command(*args, **kwargs)
+        return call
+
+async def run_clients(lookup) -> float:
+    """Lanza CLIENTES corrutinas que consultan el cache y devuelve peticiones/segundo"""
+    async def client(client_id: int):
+        for i in range(PETICIONES_POR_CLIENTE):
+            await lookup(f"citas_:bench:{(client_id + i) % 20}", 'citas_disponibles')
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(c) for c in range(CLIENTES)])
+    return CLIENTES * PETICIONES_POR_CLIENTE / (time.perf_counter() - start)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fake', action='store_true', help='usar fakeredis con latencia simulada')
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='round trip simulado con --fake')
+    args = parser.parse_args()
+    os.environ.setdefault('REDIS_MAX_CONNECTIONS', str(CLIENTES))
+
+    # Se importa después de configurar el entorno para que los pools usen REDIS_MAX_CONNECTIONS
+    from app.cache.redis_config import DomainCacheConfig
+    manager = DomainCacheConfig("beauty_", l1_enabled=False)
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        rtt = args.rtt_ms / 1000
+        manager.redis_client = SimulatedLatency(fakeredis.FakeRedis(server=server), rtt, is_async=False)
+        async_client = fakeredis.FakeAsyncRedis(
+            server=server, max_connections=int(os.environ['REDIS_MAX_CONNECTIONS']),
+            connection_pool_class=redis.asyncio.BlockingConnectionPool
+        )
+        manager.async_redis_client = SimulatedLatency(async_client, rtt, is_async=True)
+
+    for i in range(20):
+        manager.set_cache(f"citas_:bench:{i}", [{"id": i, "hora": "10:00", "tratamiento": "Limpieza Facial"}])
+
+    async def sync_lookup(key: str, ttl_type: str):
+        return manager.get_cache(key, ttl_type)
+
+    sync_rps = await run_clients(sync_lookup)
+    async_rps = await run_clients(manager.aget_cache)
+
+    print(f"{CLIENTES} clientes x {PETICIONES_POR_CLIENTE} peticiones")
+    print(f"  redis.Redis (síncrono):   {sync_rps:>10.0f} req/s")
+    print(f"  redis.asyncio con pool:   {async_rps:>10.0f} req/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+# benchmarks/bench_cache_metrics.py
+"""
+Coste de registrar accesos al cache: INCR + EXPIRE en Redis por cada hit/miss (versión
+anterior de CacheMetrics) frente a contadores locales por namespace enviados en un único
+pipeline por flush. Usa fakeredis, así que no incluye la latencia de red: en producción
+cada round trip suma además el RTT a Redis.
+
+Uso:
+    python -m benchmarks.bench_cache_metrics [--accesses 50000] [--flush-every 5000]
+"""
+import argparse
+import random
+import time
+import fakeredis
+from prometheus_client import CollectorRegistry
+from unittest.mock import MagicMock
+from app.cache.metrics import CacheMetrics
+
+NAMESPACES = [
+    ('catalogo_tratamientos', 'tratamientos_'),
+    ('configuracion_clinica', 'config_'),
+    ('citas_disponibles', 'citas_'),
+    ('disponibilidad_esteticista', 'agenda_')
+]
+
+def per_access_redis(client, accesses):
+    """Versión anterior: dos comandos a Redis por cada acceso"""
+    round_trips = 0
+    for namespace, hit in accesses:
+        key = f"beauty_metrics:{'hits' if hit else 'misses'}:{namespace[1]}"
+        client.incr(key)
+        client.expire(key, 3600)
+        round_trips += 2
+    return round_trips
+
+def local_counters(metrics, accesses, flush_every):
+    round_trips = 0
+    for index, (namespace, hit) in enumerate(accesses, 1):
+        metrics.record(namespace[0], namespace[1], hit, 0.001, 512 if hit else 0)
+        if index % flush_every == 0:
+            round_trips += metrics.flush() and 1
+    return round_trips + (metrics.flush() and 1)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accesses", type=int, default=50000)
+    parser.add_argument("--flush-every", type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(21)
+    accesses = [(random.choice(NAMESPACES), random.random() < 0.8) for _ in range(args.accesses)]
+
+    began = time.perf_counter()
+    old_round_trips = per_access_redis(fakeredis.FakeRedis(), accesses)
+    old_elapsed = time.perf_counter() - began
+
+    manager = MagicMock()
+    manager.redis_client = fakeredis.FakeRedis()
+    metrics = CacheMetrics(manager, registry=CollectorRegistry())
+    began = time.perf_counter()
+    new_round_trips = local_counters(metrics, accesses, args.flush_every)
+    new_elapsed = time.perf_counter() - began
+
+    print(f"{args.accesses} accesos en {len(NAMESPACES)} namespaces")
+    print(f"{'estrategia':<28} | {'µs/acceso':>9} | {'round trips':>11}")
+    for label, elapsed, round_trips in (("INCR+EXPIRE por acceso", old_elapsed, old_round_trips),
+                                        ("contadores locales+pipeline", new_elapsed, new_round_trips)):
+        print(f"{label:<28} | {elapsed / args.accesses * 1e6:>9.2f} | {round_trips:>11}")
+
+if __name__ == "__main__":
+    main()
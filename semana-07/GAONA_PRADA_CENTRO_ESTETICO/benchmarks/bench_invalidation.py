@@ -0,0 +1,89 @@
+# benchmarks/bench_invalidation.py
+"""
+Compara la latencia de invalidación por patrón (KEYS, comportamiento anterior)
+frente a la invalidación por etiquetas con 10k, 100k y 1M claves en cache.
+
+Uso:
+    python -m benchmarks.bench_invalidation            # Redis en REDIS_HOST/REDIS_PORT
+    python -m benchmarks.bench_invalidation --fake     # fakeredis (requiere fakeredis y lupa)
+    python -m benchmarks.bench_invalidation --sizes 10000 100000
+"""
+import argparse
+import os
+import time
+import redis
+from app.cache.redis_config import DomainCacheConfig
+
+TRATAMIENTOS = 1000
+REPETICIONES = 5
+
+def build_client(fake: bool) -> redis.Redis:
+    if fake:
+        import fakeredis
+        return fakeredis.FakeRedis(decode_responses=True)
+    return redis.Redis(
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=int(os.getenv('REDIS_PORT', 6379)),
+        db=int(os.getenv('REDIS_BENCH_DB', 15)),  # Base de datos aparte: se vacía al terminar
+        decode_responses=True
+    )
+
+def populate(manager: DomainCacheConfig, total_keys: int):
+    """Llena el cache con entradas de detalle de tratamiento etiquetadas (mismo índice que set_cache)"""
+    manager.redis_client.flushdb()
+    pipe = manager.redis_client.pipeline(transaction=False)
+    for i in range(total_keys):
+        tratamiento_id = i % TRATAMIENTOS
+        cache_key = manager.get_cache_key("data", f"tratamientos_:{tratamiento_id}:{i}")
+        manager._queue_set(pipe, cache_key, '{"id": %d}' % tratamiento_id, 600, [f"tratamiento:{tratamiento_id}"])
+        if i % 10000 == 9999:
+            pipe.execute()
+    pipe.execute()
+
+def assert_invalidated(manager: DomainCacheConfig, total_keys: int, first_id: int):
+    """Comprueba que las entradas y el índice de los tratamientos invalidados ya no existen"""
+    for tratamiento_id in range(first_id, first_id + REPETICIONES):
+        cache_keys = [manager.get_cache_key("data", f"tratamientos_:{tratamiento_id}:{i}")
+                      for i in range(tratamiento_id, total_keys, TRATAMIENTOS)]
+        remaining = manager.redis_client.exists(manager.get_tag_key(f"tratamiento:{tratamiento_id}"), *cache_keys)
+        if remaining:
+            raise SystemExit(f"La invalidación del tratamiento {tratamiento_id} dejó {remaining} claves")
+
+def invalidate_with_keys(manager: DomainCacheConfig, tratamiento_id: int):
+    """Implementación anterior: KEYS recorre todo el keyspace y bloquea Redis"""
+    keys = manager.redis_client.keys(f"{manager.domain_prefix}:data:tratamientos_:{tratamiento_id}:*")
+    if keys:
+        manager.redis_client.delete(*keys)
+
+def measure(func, manager: DomainCacheConfig, first_id: int) -> float:
+    """Latencia media en ms invalidando REPETICIONES tratamientos distintos"""
+    start = time.perf_counter()
+    for offset in range(REPETICIONES):
+        func(manager, first_id + offset)
+    return (time.perf_counter() - start) * 1000 / REPETICIONES
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fake', action='store_true', help='usar fakeredis en lugar de un Redis real')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    manager = DomainCacheConfig("beauty_", l1_enabled=False)
+    manager.redis_client = build_client(args.fake)
+    manager._invalidate_tags_script = manager.redis_client.register_script(
+        manager._invalidate_tags_script.script
+    )
+
+    print(f"{'claves':>10} | {'KEYS (ms)':>10} | {'etiquetas (ms)':>14}")
+    for size in args.sizes:
+        populate(manager, size)
+        keys_ms = measure(invalidate_with_keys, manager, 0)
+        tags_ms = measure(lambda m, t: m.invalidate_tags(f"tratamiento:{t}"), manager, REPETICIONES)
+        # Si invalidate_tags fallara se estaría midiendo el camino de error
+        assert_invalidated(manager, size, REPETICIONES)
+        print(f"{size:>10} | {keys_ms:>10.2f} | {tags_ms:>14.2f}")
+
+    manager.redis_client.flushdb()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_logging.py
+"""
+Coste por request del logging de DomainLogger visto desde el event loop: FileHandler
+síncrono con dos json.dumps (versión anterior) frente a AsyncLogWriter con una sola
+serialización y escritura en lotes en un hilo. Además compara el volumen de líneas con y
+sin muestreo para una mezcla de tráfico con 2% de errores y 1% de requests lentos.
+
+Uso:
+    python -m benchmarks.bench_logging [--requests 20000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from app.middleware.domain_logger import DomainLogger
+from app.middleware.log_writer import AsyncLogWriter
+
+REQUEST_DATA = {"timestamp": 1760000000.0, "path": "/beauty_/historial/42", "method": "GET",
+                "client_ip": "10.0.0.8", "user_agent": "Mozilla/5.0 (Clinica Estetica)", "entity_type": "cliente"}
+
+def bench_legacy(directory: str, total: int) -> float:
+    logger = logging.getLogger("bench_logging_legacy")
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(os.path.join(directory, "legacy.log"))
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    start = time.perf_counter()
+    for _ in range(total):
+        logger.log(logging.INFO, f"REQUEST_START: {json.dumps(REQUEST_DATA)}")
+        logger.log(logging.INFO, f"REQUEST_END: {json.dumps({**REQUEST_DATA, 'status_code': 200, 'process_time': 0.004})}")
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return elapsed * 1e6 / total
+
+def bench_async(directory: str, total: int, policy: str):
+    writer = AsyncLogWriter(os.path.join(directory, f"async_{policy}.log"), capacity=total * 2, policy=policy)
+    logger = DomainLogger(None, "beauty_", writer=writer)
+    start = time.perf_counter()
+    for _ in range(total):
+        data = logger._serialize(REQUEST_DATA)
+        logger._emit("REQUEST_START", "INFO", data)
+        logger._emit("REQUEST_END", "INFO", data, ',"status_code":200,"process_time":0.004')
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return elapsed * 1e6 / total, writer.get_stats()
+
+async def bench_sampling_volume(directory: str, total: int, sampling: bool):
+    """Líneas escritas para `total` requests a /historial y /citas/book"""
+    app = FastAPI()
+
+    @app.get("/beauty_/clientes/{cliente_id}/historial")
+    @app.post("/beauty_/citas/book/{cliente_id}")
+    async def endpoint(cliente_id: int):
+        roll = random.random()
+        if roll < 0.02:
+            return JSONResponse({"detail": "error"}, status_code=500)
+        if roll < 0.03:
+            await asyncio.sleep(0.03)
+        return {"cliente_id": cliente_id}
+
+    writer = AsyncLogWriter(os.path.join(directory, f"sampling_{sampling}.log"), capacity=total * 4)
+    logger = DomainLogger(app, "beauty_", writer=writer)
+    logger.sampling_enabled = sampling
+    logger.slow_threshold = 0.02
+    random.seed(3)
+    transport = httpx.ASGITransport(app=logger)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(total):
+            if i % 2:
+                await client.get(f"/beauty_/clientes/{i}/historial")
+            else:
+                await client.post(f"/beauty_/citas/book/{i}")
+    writer.close()
+    return logger.get_log_stats()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+
+    print(f"{'estrategia':<32} | {'µs por request':>14} | {'lotes':>6} | {'descartes':>9}")
+    legacy_us = bench_legacy(directory, args.requests)
+    print(f"{'FileHandler síncrono (anterior)':<32} | {legacy_us:>14.2f} | {'-':>6} | {'-':>9}")
+    for policy in ('drop_newest', 'block'):
+        async_us, stats = bench_async(directory, args.requests, policy)
+        print(f"{'AsyncLogWriter ' + policy:<32} | {async_us:>14.2f} | {stats['batches']:>6} | {stats['dropped']:>9}")
+
+    print(f"\n{'muestreo':<10} | {'líneas':>7} | {'errores+lentos conservados':>26}")
+    for sampling in (False, True):
+        stats = asyncio.run(bench_sampling_volume(directory, args.requests // 10, sampling))
+        kept_tail = stats['kept_error'] + stats['kept_slow']
+        print(f"{'sí' if sampling else 'no':<10} | {stats['written']:>7} | {kept_tail:>26}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_middleware.py
+"""
+Throughput y latencia de los tres middlewares de dominio apilados: versión anterior
+(BaseHTTPMiddleware) frente a la versión ASGI pura. Ambas ejecutan exactamente las
+mismas validaciones; solo cambia la forma de engancharse al request.
+
+Uso:
+    python -m benchmarks.bench_middleware        # requiere fakeredis y lupa para el rate limiter
+"""
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+import fakeredis
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.middleware.domain_logger import DomainLogger
+from app.middleware.domain_rate_limiter import DomainRateLimiter
+from app.middleware.domain_validator import DomainValidator
+
+PETICIONES = 2000
+CONCURRENCIA = 50
+HEADERS = {"X-Beauty-Cliente-ID": "5"}
+
+class BenchRateLimiter(DomainRateLimiter):
+    """Límites altos para medir solo el coste del middleware, no los 429"""
+    def _get_domain_rate_limits(self, domain_prefix):
+        return {category: {"requests": 10 ** 9, "window": 60}
+                for category in ("availability", "booking", "history", "admin", "general")}
+
+class BenchValidator(DomainValidator):
+    """Ignora el horario de atención para que el benchmark funcione a cualquier hora"""
+    def _validate_business_hours(self, path):
+        return True
+
+def legacy_file_logger() -> logging.Logger:
+    """Logger síncrono con FileHandler, como lo configuraba DomainLogger antes"""
+    logger = logging.getLogger("bench_legacy_domain_logger")
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        handler = logging.FileHandler("logs/beauty_legacy_domain.log")
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        logger.addHandler(handler)
+    return logger
+
+async def legacy_logger_dispatch(impl: DomainLogger, request, call_next):
+    start_time = time.time()
+    path = request.url.path
+    should_log, log_level = impl._should_log_endpoint(path)
+    if not should_log:
+        return await call_next(request)
+    request_data = impl._extract_domain_specific_data(request, path)
+    logger = legacy_file_logger()
+    logger.log(getattr(logging, log_level), f"REQUEST_START: {json.dumps(request_data)}")
+    response = await call_next(request)
+    response_data = {**request_data, "status_code": response.status_code,
+                     "process_time": round(time.time() - start_time, 3)}
+    logger.log(getattr(logging, log_level), f"REQUEST_END: {json.dumps(response_data)}")
+    return response
+
+async def legacy_rate_limiter_dispatch(impl: DomainRateLimiter, request, call_next):
+    category = impl._get_rate_limit_category(request.url.path, request.method)
+    result = await impl._check_rate_limit(request.client.host, category, impl.rate_limits[category])
+    response = await call_next(request)
+    response.headers.update(result.headers())
+    return response
+
+async def legacy_validator_dispatch(impl: DomainValidator, request, call_next):
+    error_response = impl._validate(request, request.url.path)
+    if error_response is not None:
+        return error_response
+    return await call_next(request)
+
+def legacy(asgi_cls, dispatch):
+    """Envuelve la lógica del middleware en BaseHTTPMiddleware, como antes de la migración"""
+    class Legacy(BaseHTTPMiddleware):
+        def __init__(self, app, **options):
+            super().__init__(app)
+            self.impl = asgi_cls(app, **options)
+
+        async def dispatch(self, request, call_next):
+            return await dispatch(self.impl, request, call_next)
+    return Legacy
+
+def build_app(pure_asgi: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/beauty_/historial/{cliente_id}")
+    async def historial(cliente_id: int):
+        return {"cliente_id": cliente_id, "procedimientos": []}
+
+    redis_client = fakeredis.FakeAsyncRedis()
+    if pure_asgi:
+        stack = [(BenchValidator, {}), (BenchRateLimiter, {"redis_client": redis_client}), (DomainLogger, {})]
+    else:
+        stack = [(legacy(BenchValidator, legacy_validator_dispatch), {}),
+                 (legacy(BenchRateLimiter, legacy_rate_limiter_dispatch), {"redis_client": redis_client}),
+                 (legacy(DomainLogger, legacy_logger_dispatch), {})]
+    for middleware_cls, options in stack:
+        app.add_middleware(middleware_cls, domain_prefix="beauty_", **options)
+    return app
+
+async def measure(app: FastAPI):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Latencia secuencial
+        latencies = []
+        for i in range(PETICIONES // 4):
+            start = time.perf_counter()
+            await client.get(f"/beauty_/historial/{i}", headers=HEADERS)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # Throughput con requests concurrentes
+        semaphore = asyncio.Semaphore(CONCURRENCIA)
+
+        async def one(i):
+            async with semaphore:
+                await client.get(f"/beauty_/historial/{i}", headers=HEADERS)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(PETICIONES)])
+        rps = PETICIONES / (time.perf_counter() - start)
+
+    latencies.sort()
+    return rps, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+async def main():
+    # DomainLogger escribe en logs/: se trabaja en un directorio temporal
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("logs", exist_ok=True)
+
+    print(f"{'middlewares':<22} | {'req/s':>8} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    for label, pure_asgi in (("BaseHTTPMiddleware", False), ("ASGI puro", True)):
+        rps, p50, p99 = await measure(build_app(pure_asgi))
+        print(f"{label:<22} | {rps:>8.0f} | {p50:>9.3f} | {p99:>9.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
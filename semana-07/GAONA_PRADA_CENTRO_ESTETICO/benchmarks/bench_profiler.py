@@ -0,0 +1,83 @@
+# benchmarks/bench_profiler.py
+"""
+Sobrecoste de APIProfiler.profile_function por llamada: cProfile + pstats en cada request
+(modo anterior) frente al modo por muestreo inactivo, activo al 1 de cada 10 y activo
+para todos los requests a 100 Hz. Luego compara el perfil de memoria: memory_profiler
+(decorador anterior, trazado línea a línea) frente a tracemalloc muestreado.
+
+Uso:
+    python -m benchmarks.bench_profiler [--calls 2000]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from monitoring.profiler import APIProfiler
+
+def trabajo():
+    """Simula la lógica de un endpoint (~50 µs de CPU con varias llamadas anidadas)"""
+    return "".join(sorted(str(i * 7919 % 1000) for i in range(120)))
+
+async def run(profiler: APIProfiler, calls: int) -> float:
+    endpoint = profiler.profile_function("crear_cita")(trabajo)
+    await endpoint()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await endpoint()
+    return (time.perf_counter() - start) * 1e6 / calls
+
+async def run_memory(decorated, calls: int) -> float:
+    await decorated()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await decorated()
+    return (time.perf_counter() - start) * 1e6 / calls
+
+async def bench_memory(calls: int, base_us: float):
+    async def endpoint():
+        return trabajo()
+
+    cases = []
+    try:
+        from memory_profiler import profile
+        # memory_profiler imprime su reporte en cada llamada: se descarta la salida
+        cases.append(("memory_profiler (anterior)", profile(endpoint, stream=io.StringIO())))
+    except ImportError:
+        print("memory_profiler no instalado: se omite el modo anterior")
+    for every in (1, 10, 100):
+        profiler = APIProfiler(domain="beauty_")
+        cases.append((f"tracemalloc 1 de cada {every}", profiler.profile_memory("crear_cita", sample_every=every)(endpoint)))
+
+    print(f"\n{'memoria':<32} | {'µs por llamada':>14} | {'sobrecoste':>10}")
+    for label, decorated in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            micros = await run_memory(decorated, calls // 10 if "anterior" in label else calls)
+        print(f"{label:<32} | {micros:>14.1f} | {micros / base_us:>9.1f}x")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        trabajo()
+    base_us = (time.perf_counter() - start) * 1e6 / args.calls
+    print(f"{'modo':<32} | {'µs por llamada':>14} | {'sobrecoste':>10}")
+    print(f"{'sin profiler':<32} | {base_us:>14.1f} | {'-':>10}")
+
+    cases = [("cProfile por llamada (anterior)", "cprofile", None), ("muestreo inactivo", "sampling", None),
+             ("muestreo 1 de cada 10", "sampling", {"one_in": 10}), ("muestreo siempre (100 Hz)", "sampling", {"seconds": 600})]
+    for label, mode, activation in cases:
+        profiler = APIProfiler(domain="beauty_", mode=mode)
+        if activation:
+            profiler.activate_sampling(**activation)
+        micros = await run(profiler, args.calls)
+        profiler.sampler.stop()
+        print(f"{label:<32} | {micros:>14.1f} | {micros / base_us:>9.1f}x")
+
+    await bench_memory(args.calls, base_us)
+
+if __name__ == "__main__":
+    asyncio.run(main())
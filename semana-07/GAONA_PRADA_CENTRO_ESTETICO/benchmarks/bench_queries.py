@@ -0,0 +1,82 @@
+# benchmarks/bench_queries.py
+"""
+Sobrecoste por llamada de OptimizedBeautyService sobre SQLite en memoria: construir
+text() en cada llamada y copiar cada fila a un dict (versión anterior, con
+dict(row._mapping) porque dict(row) falla en SQLAlchemy 2) frente al registro de
+sentencias con parámetros tipados y resultados como RowMapping o tuplas.
+
+Uso:
+    python -m benchmarks.bench_queries [--calls 5000] [--citas 2000]
+"""
+import argparse
+import random
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from app.database.optimized_queries import BEAUTY_QUERIES
+from app.services.beauty_services import OptimizedBeautyService
+
+SCHEMA = [
+    "CREATE TABLE beauty_esteticistas (id INTEGER PRIMARY KEY, nombre TEXT)",
+    "CREATE TABLE beauty_tratamientos (id INTEGER PRIMARY KEY, nombre_tratamiento TEXT)",
+    "CREATE TABLE beauty_citas (id INTEGER PRIMARY KEY, tratamiento_id INTEGER, esteticista_id INTEGER, "
+    "fecha_cita TEXT, hora_inicio TEXT, estado TEXT)",
+    "CREATE INDEX idx_beauty_citas_esteticista_fecha ON beauty_citas(esteticista_id, fecha_cita)",
+]
+
+def build_engine(citas: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    random.seed(25)
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO beauty_esteticistas VALUES (:id, :nombre)"),
+                           [{"id": i, "nombre": f"Esteticista {i}"} for i in range(1, 11)])
+        connection.execute(text("INSERT INTO beauty_tratamientos VALUES (:id, :nombre)"),
+                           [{"id": i, "nombre": f"Tratamiento {i}"} for i in range(1, 21)])
+        connection.execute(text("INSERT INTO beauty_citas VALUES (:id, :t, :e, :f, :h, :estado)"), [
+            {"id": i, "t": random.randint(1, 20), "e": random.randint(1, 10),
+             "f": f"2025-01-{random.randint(10, 12)}", "h": f"{random.randint(9, 19):02d}:00",
+             "estado": random.choice(["disponible", "completada"])}
+            for i in range(citas)
+        ])
+    return engine
+
+def legacy_call(db: Session, fecha: str, esteticista_id: int):
+    """Versión anterior: dict de consultas por instancia, text() y copia a dict por llamada"""
+    queries = dict(BEAUTY_QUERIES)
+    result = db.execute(text(queries['citas_disponibles']), {"fecha_cita": fecha, "esteticista_id": esteticista_id})
+    return [dict(row._mapping) for row in result]
+
+def measure(label: str, calls: int, call) -> float:
+    for _ in range(50):
+        call()
+    began = time.perf_counter()
+    for _ in range(calls):
+        call()
+    elapsed = (time.perf_counter() - began) / calls * 1e6
+    print(f"{label:<36} | {elapsed:>9.1f}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--citas", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = build_engine(args.citas)
+    with Session(engine) as db:
+        rows = len(OptimizedBeautyService(db).get_citas_disponibles("2025-01-10", 3))
+        print(f"citas_disponibles: {rows} filas por llamada, {args.calls} llamadas")
+        print(f"{'estrategia':<36} | {'µs/llamada':>9}")
+        legacy = measure("text() por llamada + dict por fila", args.calls,
+                         lambda: legacy_call(db, "2025-01-10", 3))
+        mapped = measure("registro + RowMapping", args.calls,
+                         lambda: OptimizedBeautyService(db).get_citas_disponibles("2025-01-10", 3))
+        tuples = measure("registro + tuplas", args.calls,
+                         lambda: OptimizedBeautyService(db).get_citas_disponibles("2025-01-10", 3, as_tuples=True))
+        print(f"ahorro por llamada: {legacy - mapped:.1f} µs (RowMapping), {legacy - tuples:.1f} µs (tuplas)")
+
+if __name__ == "__main__":
+    main()
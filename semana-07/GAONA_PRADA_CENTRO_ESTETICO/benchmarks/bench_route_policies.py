@@ -0,0 +1,63 @@
+# benchmarks/bench_route_policies.py
+"""
+Clasificación de rutas con ~1000 patrones registrados: escaneo lineal por subcadena
+(comportamiento anterior de los middlewares) vs RoutePolicyMatcher en frío (rutas
+distintas, sin LRU) y en caliente (rutas repetidas, servidas por el LRU).
+
+Uso:
+    python -m benchmarks.bench_route_policies [--patterns 1000]
+"""
+import argparse
+import random
+import timeit
+from app.middleware.route_policies import RoutePolicyMatcher
+
+ITERACIONES = 2000
+
+def build_patterns(total: int):
+    """Patrones con la forma de las rutas del dominio, repartidos entre las cuatro políticas"""
+    recursos = ["procedimientos", "citas", "clientes", "esteticistas", "tratamientos", "admin", "precios"]
+    acciones = ["create", "update", "historial", "book", "cancel", "disponibles", "reporte", "export"]
+    patterns = [f"/{recurso}/{accion}/v{i}" for i, (recurso, accion) in
+                enumerate((random.choice(recursos), random.choice(acciones)) for _ in range(total))]
+    quarter = total // 4
+    return {
+        "log_levels": {pattern: "INFO" for pattern in patterns[:quarter]},
+        "rate_limit_categories": [(pattern, "general") for pattern in patterns[quarter:2 * quarter]],
+        "consent_required": patterns[2 * quarter:3 * quarter],
+        "restricted_days": patterns[3 * quarter:]
+    }
+
+def linear_resolve(config, path):
+    """Equivalente a los escaneos previos: un bucle `in` por cada middleware"""
+    level = next((level for pattern, level in config["log_levels"].items() if pattern in path), None)
+    category = next((category for pattern, category in config["rate_limit_categories"] if pattern in path), "general")
+    consent = any(pattern in path for pattern in config["consent_required"])
+    restricted = any(pattern in path for pattern in config["restricted_days"])
+    return level, category, consent, restricted
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patterns", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    config = build_patterns(args.patterns)
+    cold = RoutePolicyMatcher(**config, cache_size=0)
+    warm = RoutePolicyMatcher(**config)
+    paths = [f"/beauty_/clientes/{i}/historial/2025-10-{1 + i % 28:02d}" for i in range(ITERACIONES)]
+    hot_path = paths[0]
+    warm.resolve(hot_path)
+
+    linear_us = timeit.timeit(lambda: [linear_resolve(config, p) for p in paths], number=1) * 1e6 / ITERACIONES
+    cold_us = timeit.timeit(lambda: [cold.resolve(p) for p in paths], number=1) * 1e6 / ITERACIONES
+    warm_us = timeit.timeit(lambda: warm.resolve(hot_path), number=ITERACIONES) * 1e6 / ITERACIONES
+
+    print(f"patrones registrados: {args.patterns}")
+    print(f"{'estrategia':<28} | {'µs por ruta':>11}")
+    print(f"{'escaneo lineal (anterior)':<28} | {linear_us:>11.2f}")
+    print(f"{'trie en frío':<28} | {cold_us:>11.2f}")
+    print(f"{'trie + LRU en caliente':<28} | {warm_us:>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_serializers.py
+"""
+Tiempo de encode/decode y bytes almacenados por cada codec del cache, usando
+payloads con la forma real de los endpoints de la Clínica Estética.
+
+Uso:
+    python -m benchmarks.bench_serializers
+"""
+import json
+import timeit
+from app.cache import serializers
+from app.cache.serializers import CacheCodec
+
+ITERACIONES = 2000
+
+def build_payloads():
+    """Payloads con la misma forma que devuelven los endpoints de beauty_optimized"""
+    citas = [
+        {"id": i, "fecha": f"2025-10-{1 + i % 7:02d}", "hora": f"{9 + i % 11}:{'00' if i % 2 else '30'}",
+         "tratamiento": "Limpieza Facial", "esteticista": "Sofía"}
+        for i in range(150)
+    ]
+    catalogo = [
+        {"id": i, "nombre": f"Tratamiento {i}", "descripcion": "Exfoliación, vapor, extracción e hidratación",
+         "duracion_minutos": 60 + i % 4 * 15, "precio": 85.50 + i}
+        for i in range(80)
+    ]
+    historial = [
+        {"fecha_procedimiento": f"2025-0{1 + i % 9}-15", "nombre_tratamiento": "Masaje de Piedras Calientes",
+         "observaciones": "Sin reacciones adversas, piel hidratada", "esteticista_nombre": "Laura"}
+        for i in range(20)
+    ]
+    configuracion = {"horario_apertura": "09:00", "horario_cierre": "20:00", "telefono": "+573101234567"}
+    return {"citas_disponibles": citas, "catalogo_servicios": catalogo,
+            "historial_cliente": historial, "configuracion_clinica": configuracion}
+
+def build_codecs():
+    codecs = {"json (legacy)": None, "json": CacheCodec('json'), "json+zlib": CacheCodec('json', 'zlib')}
+    if serializers.lz4_frame is not None:
+        codecs["json+lz4"] = CacheCodec('json', 'lz4')
+    if serializers.msgpack is not None:
+        codecs["msgpack"] = CacheCodec('msgpack')
+        codecs["msgpack+zlib"] = CacheCodec('msgpack', 'zlib')
+    return codecs
+
+def main():
+    print(f"backend JSON: {'orjson' if serializers.orjson is not None else 'json (stdlib)'}")
+    print(f"{'payload':<22} | {'codec':<14} | {'encode (µs)':>11} | {'decode (µs)':>11} | {'bytes':>7}")
+    for name, payload in build_payloads().items():
+        for codec_name, codec in build_codecs().items():
+            if codec is None:
+                # Comportamiento anterior: json.dumps / json.loads sobre texto
+                encode, decode = json.dumps, json.loads
+            else:
+                encode, decode = codec.encode, codec.decode
+            encoded = encode(payload)
+            encode_us = timeit.timeit(lambda: encode(payload), number=ITERACIONES) * 1e6 / ITERACIONES
+            decode_us = timeit.timeit(lambda: decode(encoded), number=ITERACIONES) * 1e6 / ITERACIONES
+            stored = len(encoded.encode() if isinstance(encoded, str) else encoded)
+            print(f"{name:<22} | {codec_name:<14} | {encode_us:>11.1f} | {decode_us:>11.1f} | {stored:>7}")
+
+if __name__ == "__main__":
+    main()
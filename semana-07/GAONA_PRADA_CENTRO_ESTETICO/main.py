@@ -1,9 +1,16 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from prometheus_fastapi_instrumentator import Instrumentator
-from monitoring.metrics import APIMetrics, monitor_performance
+from monitoring.metricts import APIMetrics, monitor_performance, route_template
 from monitoring.profiler import APIProfiler
 from monitoring.alerts import AlertManager, AlertRule, email_alert
-import asyncio
+from monitoring.alert_dispatcher import AlertDispatcher
+from monitoring.system_collector import SystemMetricsCollector
+from app.cache.metrics import cache_metrics
+from app.cache.domain_estrategies import DomainSpecificCaching
+from contextlib import asynccontextmanager
+import hmac
+import os
 import time
 
 # Configuración según tu dominio asignado
@@ -13,7 +20,23 @@ DOMAIN_CONFIG = {
     "entity": "cita"
 }
 
-app = FastAPI(title=f"API {DOMAIN_CONFIG['entity']}")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Recolector de métricas del sistema: psutil en un hilo, alimenta las alertas
+    await alert_dispatcher.start()
+    await system_collector.start()
+    # Métricas de cache: contadores locales enviados a Redis en un pipeline periódico
+    await cache_metrics.start()
+    # Precalentamiento del cache al arrancar (en segundo plano salvo CACHE_WARMUP_STARTUP_TIMEOUT > 0)
+    # y antes de cada expiración
+    await DomainSpecificCaching.implement_domain_cache()
+    yield
+    await DomainSpecificCaching.stop_domain_cache()
+    await cache_metrics.stop()
+    await system_collector.stop()
+    await alert_dispatcher.stop()
+
+app = FastAPI(title=f"API {DOMAIN_CONFIG['entity']}", lifespan=lifespan)
 
 # Inicializar sistemas de monitoring
 metrics = APIMetrics(
@@ -23,7 +46,9 @@ metrics = APIMetrics(
 
 profiler = APIProfiler(domain=DOMAIN_CONFIG["domain"])
 
-alert_manager = AlertManager(domain=DOMAIN_CONFIG["domain"])
+# Las acciones de alerta se envían en digest desde workers, sin bloquear el loop de métricas
+alert_dispatcher = AlertDispatcher()
+alert_manager = AlertManager(domain=DOMAIN_CONFIG["domain"], dispatcher=alert_dispatcher)
 
 # Configurar Prometheus
 instrumentator = Instrumentator()
@@ -36,7 +61,10 @@ alert_manager.add_rule(AlertRule(
     threshold=2.0,  # 2 segundos
     comparison="gt",
     duration=60,    # 1 minuto
-    action=email_alert
+    action=email_alert,
+    aggregation="p95",
+    window=300,
+    clear_threshold=1.5
 ))
 
 alert_manager.add_rule(AlertRule(
@@ -45,7 +73,10 @@ alert_manager.add_rule(AlertRule(
     threshold=80.0,  # 80%
     comparison="gt",
     duration=120,    # 2 minutos
-    action=email_alert
+    action=email_alert,
+    aggregation="avg",
+    window=300,
+    clear_threshold=70.0
 ))
 
 # Middleware para métricas automáticas
@@ -57,21 +88,20 @@ async def metrics_middleware(request: Request, call_next):
 
     duration = time.time() - start_time
 
+    # Plantilla de la ruta (no el path con IDs) para acotar la cardinalidad de etiquetas
     metrics.record_request(
         method=request.method,
-        endpoint=str(request.url.path),
+        endpoint=route_template(request),
         status=response.status_code,
         duration=duration
     )
+    # Muestra para las reglas de alerta sobre response_time (se evalúan con cada recolección)
+    alert_manager.record("response_time", duration)
 
     return response
 
-# Tarea en background para métricas del sistema
-@asyncio.create_task
-async def update_system_metrics():
-    while True:
-        metrics.update_system_metrics()
-        await asyncio.sleep(30)  # Cada 30 segundos
+# Métricas del sistema en background (intervalo configurable con SYSTEM_METRICS_INTERVAL)
+system_collector = SystemMetricsCollector(metrics, alert_manager)
 
 # Endpoint para métricas personalizadas
 @app.get("/metrics-dashboard")
@@ -81,9 +111,33 @@ async def get_metrics_dashboard():
         "domain": DOMAIN_CONFIG["domain"],
         "entity": DOMAIN_CONFIG["entity"],
         "profiles": profiler.get_profile_report(),
+        "hot_functions": profiler.get_hot_functions(top_n=20),
+        "memory_profiles": profiler.get_memory_report(),
+        "system": system_collector.last_sample,
         "system_status": "healthy"
     }
 
+# Profiler por muestreo: exportación en formato collapsed y activación bajo demanda
+@app.get("/metrics-dashboard/flamegraph", response_class=PlainTextResponse)
+async def get_flamegraph(endpoint: str = None):
+    """Pilas muestreadas en formato collapsed (flamegraph.pl, speedscope)"""
+    return profiler.export_flamegraph(endpoint)
+
+# Activar el muestreo es una operación de administración: deshabilitada salvo que se
+# configure PROFILER_ADMIN_TOKEN, y en ese caso exige la cabecera X-Admin-Token
+PROFILER_ADMIN_TOKEN = os.getenv("PROFILER_ADMIN_TOKEN")
+
+@app.post("/metrics-dashboard/profiler/activate")
+async def activate_profiler(seconds: float = 30, one_in: int = None,
+                            x_admin_token: str = Header(default=None)):
+    """Muestrea durante `seconds` segundos y/o 1 de cada `one_in` requests"""
+    if not PROFILER_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, PROFILER_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+    profiler.activate_sampling(seconds=seconds, one_in=one_in)
+    return {"active": profiler.sampler.is_active(), "seconds": seconds, "one_in": profiler.sampler.sample_every}
+
 # Ejemplo de uso en endpoints existentes
 @app.post(f"/{DOMAIN_CONFIG['domain']}{DOMAIN_CONFIG['entity']}/")
 @profiler.profile_function(f"create_{DOMAIN_CONFIG['entity']}")
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from .alerts import AlertEvent, AlertRule
+
+class AlertDispatcher:
+    """
+    Despacho de acciones de alerta fuera del loop de métricas.
+
+    `submit` solo encola (nunca ejecuta la acción): las alertas de la misma regla dentro
+    de `dedup_window` se fusionan en un único evento con contador de repeticiones (las que
+    llegan cuando ese evento ya se envió se suman al siguiente evento de la regla), y las
+    de una misma acción se agrupan durante `group_window` segundos (o hasta `digest_max`)
+    en un digest. Los digest los entregan `workers` tareas; las acciones síncronas
+    (smtplib) corren en un hilo con asyncio.to_thread.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 1000, dedup_window: Optional[float] = None,
+                 group_window: Optional[float] = None, digest_max: int = 50):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.dedup_window = dedup_window if dedup_window is not None else float(os.getenv('ALERT_DEDUP_WINDOW', 60))
+        self.group_window = group_window if group_window is not None else float(os.getenv('ALERT_GROUP_WINDOW', 30))
+        self.digest_max = digest_max
+
+        # acción -> eventos pendientes de enviar y momento en que se abrió el grupo
+        self._groups: Dict[int, Tuple[object, List[AlertEvent], float]] = {}
+        # regla -> (evento pendiente o None si ya se envió, momento de aceptación)
+        self._last_accepted: Dict[str, Tuple[Optional[AlertEvent], float]] = {}
+        # regla -> repeticiones llegadas después de enviar su evento, a reportar en el siguiente
+        self._unreported: Dict[str, int] = {}
+        self._pending = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._work: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.stats = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'dropped': 0,
+            'digests_sent': 0,
+            'alerts_sent': 0,
+            'action_errors': 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    # --- Ciclo de vida ---
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._work = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._group_loop(), name="alert-grouper")]
+        self._tasks += [asyncio.create_task(self._worker(), name=f"alert-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Envía los grupos pendientes, espera a los workers y los detiene"""
+        if not self._tasks:
+            return
+        for key in list(self._groups):
+            self._flush(key)
+        try:
+            await asyncio.wait_for(self._work.join(), timeout)
+        except asyncio.TimeoutError:
+            print("Error deteniendo AlertDispatcher: quedaron digest sin enviar")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # --- Entrada ---
+
+    def submit(self, rule: AlertRule, value: float, timestamp: Optional[float] = None) -> bool:
+        """Registra un disparo; seguro desde el event loop o desde otro hilo"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        if self._loop is not None and threading.get_ident() != self._loop_thread:
+            self._loop.call_soon_threadsafe(self._submit, rule, value, timestamp)
+            return True
+        return self._submit(rule, value, timestamp)
+
+    def _submit(self, rule: AlertRule, value: float, timestamp: float) -> bool:
+        self.stats['submitted'] += 1
+        previous = self._last_accepted.get(rule.name)
+        if previous is not None and timestamp - previous[1] < self.dedup_window:
+            # Repetición dentro de la ventana: se suma al evento pendiente o, si ya salió, al siguiente
+            if previous[0] is not None:
+                previous[0].duplicates += 1
+            else:
+                self._unreported[rule.name] = self._unreported.get(rule.name, 0) + 1
+            self.stats['deduplicated'] += 1
+            return False
+
+        if self._pending >= self.max_pending:
+            self.stats['dropped'] += 1
+            return False
+
+        event = AlertEvent(rule, value, timestamp, duplicates=self._unreported.pop(rule.name, 0))
+        self._last_accepted[rule.name] = (event, timestamp)
+        key = id(rule.action)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = (rule.action, [], time.monotonic())
+            if self._wakeup is not None:
+                self._wakeup.set()
+        group[1].append(event)
+        self._pending += 1
+        if len(group[1]) >= self.digest_max:
+            self._flush(key)
+        return True
+
+    # --- Agrupación y entrega ---
+
+    def _flush(self, key: int):
+        action, events, _ = self._groups.pop(key)
+        self._pending -= len(events)
+        for event in events:
+            accepted = self._last_accepted.get(event.rule.name)
+            if accepted is not None and accepted[0] is event:
+                self._last_accepted[event.rule.name] = (None, accepted[1])
+        self._work.put_nowait((action, events))
+
+    async def _group_loop(self):
+        while True:
+            now = time.monotonic()
+            for key, (_, _, opened_at) in list(self._groups.items()):
+                if now - opened_at >= self.group_window:
+                    self._flush(key)
+            deadlines = [opened_at + self.group_window for _, _, opened_at in self._groups.values()]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            action, events = await self._work.get()
+            try:
+                await self._deliver(action, events)
+                self.stats['digests_sent'] += 1
+                self.stats['alerts_sent'] += len(events)
+            except Exception as e:
+                self.stats['action_errors'] += 1
+                print(f"Error enviando alertas ({len(events)}): {e}")
+            finally:
+                self._work.task_done()
+
+    async def _deliver(self, action, events: List[AlertEvent]):
+        """Acciones con send_digest reciben el lote; las demás, action(rule, value) por alerta"""
+        if hasattr(action, 'send_digest'):
+            await asyncio.to_thread(action.send_digest, events)
+            return
+        for event in events:
+            if asyncio.iscoroutinefunction(action):
+                await action(event.rule, event.value)
+            else:
+                await asyncio.to_thread(action, event.rule, event.value)
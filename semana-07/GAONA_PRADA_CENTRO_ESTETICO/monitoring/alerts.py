@@ -1,5 +1,10 @@
-from typing import Dict, List, Callable
+from typing import Dict, List, Callable, Optional, Tuple
+from array import array
 import asyncio
+import math
+import os
+import random
+from bisect import bisect_left
 import smtplib
 from email.mime.text import MIMEText
 from dataclasses import dataclass
@@ -13,12 +18,186 @@ class AlertRule:
    comparison: str  # 'gt', 'lt', 'eq'
    duration: int  # 3 segundos
    action: Callable
+   aggregation: str = 'last'  # 'last', 'avg', 'max', 'min', 'rate' o percentil 'p50', 'p95', 'p99'...
+   window: int = 60  # segundos de historia sobre los que se agrega
+   clear_threshold: Optional[float] = None  # histéresis: la alerta se resuelve al cruzar este valor
+   cooldown: int = 300  # segundos mínimos entre notificaciones de una alerta que sigue activa
+
+@dataclass
+class AlertEvent:
+   rule: AlertRule
+   value: float
+   timestamp: float
+   duplicates: int = 0  # disparos de la misma regla absorbidos por la deduplicación
+
+class MetricSeries:
+  """
+  Ring buffer por intervalos de tiempo (`resolution` segundos por bucket) con count, sum,
+  max, min y último valor, más una muestra uniforme (reservoir) de hasta `samples`
+  valores por bucket para los percentiles; memoria fija sin importar cuántas muestras lleguen
+  """
+
+  def __init__(self, buckets: int, resolution: float = 1.0, samples: int = 32):
+    self.size = buckets
+    self.resolution = resolution
+    self.reservoir = samples
+    self.samples = array('d', bytes(8 * buckets * samples))
+    self.epochs = array('q', [-1]) * buckets
+    self.counts = array('d', bytes(8 * buckets))
+    self.sums = array('d', bytes(8 * buckets))
+    self.maxs = array('d', bytes(8 * buckets))
+    self.mins = array('d', bytes(8 * buckets))
+    self.lasts = array('d', bytes(8 * buckets))
+
+  def add(self, value: float, timestamp: float):
+    epoch = int(timestamp // self.resolution)
+    index = epoch % self.size
+    if self.epochs[index] != epoch:
+      self.epochs[index] = epoch
+      self.counts[index] = 1
+      self.sums[index] = self.maxs[index] = self.mins[index] = self.lasts[index] = value
+      self.samples[index * self.reservoir] = value
+      return
+    self.counts[index] += 1
+    # Algoritmo R: la muestra n-ésima reemplaza a una guardada con probabilidad reservoir/n
+    count = int(self.counts[index])
+    slot = count - 1 if count <= self.reservoir else int(random.random() * count)
+    if slot < self.reservoir:
+      self.samples[index * self.reservoir + slot] = value
+    self.sums[index] += value
+    if value > self.maxs[index]:
+      self.maxs[index] = value
+    if value < self.mins[index]:
+      self.mins[index] = value
+    self.lasts[index] = value
+
+  def _slice(self, values: array, start: int, span: int) -> array:
+    end = start + span
+    if end <= self.size:
+      return values[start:end]
+    return values[start:] + values[:end - self.size]
+
+  def window_stats(self, window: float, now: float) -> Optional["WindowStats"]:
+    """Buckets vivos de los últimos `window` segundos, del más antiguo al más reciente"""
+    last_epoch = int(now // self.resolution)
+    span = min(self.size, max(1, math.ceil(window / self.resolution)))
+    first_epoch = last_epoch - span + 1
+    start = first_epoch % self.size
+
+    epochs = self._slice(self.epochs, start, span)
+    columns = [self._slice(values, start, span) for values in (self.counts, self.sums, self.maxs, self.mins, self.lasts)]
+    # Un bucket nunca tiene una época posterior a la esperada, así que si las sumas
+    # coinciden todos están vigentes; si no, hay buckets vacíos o de otra vuelta del ring
+    if sum(epochs) != span * (first_epoch + last_epoch) // 2:
+      valid = [i for i, epoch in enumerate(epochs) if epoch == first_epoch + i]
+      if not valid:
+        return None
+      epochs = array('q', [epochs[i] for i in valid])
+      columns = [array('d', [column[i] for i in valid]) for column in columns]
+    return WindowStats(self.resolution, epochs, *columns, series=self)
+
+class WindowStats:
+  """Agregados de una ventana; cada uno se calcula una sola vez y se comparte entre reglas"""
+
+  def __init__(self, resolution: float, epochs, counts, sums, maxs, mins, lasts, series: MetricSeries = None):
+    self.resolution = resolution
+    self.series = series
+    self.epochs = epochs
+    self.counts = counts
+    self.sums = sums
+    self.maxs = maxs
+    self.mins = mins
+    self.lasts = lasts
+    self._cache: Dict[str, float] = {}
+    self._sorted_samples: Optional[Tuple[List[float], Optional[List[float]]]] = None
+
+  def _samples(self) -> Tuple[List[float], Optional[List[float]]]:
+    """Muestras de la ventana ordenadas por valor y su peso (None si todas pesan 1)"""
+    if self._sorted_samples is None:
+      series = self.series
+      reservoir = series.reservoir
+      values: List[float] = []
+      weights: Optional[List[float]] = None
+      largest = max(self.counts)
+      if largest <= 1:
+        # Una muestra por bucket (ej. el colector a 1 Hz): es el último valor
+        values = sorted(self.lasts)
+      elif largest <= reservoir:
+        for epoch, count in zip(self.epochs, self.counts):
+          start = (epoch % series.size) * reservoir
+          values.extend(series.samples[start:start + int(count)])
+        values.sort()
+      else:
+        weighted = []
+        for epoch, count in zip(self.epochs, self.counts):
+          kept = min(int(count), reservoir)
+          start = (epoch % series.size) * reservoir
+          weight = count / kept
+          weighted.extend((value, weight) for value in series.samples[start:start + kept])
+        weighted.sort()
+        values = [value for value, _ in weighted]
+        weights = [weight for _, weight in weighted]
+      self._sorted_samples = (values, weights)
+    return self._sorted_samples
+
+  def tail(self, window: float, now: float) -> Optional["WindowStats"]:
+    """Subventana de los últimos `window` segundos sin volver a leer el ring buffer"""
+    first_epoch = int(now // self.resolution) - max(1, math.ceil(window / self.resolution)) + 1
+    start = bisect_left(self.epochs, first_epoch)
+    if start == 0:
+      return self
+    if start >= len(self.epochs):
+      return None
+    return WindowStats(self.resolution, self.epochs[start:], self.counts[start:], self.sums[start:],
+                       self.maxs[start:], self.mins[start:], self.lasts[start:], series=self.series)
+
+  def get(self, aggregation: str) -> float:
+    value = self._cache.get(aggregation)
+    if value is None:
+      value = self._cache[aggregation] = self._compute(aggregation)
+    return value
+
+  def _compute(self, aggregation: str) -> float:
+    if aggregation == 'last':
+      return self.lasts[-1]
+    if aggregation == 'avg':
+      return sum(self.sums) / sum(self.counts)
+    if aggregation == 'max':
+      return max(self.maxs)
+    if aggregation == 'min':
+      return min(self.mins)
+    if aggregation == 'rate':
+      # Variación por segundo entre el primer y el último bucket (contadores acumulados)
+      elapsed = (self.epochs[-1] - self.epochs[0]) * self.resolution
+      return (self.lasts[-1] - self.lasts[0]) / elapsed if elapsed else 0.0
+    if aggregation.startswith('p'):
+      # Percentil por rango más cercano sobre las muestras; si un bucket recibió más
+      # muestras de las que guarda, cada una pesa count / guardadas
+      values, weights = self._samples()
+      fraction = float(aggregation[1:]) / 100
+      if weights is None:
+        return values[max(0, math.ceil(fraction * len(values)) - 1)]
+      rank = fraction * sum(self.counts)
+      accumulated = 0.0
+      for value, weight in zip(values, weights):
+        accumulated += weight
+        if accumulated >= rank:
+          return value
+      return values[-1]
+    raise ValueError(f"Agregación no soportada: {aggregation}")
 
 class AlertManager:
-  def __init__(self, domain: str):
+  def __init__(self, domain: str, resolution: float = 1.0, dispatcher=None):
     self.domain = domain
+    # AlertDispatcher opcional: si está en marcha las acciones se encolan en lugar de ejecutarse aquí
+    self.dispatcher = dispatcher
     self.rules: List[AlertRule] = []
     self.alert_state: Dict[str, Dict] = {}
+    self.resolution = resolution
+    self.series: Dict[str, MetricSeries] = {}
+    # métrica -> ventana -> reglas: se lee el ring una vez por métrica (ventana más larga),
+    # las ventanas menores son sufijos y cada agregado se calcula una vez por ventana
+    self._rule_groups: Dict[str, Dict[int, List[AlertRule]]] = {}
 
   def add_rule(self, rule: AlertRule):
     """Añade una regla de alerta"""
@@ -26,22 +205,58 @@ class AlertManager:
     self.alert_state[rule.name] = {
         'triggered': False,
         'last_check': 0,
-        'trigger_count': 0
+        'trigger_count': 0,
+        'state': 'ok',
+        'pending_since': None,
+        'last_fired': None,
+        'last_value': None
     }
+    windows = self._rule_groups.setdefault(rule.metric_name, {})
+    windows.setdefault(rule.window, []).append(rule)
+    # De la ventana más larga a la más corta
+    self._rule_groups[rule.metric_name] = dict(sorted(windows.items(), reverse=True))
 
-  def check_alerts(self, metrics_data: Dict[str, float]):
-    """Verifica las reglas de alerta"""
-    current_time = time.time()
+    # La serie guarda la ventana más larga que pida cualquier regla sobre la métrica
+    buckets = math.ceil(rule.window / self.resolution) + 1
+    series = self.series.get(rule.metric_name)
+    if series is None or series.size < buckets:
+      self.series[rule.metric_name] = MetricSeries(buckets, self.resolution)
 
-    for rule in self.rules:
-      if rule.metric_name in metrics_data:
-        value = metrics_data[rule.metric_name]
-        should_trigger = self._evaluate_rule(rule, value)
+  def record(self, metric_name: str, value: float, timestamp: float = None):
+    """Registra una muestra; se ignoran métricas sin reglas"""
+    series = self.series.get(metric_name)
+    if series is not None:
+      series.add(value, timestamp if timestamp is not None else time.time())
 
-        if should_trigger:
-          self._handle_alert(rule, value, current_time)
-        else:
-          self._reset_alert(rule.name)
+  def check_alerts(self, metrics_data: Dict[str, float] = None, now: float = None):
+    """Registra las muestras recibidas y evalúa todas las reglas sobre sus ventanas"""
+    current_time = now if now is not None else time.time()
+
+    for metric_name, value in (metrics_data or {}).items():
+      if value is not None:
+        self.record(metric_name, value, current_time)
+
+    for metric_name, windows in self._rule_groups.items():
+      full_stats = self.series[metric_name].window_stats(next(iter(windows)), current_time)
+      if full_stats is None:
+        continue
+      for window, rules in windows.items():
+        stats = full_stats.tail(window, current_time)
+        if stats is not None:
+          self._evaluate_group(rules, stats, current_time)
+
+  def _evaluate_group(self, rules: List[AlertRule], stats: WindowStats, current_time: float):
+    """Evalúa todas las reglas que comparten métrica y ventana con los mismos agregados"""
+    for rule in rules:
+      value = stats.get(rule.aggregation)
+      state = self.alert_state[rule.name]
+      state['last_check'] = current_time
+      state['last_value'] = value
+
+      if self._evaluate_rule(rule, value):
+        self._handle_alert(rule, value, current_time)
+      elif self._should_clear(rule, value):
+        self._reset_alert(rule.name)
 
   def _evaluate_rule(self, rule: AlertRule, value: float) -> bool:
     """Evalúa si una regla debe disparar alerta"""
@@ -53,28 +268,108 @@ class AlertManager:
       return value == rule.threshold
     return False
 
+  def _should_clear(self, rule: AlertRule, value: float) -> bool:
+    """Histéresis: una alerta activa solo se resuelve al cruzar `clear_threshold`"""
+    if self.alert_state[rule.name]['state'] != 'firing' or rule.clear_threshold is None:
+      return True
+    if rule.comparison == 'gt':
+      return value <= rule.clear_threshold
+    elif rule.comparison == 'lt':
+      return value >= rule.clear_threshold
+    return True
+
   def _handle_alert(self, rule: AlertRule, value: float, current_time: float):
-    """Maneja el disparo de una alerta"""
+    """Maneja el disparo de una alerta: pendiente -> activa tras `duration`, con cooldown"""
     state = self.alert_state[rule.name]
 
     if not state['triggered']:
       state['triggered'] = True
       state['trigger_time'] = current_time
+      state['state'] = 'pending'
 
     # Verificar duración
     if current_time - state.get('trigger_time', 0) >= rule.duration:
-      rule.action(rule, value)
-      state['trigger_count'] += 1
+      state['state'] = 'firing'
+      last_fired = state['last_fired']
+      if last_fired is None or current_time - last_fired >= rule.cooldown:
+        state['last_fired'] = current_time
+        state['trigger_count'] += 1
+        if self.dispatcher is not None and self.dispatcher.running:
+          self.dispatcher.submit(rule, value, current_time)
+        else:
+          rule.action(rule, value)
 
   def _reset_alert(self, rule_name: str):
     """Resetea el estado de una alerta"""
     if rule_name in self.alert_state:
-      self.alert_state[rule_name]['triggered'] = False
+      state = self.alert_state[rule_name]
+      state['triggered'] = False
+      state['state'] = 'ok'
+      state['last_fired'] = None
 
 # Acciones de alerta
-def email_alert(rule: AlertRule, value: float):
-    """Envía alerta por email"""
-    print(f"🚨 ALERTA: {rule.name} - Valor: {value} (Umbral: {rule.threshold})")
+class EmailNotifier:
+  """
+  Acción de alerta por email. Con AlertDispatcher recibe las alertas agrupadas en un
+  digest (send_digest, ejecutado en un hilo); sin SMTP configurado solo las imprime
+  """
+
+  def __init__(self, host: Optional[str] = None, port: int = 25, sender: str = "alertas@beauty-clinic.local",
+               recipients: Optional[List[str]] = None, username: Optional[str] = None,
+               password: Optional[str] = None, use_tls: bool = False, timeout: float = 10.0):
+    self.host = host
+    self.port = port
+    self.sender = sender
+    self.recipients = recipients or []
+    self.username = username
+    self.password = password
+    self.use_tls = use_tls
+    self.timeout = timeout
+
+  @classmethod
+  def from_env(cls) -> "EmailNotifier":
+    recipients = [address.strip() for address in os.getenv('ALERT_EMAIL_TO', '').split(',') if address.strip()]
+    return cls(
+      host=os.getenv('SMTP_HOST') or None,
+      port=int(os.getenv('SMTP_PORT', 25)),
+      sender=os.getenv('ALERT_EMAIL_FROM', 'alertas@beauty-clinic.local'),
+      recipients=recipients,
+      username=os.getenv('SMTP_USERNAME') or None,
+      password=os.getenv('SMTP_PASSWORD') or None,
+      use_tls=os.getenv('SMTP_STARTTLS', 'false').lower() in ('1', 'true', 'yes')
+    )
+
+  def __call__(self, rule: AlertRule, value: float):
+    """Compatibilidad con action(rule, value): una alerta = un digest de un elemento"""
+    self.send_digest([AlertEvent(rule, value, time.time())])
+
+  def build_message(self, alerts: List[AlertEvent]) -> MIMEText:
+    lines = []
+    for alert in alerts:
+      when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert.timestamp))
+      repeated = f" (+{alert.duplicates} repeticiones)" if alert.duplicates else ""
+      lines.append(f"🚨 {when} {alert.rule.name} - {alert.rule.metric_name}={alert.value:.3f} "
+                   f"(Umbral: {alert.rule.threshold}){repeated}")
+    message = MIMEText("\n".join(lines), _charset='utf-8')
+    message['Subject'] = f"[ALERTA] {len(alerts)} alerta(s): {', '.join(sorted({alert.rule.name for alert in alerts}))}"
+    message['From'] = self.sender
+    message['To'] = ", ".join(self.recipients)
+    return message
+
+  def send_digest(self, alerts: List[AlertEvent]):
+    """Envía un único email con todas las alertas (bloqueante: se llama desde un hilo)"""
+    message = self.build_message(alerts)
+    if not self.host or not self.recipients:
+      print(message.get_payload(decode=True).decode('utf-8'))
+      return
+    with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+      if self.use_tls:
+        smtp.starttls()
+      if self.username:
+        smtp.login(self.username, self.password)
+      smtp.sendmail(self.sender, self.recipients, message.as_string())
+
+email_alert = EmailNotifier.from_env()
 
 def log_alert(rule: AlertRule, value: float):
     """Registra alerta en logs"""
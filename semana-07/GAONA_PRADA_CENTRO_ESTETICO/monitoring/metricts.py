@@ -1,79 +1,139 @@
 from prometheus_fastapi_instrumentator import Instrumentator
-from prometheus_client import Counter, Histogram, Gauge, Info
+from prometheus_client import Counter, Histogram, Gauge, Info, REGISTRY
+import os
 import psutil
+import threading
 import time
 from functools import wraps
+from typing import Optional
+
+# Etiquetas de endpoint reservadas: requests sin ruta y endpoints por encima del límite
+UNMATCHED_ENDPOINT = "__unmatched__"
+OVERFLOW_ENDPOINT = "__overflow__"
+
+def route_template(request) -> str:
+    """Plantilla de la ruta atendida (/citas/{cita_id}) en lugar del path con IDs concretos"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ENDPOINT
 
 class APIMetrics:
-    def __init__(self, app_name: str, domain: str):
+    def __init__(self, app_name: str, domain: str, max_endpoints: Optional[int] = None, registry=REGISTRY):
         self.app_name = app_name
         self.domain = domain
 
+        # Límite de cardinalidad: a partir de aquí los endpoints nuevos van a OVERFLOW_ENDPOINT
+        self.max_endpoints = max_endpoints or int(os.getenv('METRICS_MAX_ENDPOINTS', 200))
+        self._endpoints = set()
+        self._children_lock = threading.Lock()
+        # Hijos ya enlazados a sus etiquetas para evitar .labels() en cada request
+        self._counter_children = {}
+        self._histogram_children = {}
+
         # Métricas personalizadas por dominio 'beauty_'
         self.request_counter = Counter(
             f'{domain}_requests_total',
             'Total de requests por endpoint',
-            ['method', 'endpoint', 'status']
+            ['method', 'endpoint', 'status'],
+            registry=registry
         )
 
         self.response_time = Histogram(
             f'{domain}_response_duration_seconds',
             'Tiempo de respuesta por endpoint',
             ['method', 'endpoint'],
-            buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+            buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+            registry=registry
         )
 
         self.active_connections = Gauge(
             f'{domain}_active_connections',
-            'Conexiones activas'
+            'Conexiones activas',
+            registry=registry
         )
 
         self.system_metrics = {
-            'cpu_usage': Gauge(f'{domain}_cpu_usage_percent', 'Uso de CPU'),
-            'memory_usage': Gauge(f'{domain}_memory_usage_bytes', 'Uso de memoria'),
-            'disk_usage': Gauge(f'{domain}_disk_usage_percent', 'Uso de disco')
+            'cpu_usage': Gauge(f'{domain}_cpu_usage_percent', 'Uso de CPU', registry=registry),
+            'memory_usage': Gauge(f'{domain}_memory_usage_bytes', 'Uso de memoria', registry=registry),
+            'disk_usage': Gauge(f'{domain}_disk_usage_percent', 'Uso de disco', registry=registry),
+            'process_rss': Gauge(f'{domain}_process_rss_bytes', 'Memoria residente del proceso', registry=registry),
+            'open_fds': Gauge(f'{domain}_process_open_fds', 'Descriptores de archivo abiertos', registry=registry),
+            'event_loop_lag': Gauge(f'{domain}_event_loop_lag_seconds', 'Retraso máximo del event loop en el intervalo', registry=registry),
+            'gc_pause_max': Gauge(f'{domain}_gc_pause_max_seconds', 'Pausa de GC más larga en el intervalo', registry=registry),
+            'gc_pause_total': Gauge(f'{domain}_gc_pause_total_seconds', 'Tiempo total en GC durante el intervalo', registry=registry)
         }
 
         # Métricas específicas del dominio 'beauty_'
-        self.business_metrics = self._create_business_metrics()
+        self.business_metrics = self._create_business_metrics(registry)
 
-    def _create_business_metrics(self):
+    def _create_business_metrics(self, registry=REGISTRY):
         """Crea métricas específicas para el dominio de Clínica Estética"""
         return {
             'citas_creadas': Counter(
                 f'{self.domain}_citas_creadas_total',
-                'Total de citas creadas'
+                'Total de citas creadas',
+                registry=registry
             ),
             'procedimientos_registrados': Counter(
                 f'{self.domain}_procedimientos_registrados_total',
                 'Total de procedimientos registrados',
-                ['tipo_procedimiento']
+                ['tipo_procedimiento'],
+                registry=registry
             ),
             'api_errors': Counter(
                 f'{self.domain}_api_errors_total',
                 'Total de errores de API',
-                ['error_type', 'endpoint']
+                ['error_type', 'endpoint'],
+                registry=registry
             )
         }
 
     def record_request(self, method: str, endpoint: str, status: int, duration: float):
         """Registra métricas de request"""
-        self.request_counter.labels(
-            method=method,
-            endpoint=endpoint,
-            status=status
-        ).inc()
-
-        self.response_time.labels(
-            method=method,
-            endpoint=endpoint
-        ).observe(duration)
-
-    def update_system_metrics(self):
-        """Actualiza métricas del sistema"""
-        self.system_metrics['cpu_usage'].set(psutil.cpu_percent())
-        self.system_metrics['memory_usage'].set(psutil.virtual_memory().used)
-        self.system_metrics['disk_usage'].set(psutil.disk_usage('/').percent)
+        endpoint = self._bounded_endpoint(endpoint)
+
+        counter = self._counter_children.get((method, endpoint, status))
+        if counter is None:
+            counter = self._counter_children.setdefault(
+                (method, endpoint, status),
+                self.request_counter.labels(method=method, endpoint=endpoint, status=status)
+            )
+        counter.inc()
+
+        histogram = self._histogram_children.get((method, endpoint))
+        if histogram is None:
+            histogram = self._histogram_children.setdefault(
+                (method, endpoint),
+                self.response_time.labels(method=method, endpoint=endpoint)
+            )
+        histogram.observe(duration)
+
+    def _bounded_endpoint(self, endpoint: str) -> str:
+        """Admite endpoints nuevos hasta max_endpoints; el resto comparte OVERFLOW_ENDPOINT"""
+        if endpoint in self._endpoints:
+            return endpoint
+        with self._children_lock:
+            if endpoint in self._endpoints:
+                return endpoint
+            if len(self._endpoints) >= self.max_endpoints:
+                return OVERFLOW_ENDPOINT
+            self._endpoints.add(endpoint)
+            return endpoint
+
+    def update_system_metrics(self, values: Optional[dict] = None):
+        """
+        Actualiza métricas del sistema. Con `values` (muestra de SystemMetricsCollector) solo
+        asigna los gauges; sin argumentos consulta psutil directamente (bloqueante)
+        """
+        if values is None:
+            values = {
+                'cpu_usage': psutil.cpu_percent(),
+                'memory_usage': psutil.virtual_memory().used,
+                'disk_usage': psutil.disk_usage('/').percent
+            }
+        for name, value in values.items():
+            gauge = self.system_metrics.get(name)
+            if gauge is not None and value is not None:
+                gauge.set(value)
 
     def record_business_event(self, event_type: str, **kwargs):
         """Registra eventos de negocio específicos del dominio"""
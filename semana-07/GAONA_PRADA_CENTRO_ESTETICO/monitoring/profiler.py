@@ -1,21 +1,107 @@
 import cProfile
 import pstats
 import io
-from memory_profiler import profile
 from functools import wraps
+from array import array
+from collections import Counter
 import asyncio
+import math
+import os
+import sys
 import time
-from typing import Dict, Any
+import tracemalloc
+from typing import Dict, Any, List
+from .sampling_profiler import SamplingProfiler
+
+class ExecutionWindow:
+   """
+   Últimas `size` duraciones de una función en arrays de tamaño fijo (memoria acotada) y
+   llamadas por segundo de los últimos `rate_window` segundos, contadas aparte para que
+   la tasa no quede limitada por el tamaño del ring de duraciones
+   """
+
+   def __init__(self, size: int = 1024, rate_window: int = 60):
+      self.size = size
+      self.durations = array('d', bytes(8 * size))
+      self.index = 0
+      self.count = 0
+      self.total_calls = 0
+      self.sampled_calls = 0
+      self.rate_window = rate_window
+      self.second_epochs = array('q', [-1]) * rate_window
+      self.second_counts = array('q', bytes(8 * rate_window))
+
+   def add(self, duration: float, timestamp: float, sampled: bool = False):
+      self.durations[self.index] = duration
+      self.index = (self.index + 1) % self.size
+      self.count = min(self.count + 1, self.size)
+      self.total_calls += 1
+      self.sampled_calls += sampled
+
+      second = int(timestamp)
+      slot = second % self.rate_window
+      if self.second_epochs[slot] != second:
+         self.second_epochs[slot] = second
+         self.second_counts[slot] = 0
+      self.second_counts[slot] += 1
+
+   def last(self) -> float:
+      return self.durations[self.index - 1] if self.count else 0.0
+
+   def calls_per_second(self, now: float) -> float:
+      """Media de llamadas por segundo en los últimos `rate_window` segundos"""
+      current = int(now)
+      recent = sum(count for second, count in zip(self.second_epochs, self.second_counts)
+                   if current - self.rate_window < second <= current)
+      return recent / self.rate_window
+
+   def summary(self) -> Dict[str, Any]:
+      """Percentiles por rango más cercano sobre la ventana y llamadas por segundo recientes"""
+      values = sorted(self.durations[:self.count])
+      if not values:
+         return {'calls': 0}
+
+      def percentile(q: float) -> float:
+         return values[max(0, math.ceil(q * len(values)) - 1)]
+
+      return {
+         'calls': self.total_calls,
+         'window': len(values),
+         'sampled_calls': self.sampled_calls,
+         'last': round(self.last(), 6),
+         'p50': round(percentile(0.50), 6),
+         'p95': round(percentile(0.95), 6),
+         'p99': round(percentile(0.99), 6),
+         'max': round(values[-1], 6),
+         'mean': round(sum(values) / len(values), 6),
+         'calls_per_second': round(self.calls_per_second(time.time()), 3)
+      }
 
 class APIProfiler:
-   def __init__(self, domain: str):
+   def __init__(self, domain: str, mode: str = None, window_size: int = None):
       self.domain = domain
+      # func_id -> ExecutionWindow con las duraciones recientes
       self.profiles = {}
       self.memory_profiles = {}
+      self.window_size = window_size or int(os.getenv('PROFILER_WINDOW_SIZE', 1024))
+      # Estadísticas cProfile acumuladas entre llamadas (solo en modo 'cprofile')
+      self.cprofile_stats = {}
+      # Memoria: 1 de cada N requests por endpoint se mide con tracemalloc
+      self.memory_sample_every = int(os.getenv('PROFILER_MEMORY_SAMPLE_EVERY', 10))
+      self.memory_top_lines = 10
+      self._memory_calls = Counter()
+      self._memory_tracing = False
+      # 'sampling' (por defecto): muestreo de pilas en un hilo, apto para producción
+      # 'cprofile': cProfile en cada llamada, solo para depuración local
+      self.mode = mode or os.getenv('PROFILER_MODE', 'sampling')
+      self.sampler = SamplingProfiler.from_env()
 
    def profile_function(self, func_name: str = None):
       """Decorador para profiling de funciones"""
       def decorator(func):
+         if self.mode == 'sampling':
+            return self._sampling_wrapper(func, func_name or func.__name__)
+
          @wraps(func)
          async def wrapper(*args, **kwargs):
             func_id = func_name or func.__name__
@@ -35,39 +121,185 @@ class APIProfiler:
 
             pr.disable()
 
-            # Guardar profile
-            s = io.StringIO()
-            ps = pstats.Stats(pr, stream=s)
-            ps.sort_stats('cumulative')
-            ps.print_stats(20)  # Top 20 funciones
-
-            self.profiles[func_id] = {
-               'execution_time': execution_time,
-               'profile_data': s.getvalue(),
-               'timestamp': time.time()
-            }
+            # Acumular el profile con las llamadas anteriores en lugar de renderizar texto
+            if func_id in self.cprofile_stats:
+               self.cprofile_stats[func_id].add(pr)
+            else:
+               self.cprofile_stats[func_id] = pstats.Stats(pr, stream=io.StringIO())
 
+            self._record(func_id, execution_time, sampled=True)
             return result
          return wrapper
       return decorator
 
+   def _sampling_wrapper(self, func, func_id: str):
+      """Solo mide el tiempo; las pilas las captura el hilo muestreador si el request fue elegido"""
+      @wraps(func)
+      async def wrapper(*args, **kwargs):
+         frame = sys._getframe() if self.sampler.should_sample() else None
+         if frame is not None:
+            self.sampler.enter(frame, func_id)
+
+         start_time = time.time()
+         try:
+            if asyncio.iscoroutinefunction(func):
+               result = await func(*args, **kwargs)
+            else:
+               result = func(*args, **kwargs)
+         finally:
+            if frame is not None:
+               self.sampler.exit(frame)
+
+         self._record(func_id, time.time() - start_time, sampled=frame is not None)
+         return result
+      return wrapper
+
+   def _record(self, func_id: str, execution_time: float, sampled: bool):
+      window = self.profiles.get(func_id)
+      if window is None:
+         window = self.profiles[func_id] = ExecutionWindow(self.window_size)
+      window.add(execution_time, time.time(), sampled)
+
+   def activate_sampling(self, seconds: float = None, one_in: int = None):
+      """Activa el muestreo bajo demanda: durante `seconds` y/o para 1 de cada `one_in` requests"""
+      if seconds:
+         self.sampler.activate(seconds)
+      if one_in is not None:
+         self.sampler.sample_one_in(one_in)
+
+   def export_flamegraph(self, func_name: str = None) -> str:
+      """Pilas muestreadas en formato collapsed (flamegraph.pl / speedscope)"""
+      return self.sampler.collapsed(func_name)
+
    def get_profile_report(self, func_name: str = None) -> Dict[str, Any]:
-      """Obtiene reporte de profiling"""
+      """Obtiene reporte de profiling: percentiles y tasa de llamadas por función"""
+      if func_name:
+         window = self.profiles.get(func_name)
+         return window.summary() if window else {}
+      return {func_id: window.summary() for func_id, window in list(self.profiles.items())}
+
+   def get_hot_functions(self, top_n: int = 20) -> List[Dict[str, Any]]:
+      """Funciones más costosas acumuladas entre todas las llamadas perfiladas"""
+      if self.mode == 'sampling':
+         return self.sampler.top_functions(top_n)
+
+      merged = {}
+      for stats in list(self.cprofile_stats.values()):
+         for (filename, line, name), (_, calls, own_time, cumulative_time, _) in stats.stats.items():
+            key = f"{name} ({os.path.basename(filename)}:{line})"
+            entry = merged.setdefault(key, {'function': key, 'calls': 0, 'own_time': 0.0, 'cumulative_time': 0.0})
+            entry['calls'] += calls
+            entry['own_time'] += own_time
+            entry['cumulative_time'] += cumulative_time
+      hot = sorted(merged.values(), key=lambda entry: entry['own_time'], reverse=True)[:top_n]
+      for entry in hot:
+         entry['own_time'] = round(entry['own_time'], 6)
+         entry['cumulative_time'] = round(entry['cumulative_time'], 6)
+      return hot
+
+   def profile_memory(self, func_name: str = None, sample_every: int = None):
+      """
+      Decorador de asignaciones con tracemalloc para endpoints async o sync. Solo se mide
+      1 de cada `sample_every` llamadas y un request a la vez; tracemalloc es global al
+      proceso, así que con requests concurrentes las cifras incluyen su actividad
+      """
+      def decorator(func):
+         func_id = func_name or func.__name__
+         every = sample_every or self.memory_sample_every
+
+         @wraps(func)
+         async def wrapper(*args, **kwargs):
+            self._memory_calls[func_id] += 1
+            traced = not self._memory_tracing and self._memory_calls[func_id] % every == 0
+            if traced:
+               self._memory_tracing = True
+               started_here = not tracemalloc.is_tracing()
+               if started_here:
+                  tracemalloc.start()
+               tracemalloc.reset_peak()
+               # Si tracemalloc arranca con el request, todo lo trazado al final es del request
+               # y basta una foto; si ya estaba activo hace falta la foto inicial para restar
+               before_snapshot = None if started_here else tracemalloc.take_snapshot()
+               before_current, _ = tracemalloc.get_traced_memory()
+            try:
+               if asyncio.iscoroutinefunction(func):
+                  return await func(*args, **kwargs)
+               return func(*args, **kwargs)
+            finally:
+               if traced:
+                  try:
+                     current, peak = tracemalloc.get_traced_memory()
+                     after_snapshot = tracemalloc.take_snapshot()
+                     if before_snapshot is None:
+                        line_stats = after_snapshot.statistics('lineno')
+                     else:
+                        line_stats = after_snapshot.compare_to(before_snapshot, 'lineno')
+                     self._record_memory(func_id, peak - before_current, current - before_current, line_stats)
+                  finally:
+                     if started_here:
+                        tracemalloc.stop()
+                     self._memory_tracing = False
+         return wrapper
+      return decorator
+
+   def _record_memory(self, func_id: str, peak: int, net: int, line_stats):
+      """Acumula peak/net y las líneas que más asignan para el endpoint"""
+      excluded = (tracemalloc.__file__, __file__)
+      top_lines = []
+      for stat in line_stats:
+         # StatisticDiff (tracemalloc ya activo) o Statistic (tracemalloc iniciado con el request)
+         size = getattr(stat, 'size_diff', stat.size)
+         frame = stat.traceback[0]
+         if size > 0 and frame.filename not in excluded:
+            top_lines.append((f"{os.path.basename(frame.filename)}:{frame.lineno}", size))
+         if len(top_lines) >= self.memory_top_lines:
+            break
+
+      entry = self.memory_profiles.get(func_id)
+      if entry is None:
+         entry = self.memory_profiles[func_id] = {
+            'samples': 0,
+            'peak_bytes_max': 0,
+            'peak_bytes_total': 0,
+            'net_bytes_total': 0,
+            'top_lines': Counter()
+         }
+      entry['samples'] += 1
+      entry['peak_bytes_max'] = max(entry['peak_bytes_max'], peak)
+      entry['peak_bytes_total'] += peak
+      entry['net_bytes_total'] += net
+      entry['last'] = {'peak_bytes': peak, 'net_bytes': net, 'timestamp': time.time()}
+      for line, size in top_lines:
+         entry['top_lines'][line] += size
+      # Acotar las líneas acumuladas a las más costosas
+      if len(entry['top_lines']) > self.memory_top_lines * 5:
+         entry['top_lines'] = Counter(dict(entry['top_lines'].most_common(self.memory_top_lines * 5)))
+
+   def get_memory_report(self, func_name: str = None) -> Dict[str, Any]:
+      """Peak y net promedio por request muestreado y líneas con más asignaciones"""
+      def summary(entry):
+         samples = entry['samples']
+         return {
+            'samples': samples,
+            'peak_bytes_avg': entry['peak_bytes_total'] // samples,
+            'peak_bytes_max': entry['peak_bytes_max'],
+            'net_bytes_avg': entry['net_bytes_total'] // samples,
+            'last': entry['last'],
+            'top_lines': [{'line': line, 'bytes': size} for line, size in entry['top_lines'].most_common(self.memory_top_lines)]
+         }
+
       if func_name:
-         return self.profiles.get(func_name, {})
-      return self.profiles
+         entry = self.memory_profiles.get(func_name)
+         return summary(entry) if entry else {}
+      return {func_id: summary(entry) for func_id, entry in list(self.memory_profiles.items())}
 
    def clear_profiles(self):
       """Limpia los profiles almacenados"""
       self.profiles.clear()
       self.memory_profiles.clear()
+      self.cprofile_stats.clear()
+      self.sampler.clear()
 
-# Decorador específico para memoria
-def memory_profile_async(profiler: APIProfiler):
-    def decorator(func):
-        @wraps(func)
-        @profile
-        async def wrapper(*args, **kwargs):
-            return await func(*args, **kwargs)
-        return wrapper
-    return decorator
\ No newline at end of file
+# Decorador específico para memoria (usa tracemalloc muestreado en lugar de memory_profiler)
+def memory_profile_async(profiler: APIProfiler, sample_every: int = None):
+    return profiler.profile_memory(sample_every=sample_every)
\ No newline at end of file
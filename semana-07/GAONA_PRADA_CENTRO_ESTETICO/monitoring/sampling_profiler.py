@@ -0,0 +1,186 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+class SamplingProfiler:
+    """
+    Profiler por muestreo: un hilo recorre `sys._current_frames()` a `hz` muestras por
+    segundo y acumula las pilas que cuelgan de un endpoint registrado. El coste no depende
+    del número de llamadas, así que puede quedar activo en producción.
+
+    Los endpoints registran el frame de su wrapper mientras se ejecutan (solo los requests
+    elegidos para el muestreo); una pila se atribuye al endpoint cuyo frame aparece en ella
+    y se guarda desde ese frame hasta la hoja.
+    """
+
+    def __init__(self, hz: float = 100.0, max_stacks: int = 5000, max_depth: int = 128):
+        self.interval = 1.0 / hz
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+
+        # frame del wrapper -> endpoint, solo para los requests que se están muestreando
+        self._frames: Dict[object, str] = {}
+        self._stacks: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # Activación bajo demanda: ventana de N segundos y/o 1 de cada K requests
+        self.active_until = 0.0
+        self.sample_every = 0
+        self._request_counter = 0
+
+        self.stats = {
+            'ticks': 0,
+            'samples': 0,
+            'truncated_stacks': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "SamplingProfiler":
+        profiler = cls(hz=float(os.getenv('PROFILER_SAMPLING_HZ', 100)))
+        profiler.sample_every = int(os.getenv('PROFILER_SAMPLE_EVERY', 0))
+        return profiler
+
+    # --- Activación ---
+
+    def activate(self, seconds: float):
+        """Muestrea todos los requests de los endpoints perfilados durante `seconds`"""
+        self.active_until = time.time() + seconds
+        self.start()
+
+    def sample_one_in(self, k: int):
+        """Muestrea 1 de cada `k` requests de forma indefinida (0 lo desactiva)"""
+        self.sample_every = k
+        if k:
+            self.start()
+
+    def is_active(self) -> bool:
+        return self.sample_every > 0 or time.time() < self.active_until
+
+    def should_sample(self) -> bool:
+        """Decide si el request que empieza entra en el muestreo"""
+        if time.time() < self.active_until:
+            return True
+        if self.sample_every:
+            self._request_counter += 1
+            return self._request_counter % self.sample_every == 0
+        return False
+
+    # --- Registro de requests ---
+
+    def enter(self, frame, endpoint: str):
+        self._frames[frame] = endpoint
+        if self._thread is None:
+            self.start()
+
+    def exit(self, frame):
+        self._frames.pop(frame, None)
+
+    # --- Hilo muestreador ---
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.stats['ticks'] += 1
+            if not self._frames:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread:
+                    self._sample(frame)
+
+    def _sample(self, frame):
+        """Sube desde la hoja hasta el frame de un endpoint registrado y guarda la pila"""
+        codes = []
+        frames = self._frames
+        depth = 0
+        while frame is not None and depth < self.max_depth:
+            endpoint = frames.get(frame)
+            if endpoint is not None:
+                self._record(endpoint, tuple(reversed(codes)))
+                return
+            codes.append(frame.f_code)
+            frame = frame.f_back
+            depth += 1
+
+    def _record(self, endpoint: str, stack: tuple):
+        with self._lock:
+            stacks = self._stacks.setdefault(endpoint, Counter())
+            if stack not in stacks and len(stacks) >= self.max_stacks:
+                # Se conserva el total de muestras aunque se pierda el detalle de la pila
+                stack = ()
+                self.stats['truncated_stacks'] += 1
+            stacks[stack] += 1
+            self.stats['samples'] += 1
+
+    # --- Exportación ---
+
+    @staticmethod
+    def _frame_label(code) -> str:
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def collapsed(self, endpoint: Optional[str] = None) -> str:
+        """
+        Pilas en formato "collapsed" (raíz;...;hoja conteo), entrada de flamegraph.pl,
+        speedscope o inferno
+        """
+        with self._lock:
+            snapshot = {name: dict(stacks) for name, stacks in self._stacks.items()
+                        if endpoint is None or name == endpoint}
+        lines = []
+        for name, stacks in sorted(snapshot.items()):
+            for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                frames = [name] + [self._frame_label(code) for code in stack] if stack else [name, "[truncado]"]
+                lines.append(f"{';'.join(frame.replace(';', ':') for frame in frames)} {count}")
+        return "\n".join(lines)
+
+    def top_functions(self, top_n: int = 20):
+        """
+        Funciones con más muestras sumando todos los endpoints: `self_samples` cuenta las
+        veces que la función era la hoja (CPU propia) e `inclusive_samples` las veces que
+        estaba en la pila
+        """
+        with self._lock:
+            snapshot = [dict(stacks) for stacks in self._stacks.values()]
+        own, inclusive = Counter(), Counter()
+        for stacks in snapshot:
+            for stack, count in stacks.items():
+                if not stack:
+                    continue
+                own[stack[-1]] += count
+                for code in set(stack):
+                    inclusive[code] += count
+        total = sum(sum(stacks.values()) for stacks in snapshot) or 1
+        return [
+            {
+                'function': self._frame_label(code),
+                'self_samples': own[code],
+                'inclusive_samples': inclusive[code],
+                'self_ratio': round(own[code] / total, 4)
+            }
+            for code, _ in sorted(inclusive.items(), key=lambda item: (own[item[0]], item[1]), reverse=True)[:top_n]
+        ]
+
+    def sample_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: sum(stacks.values()) for name, stacks in self._stacks.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stacks.clear()
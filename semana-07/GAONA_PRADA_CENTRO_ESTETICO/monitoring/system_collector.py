@@ -0,0 +1,122 @@
+import asyncio
+import gc
+import os
+import time
+from typing import Callable, Dict, List, Optional
+import psutil
+
+class SystemMetricsCollector:
+    """
+    Recolector de métricas del sistema gestionado por el lifespan de la app.
+
+    Las lecturas de psutil (CPU, memoria, disco, RSS y descriptores del proceso) se hacen en
+    un hilo con `asyncio.to_thread`; el retraso del event loop se mide con una tarea que
+    duerme `lag_interval` y compara contra el reloj, y las pausas de GC con `gc.callbacks`.
+    Cada muestra actualiza APIMetrics y se evalúa con AlertManager.check_alerts.
+    """
+
+    def __init__(self, metrics, alert_manager=None, interval: Optional[float] = None,
+                 lag_interval: float = 0.5, disk_path: str = '/'):
+        self.metrics = metrics
+        self.alert_manager = alert_manager
+        self.interval = interval or float(os.getenv('SYSTEM_METRICS_INTERVAL', 30))
+        self.lag_interval = lag_interval
+        self.disk_path = disk_path
+        # Fuentes extra de métricas para las alertas (callables que devuelven un dict)
+        self.sources: List[Callable[[], Dict[str, float]]] = []
+
+        self.process = psutil.Process()
+        self.last_sample: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+
+        # Acumulados del intervalo en curso; se reinician al tomar cada muestra
+        self._max_loop_lag = 0.0
+        self._gc_started_at = None
+        self._gc_pause_max = 0.0
+        self._gc_pause_total = 0.0
+        self._gc_collections = 0
+
+    # --- Ciclo de vida ---
+
+    async def start(self):
+        if self._tasks:
+            return
+        gc.callbacks.append(self._on_gc)
+        # La primera llamada a cpu_percent() siempre devuelve 0.0: se inicializa aquí
+        await asyncio.to_thread(psutil.cpu_percent, None)
+        self._tasks = [
+            asyncio.create_task(self._collect_loop(), name="system-metrics-collector"),
+            asyncio.create_task(self._lag_loop(), name="event-loop-lag-monitor")
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    # --- Mediciones ---
+
+    def _on_gc(self, phase: str, info: Dict):
+        if phase == 'start':
+            self._gc_started_at = time.perf_counter()
+        elif self._gc_started_at is not None:
+            pause = time.perf_counter() - self._gc_started_at
+            self._gc_started_at = None
+            self._gc_pause_max = max(self._gc_pause_max, pause)
+            self._gc_pause_total += pause
+            self._gc_collections += 1
+
+    async def _lag_loop(self):
+        while True:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self._max_loop_lag = max(self._max_loop_lag, time.perf_counter() - expected)
+
+    def _sample_system(self) -> Dict[str, float]:
+        """Lecturas de psutil; se ejecuta fuera del event loop"""
+        with self.process.oneshot():
+            rss = self.process.memory_info().rss
+            open_fds = self.process.num_fds() if hasattr(self.process, 'num_fds') else self.process.num_handles()
+        return {
+            'cpu_usage': psutil.cpu_percent(interval=None),
+            'memory_usage': psutil.virtual_memory().used,
+            'disk_usage': psutil.disk_usage(self.disk_path).percent,
+            'process_rss': rss,
+            'open_fds': open_fds
+        }
+
+    async def collect_once(self) -> Dict[str, float]:
+        """Toma una muestra, actualiza los gauges y evalúa las alertas"""
+        sample = await asyncio.to_thread(self._sample_system)
+        sample.update({
+            'event_loop_lag': round(self._max_loop_lag, 6),
+            'gc_pause_max': round(self._gc_pause_max, 6),
+            'gc_pause_total': round(self._gc_pause_total, 6),
+            'gc_collections': self._gc_collections
+        })
+        self._max_loop_lag = 0.0
+        self._gc_pause_max = self._gc_pause_total = 0.0
+        self._gc_collections = 0
+
+        for source in self.sources:
+            try:
+                sample.update(source())
+            except Exception as e:
+                print(f"Error leyendo fuente de métricas: {e}")
+
+        self.metrics.update_system_metrics(sample)
+        if self.alert_manager is not None:
+            self.alert_manager.check_alerts(sample)
+        self.last_sample = sample
+        return sample
+
+    async def _collect_loop(self):
+        while True:
+            try:
+                await self.collect_once()
+            except Exception as e:
+                print(f"Error recolectando métricas del sistema: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,153 @@
+# tests/test_beauty_alert_dispatch.py
+import asyncio
+import email
+import socketserver
+import threading
+from unittest.mock import MagicMock
+import pytest
+from monitoring.alert_dispatcher import AlertDispatcher
+from monitoring.alerts import AlertManager, AlertRule, EmailNotifier
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Servidor SMTP mínimo en localhost que guarda los mensajes recibidos"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 stand-in ESMTP")
+        envelope = {"rcpt": []}
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif command == "MAIL":
+                envelope["from"] = line
+                self.reply("250 OK")
+            elif command == "RCPT":
+                envelope["rcpt"].append(line)
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 end with .")
+                data = []
+                while (chunk := self.rfile.readline().decode()) not in (".\r\n", ""):
+                    data.append(chunk[1:] if chunk.startswith("..") else chunk)
+                self.server.messages.append(email.message_from_string("".join(data)))
+                self.reply("250 queued")
+            else:
+                self.reply("250 OK")
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn()
+    yield server
+    server.close()
+
+def rule(name: str, action, threshold: float = 2.0) -> AlertRule:
+    return AlertRule(name=name, metric_name="response_time", threshold=threshold, comparison="gt",
+                     duration=0, action=action, cooldown=0)
+
+@pytest.mark.asyncio
+async def test_digest_por_email_con_dedup(smtp_server):
+    notifier = EmailNotifier(host="127.0.0.1", port=smtp_server.port, recipients=["gerencia@beauty-clinic.local"])
+    dispatcher = AlertDispatcher(dedup_window=60, group_window=0.05)
+    manager = AlertManager(domain="beauty_", dispatcher=dispatcher)
+    manager.add_rule(rule("beauty_high_response_time", notifier))
+    manager.add_rule(AlertRule("beauty_high_cpu", "cpu_usage", 80.0, "gt", 0, notifier, cooldown=0))
+
+    await dispatcher.start()
+    for second in range(5):
+        manager.check_alerts({"response_time": 3.0, "cpu_usage": 95.0}, now=1000 + second)
+    await asyncio.sleep(0.2)
+    await dispatcher.stop()
+
+    # 10 disparos -> 2 alertas (una por regla) en un único email
+    assert len(smtp_server.messages) == 1
+    message = smtp_server.messages[0]
+    body = message.get_payload(decode=True).decode("utf-8")
+    assert "2 alerta(s)" in message["Subject"]
+    assert "beauty_high_cpu" in body and "(+4 repeticiones)" in body
+    assert dispatcher.stats["deduplicated"] == 8 and dispatcher.stats["digests_sent"] == 1
+
+@pytest.mark.asyncio
+async def test_submit_no_bloquea_el_loop():
+    """Una acción lenta corre en un hilo: el check de alertas vuelve de inmediato"""
+    entregadas = []
+
+    def accion_lenta(alert_rule, value):
+        import time
+        time.sleep(0.2)
+        entregadas.append(alert_rule.name)
+
+    dispatcher = AlertDispatcher(dedup_window=0, group_window=0)
+    await dispatcher.start()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    dispatcher.submit(rule("beauty_lenta", accion_lenta), 3.0)
+    assert loop.time() - started < 0.05
+    await dispatcher.stop()
+    assert entregadas == ["beauty_lenta"]
+
+@pytest.mark.asyncio
+async def test_digest_max_y_acciones_async():
+    recibidas = []
+
+    async def accion_async(alert_rule, value):
+        recibidas.append(value)
+
+    dispatcher = AlertDispatcher(dedup_window=0, group_window=3600, digest_max=3)
+    await dispatcher.start()
+    for i in range(3):
+        dispatcher.submit(rule(f"regla_{i}", accion_async), float(i))
+    await asyncio.sleep(0.05)  # el grupo se envía al llenarse, sin esperar group_window
+    assert recibidas == [0.0, 1.0, 2.0]
+    await dispatcher.stop()
+
+def test_sin_dispatcher_en_marcha_se_ejecuta_directo():
+    action = MagicMock()
+    manager = AlertManager(domain="beauty_", dispatcher=AlertDispatcher())
+    manager.add_rule(rule("beauty_directa", action))
+    manager.check_alerts({"response_time": 3.0}, now=1000)
+    action.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_repeticiones_tras_el_envio_se_reportan_en_el_siguiente_digest():
+    digests = []
+
+    class Accion:
+        def send_digest(self, events):
+            digests.append([(event.rule.name, event.duplicates) for event in events])
+
+    dispatcher = AlertDispatcher(dedup_window=60, group_window=0)
+    await dispatcher.start()
+    alert_rule = rule("beauty_high_response_time", Accion())
+    dispatcher.submit(alert_rule, 3.0, timestamp=1000)
+    await asyncio.sleep(0.05)  # el primer evento ya se envió
+    for second in range(1, 4):
+        assert dispatcher.submit(alert_rule, 3.0, timestamp=1000 + second) is False
+    assert dispatcher.submit(alert_rule, 3.0, timestamp=1061) is True
+    await dispatcher.stop()
+
+    assert digests == [[("beauty_high_response_time", 0)], [("beauty_high_response_time", 3)]]
+    assert dispatcher.stats["deduplicated"] == 3
@@ -0,0 +1,91 @@
+# tests/test_beauty_alerts.py
+from unittest.mock import MagicMock
+from monitoring.alerts import AlertManager, AlertRule, MetricSeries
+
+def build_manager(**rule_options):
+    action = MagicMock()
+    manager = AlertManager(domain="beauty_")
+    options = {"name": "beauty_high_response_time", "metric_name": "response_time", "threshold": 2.0,
+               "comparison": "gt", "duration": 10, "action": action}
+    options.update(rule_options)
+    manager.add_rule(AlertRule(**options))
+    return manager, action
+
+def test_agregaciones_de_la_ventana():
+    series = MetricSeries(buckets=61)
+    for second in range(60):
+        series.add(float(second), 1000 + second)
+        series.add(float(second) + 0.5, 1000 + second)
+
+    stats = series.window_stats(10, now=1059)
+    assert stats.get("last") == 59.5 and stats.get("max") == 59.5 and stats.get("min") == 50.0
+    assert stats.get("avg") == 54.75
+    assert stats.get("p50") == 54.5 and stats.get("p99") == 59.5
+    assert stats.get("rate") == 1.0
+    # Los buckets fuera de la ventana se ignoran aunque sigan en el ring buffer
+    assert series.window_stats(10, now=2000) is None
+
+def test_percentil_sobre_muestras_y_no_sobre_medias_de_bucket():
+    series = MetricSeries(buckets=61, samples=32)
+    for second in range(10):
+        for _ in range(19):
+            series.add(0.1, 1000 + second)
+        series.add(5.0, 1000 + second)  # un 5 % de peticiones lentas en cada segundo
+
+    stats = series.window_stats(10, now=1009)
+    # La media de cada bucket (0.345) escondería la cola lenta
+    assert stats.get("p50") == 0.1 and stats.get("p99") == 5.0
+
+    # Con más muestras que huecos en el reservoir cada guardada pesa count / guardadas
+    for _ in range(1000):
+        series.add(0.2, 1010)
+    stats = series.window_stats(1, now=1010)
+    values, weights = stats._samples()
+    assert len(values) == 32 and weights[0] == 1000 / 32
+    assert stats.get("p50") == 0.2
+
+def test_for_duration_y_cooldown():
+    manager, action = build_manager(aggregation="avg", window=30, cooldown=60)
+    for second in range(0, 200, 5):
+        manager.check_alerts({"response_time": 3.0}, now=1000 + second)
+
+    # Activa a los 10 s; luego se repite solo cada 60 s mientras siga activa
+    fired_at = [call.args[1] for call in action.call_args_list]
+    assert len(fired_at) == 4
+    assert manager.alert_state["beauty_high_response_time"]["state"] == "firing"
+
+def test_histeresis_evita_oscilaciones():
+    manager, action = build_manager(duration=0, clear_threshold=1.0, cooldown=0)
+    manager.check_alerts({"response_time": 2.5}, now=1000)
+    manager.check_alerts({"response_time": 1.8}, now=1001)  # bajo el umbral pero sobre clear_threshold
+    assert manager.alert_state["beauty_high_response_time"]["state"] == "firing"
+    manager.check_alerts({"response_time": 2.5}, now=1002)
+    manager.check_alerts({"response_time": 0.5}, now=1003)
+    assert manager.alert_state["beauty_high_response_time"]["state"] == "ok"
+    assert action.call_count == 2
+
+def test_metricas_sin_reglas_no_se_almacenan():
+    manager, _ = build_manager()
+    manager.check_alerts({"cpu_usage": 99.0, "response_time": 0.1}, now=1000)
+    assert set(manager.series) == {"response_time"}
+
+def test_ventanas_con_huecos_y_subventanas():
+    series = MetricSeries(buckets=10)
+    for second in (0, 2, 4, 13):  # el 13 reutiliza el bucket del 3 en la siguiente vuelta
+        series.add(float(second), 1000 + second)
+
+    stats = series.window_stats(10, now=1013)
+    assert list(stats.epochs) == [1004, 1013]
+    assert stats.get("avg") == 8.5
+    assert stats.tail(5, now=1013).get("max") == 13.0
+
+def test_reglas_de_varias_ventanas_sobre_la_misma_metrica():
+    corta, larga = MagicMock(), MagicMock()
+    manager = AlertManager(domain="beauty_")
+    manager.add_rule(AlertRule("cpu_pico", "cpu_usage", 80.0, "gt", 0, corta, aggregation="max", window=10))
+    manager.add_rule(AlertRule("cpu_sostenida", "cpu_usage", 80.0, "gt", 0, larga, aggregation="avg", window=300))
+    for second in range(300):
+        manager.check_alerts({"cpu_usage": 95.0 if second >= 295 else 20.0}, now=1000 + second)
+
+    assert corta.call_count == 1 and larga.call_count == 0
+    assert list(manager._rule_groups["cpu_usage"]) == [300, 10]
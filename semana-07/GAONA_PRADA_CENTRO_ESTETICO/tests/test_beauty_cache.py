@@ -1,8 +1,16 @@
 # tests/test_beauty_cache.py
 import pytest
-from app.cache.redis_config import cache_manager, DomainCacheConfig
+import asyncio
+import json
+from app.cache.redis_config import cache_manager, DomainCacheConfig, LocalLRUCache, INVALIDATE_TAGS_SCRIPT
 from app.cache.cache_decorators import cache_result
-from unittest.mock import AsyncMock, patch
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
+
+# fakeredis se importa antes de que el fixture autouse sustituya redis.Redis
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
 
 # Mock del cliente Redis para evitar conexiones reales durante los tests
 @pytest.fixture(autouse=True)
@@ -39,7 +47,7 @@ class TestBeautyCache:
         
         # Verifica que se llamó a setex con el TTL correcto
         expected_ttl = cache_manager.cache_ttl['detalle_tratamiento']
-        mock_redis_client.setex.assert_called_with(f"beauty_:data:{test_key}", expected_ttl, json.dumps(test_data))
+        mock_redis_client.setex.assert_called_with(f"beauty_:data:{test_key}", expected_ttl, cache_manager.codec.encode(test_data))
 
         # Limpia
         cache_manager.invalidate_cache("data:test_tratamiento_101")
@@ -74,21 +82,611 @@ class TestBeautyCache:
         assert mock_redis_client.get.call_count == 2 # Una vez por la primera, otra por esta
         assert mock_redis_client.setex.call_count == 1 # Solo se guardó una vez
 
-    def test_cache_invalidation_tratamiento(self, mock_redis_client):
-        """Verifica la invalidación de cache para un tratamiento actualizado."""
+    @pytest.mark.asyncio
+    async def test_cache_invalidation_tratamiento(self):
+        """Verifica la invalidación por etiquetas para un tratamiento actualizado."""
+        from app.cache import invalidation
         from app.cache.invalidation import DomainCacheInvalidation
 
         tratamiento_id = "10"
-        # Simular que hay datos en cache que deberían ser invalidados
-        mock_redis_client.keys.side_effect = [
-            [f"beauty_:data:tratamientos_:{tratamiento_id}:hash123"],
-            [f"beauty_:data:catalogo_:general:hashABC"]
+        # Simular las claves que el script de invalidación borra en Redis
+        invalidate_script = AsyncMock(return_value=[
+            f"beauty_:data:tratamientos_:get_detalle_tratamiento:hash123",
+            f"beauty_:data:catalogo_:get_catalogo_tratamientos:hashABC"
+        ])
+
+        with patch.object(invalidation.cache_manager, '_async_invalidate_tags_script', invalidate_script):
+            await DomainCacheInvalidation.on_tratamiento_update(tratamiento_id)
+
+        # Se invalidan el tratamiento y el catálogo en una sola llamada, sin KEYS/SCAN
+        invalidate_script.assert_called_once_with(
+            keys=[f"beauty_:tags:tratamiento:{tratamiento_id}", "beauty_:tags:catalogo"], args=[ANY]
+        )
+
+    def test_set_cache_registra_etiquetas(self):
+        """Las entradas etiquetadas se registran en el ZSET de cada etiqueta con su expiración."""
+        manager = DomainCacheConfig("beauty_", l1_enabled=False)
+        manager.redis_client = MagicMock()
+        pipe = manager.redis_client.pipeline.return_value
+        pipe.execute.return_value = [True, 1, 0, True]
+
+        with patch('app.cache.redis_config.time.time', return_value=1000.0):
+            assert manager.set_cache("tratamientos_:abc", {"id": 10}, 'detalle_tratamiento', tags=["tratamiento:10"])
+        pipe.setex.assert_called_once_with("beauty_:data:tratamientos_:abc", 600, manager.codec.encode({"id": 10}))
+        pipe.zadd.assert_called_once_with("beauty_:tags:tratamiento:10", {"beauty_:data:tratamientos_:abc": 1600.0})
+        pipe.zremrangebyscore.assert_called_once_with("beauty_:tags:tratamiento:10", '-inf', 1000.0)
+        pipe.expire.assert_called_once_with("beauty_:tags:tratamiento:10", manager.tag_ttl)
+
+    @pytest.mark.skipif(fakeredis is None, reason="requiere fakeredis")
+    def test_indice_de_etiqueta_poda_entradas_expiradas(self):
+        """Una etiqueta con escrituras continuas solo guarda las entradas vivas."""
+        manager = DomainCacheConfig("beauty_", l1_enabled=False)
+        manager.redis_client = fakeredis.FakeRedis()
+        manager._invalidate_tags_script = manager.redis_client.register_script(INVALIDATE_TAGS_SCRIPT)
+        tag_key = manager.get_tag_key("citas")
+
+        with patch('app.cache.redis_config.time.time', return_value=1000.0):
+            for i in range(50):
+                manager.set_cache(f"citas_:{i}", {"id": i}, 'citas_disponibles', tags=["citas"], ttl=60)
+        with patch('app.cache.redis_config.time.time', return_value=1061.0):
+            manager.set_cache("citas_:nueva", {"id": 50}, 'citas_disponibles', tags=["citas"], ttl=60)
+            assert manager.redis_client.zcard(tag_key) == 1
+
+            assert manager.invalidate_tags("citas") == 1
+        assert manager.redis_client.exists(tag_key, "beauty_:data:citas_:nueva") == 0
+
+
+class TestBeautyCacheL1:
+
+    @pytest.fixture
+    def l1_cache_manager(self):
+        manager = DomainCacheConfig("beauty_", l1_enabled=True)
+        manager.redis_client = MagicMock()
+        manager.redis_client.get.return_value = None
+        # GET + PTTL en pipeline: la clave no existe
+        manager.redis_client.pipeline.return_value.execute.return_value = [None, -2]
+        return manager
+
+    def test_l1_sirve_catalogo_sin_ir_a_redis(self, l1_cache_manager):
+        """El catálogo se sirve desde memoria tras guardarse, sin tocar Redis."""
+        catalogo = [{"id": 10, "nombre": "Limpieza Facial Profunda", "precio": 85.50}]
+        l1_cache_manager.set_cache("catalogo_:general", catalogo, 'catalogo_servicios')
+
+        assert l1_cache_manager.get_cache("catalogo_:general", 'catalogo_servicios') == catalogo
+        l1_cache_manager.redis_client.get.assert_not_called()
+        l1_cache_manager.redis_client.pipeline.assert_not_called()
+        assert l1_cache_manager.get_tier_stats()['l1_hits'] == 1
+
+    def test_l1_no_guarda_datos_volatiles(self, l1_cache_manager):
+        """La disponibilidad de citas siempre se consulta en Redis."""
+        l1_cache_manager.set_cache("citas_:2025-10-15", [{"hora": "10:00"}], 'citas_disponibles')
+        l1_cache_manager.get_cache("citas_:2025-10-15", 'citas_disponibles')
+
+        pipe = l1_cache_manager.redis_client.pipeline.return_value
+        pipe.get.assert_called_once_with("beauty_:data:citas_:2025-10-15")
+        stats = l1_cache_manager.get_tier_stats()
+        assert stats['l1_misses'] == 1
+        assert stats['l2_misses'] == 1
+
+    def test_ttl_del_l1_acotado(self, l1_cache_manager):
+        """El L1 nunca guarda más de CACHE_L1_MAX_TTL ni más de lo que le queda a la clave en Redis."""
+        import time
+
+        configuracion = {"horario_apertura": "09:00"}
+        l1_cache_manager.set_cache("clinica_:general", configuracion, 'configuracion_clinica')
+        expires_at = l1_cache_manager.l1_cache._data["beauty_:data:clinica_:general"][0]
+        assert expires_at - time.monotonic() <= l1_cache_manager.l1_max_ttl
+
+        # Lectura desde Redis de una clave a la que le quedan 1.5 s
+        l1_cache_manager.l1_cache.clear()
+        l1_cache_manager.redis_client.pipeline.return_value.execute.return_value = [
+            l1_cache_manager.codec.encode(configuracion), 1500
         ]
+        assert l1_cache_manager.get_cache("clinica_:general", 'configuracion_clinica') == configuracion
+        expires_at = l1_cache_manager.l1_cache._data["beauty_:data:clinica_:general"][0]
+        assert expires_at - time.monotonic() <= 1.5
+
+    @pytest.mark.skipif(fakeredis is None, reason="requiere fakeredis")
+    def test_otro_worker_deja_de_servir_lo_invalidado_tras_el_tope(self):
+        """La invalidación solo limpia el L1 local: los demás workers la ven al vencer el tope."""
+        server = fakeredis.FakeServer()
+        workers = []
+        for _ in range(2):
+            worker = DomainCacheConfig("beauty_", l1_enabled=True)
+            worker.redis_client = fakeredis.FakeRedis(server=server)
+            worker._invalidate_tags_script = worker.redis_client.register_script(INVALIDATE_TAGS_SCRIPT)
+            worker.l1_max_ttl = 0.05
+            workers.append(worker)
+        a, b = workers
+
+        a.set_cache("clinica_:general", {"telefono": "1"}, 'configuracion_clinica', tags=["configuracion_clinica"])
+        assert b.get_cache("clinica_:general", 'configuracion_clinica') == {"telefono": "1"}
+        a.invalidate_tags("configuracion_clinica")
+        assert b.get_cache("clinica_:general", 'configuracion_clinica') == {"telefono": "1"}  # L1 de b
+
+        import time
+        time.sleep(0.06)
+        assert b.get_cache("clinica_:general", 'configuracion_clinica') is None
+
+    def test_l1_respeta_limites_lru(self):
+        """El L1 desaloja las entradas menos usadas al superar entradas o bytes."""
+        l1 = LocalLRUCache(max_entries=2, max_bytes=100)
+        l1.set("a", 1, 60, 10)
+        l1.set("b", 2, 60, 10)
+        l1.get("a")
+        l1.set("c", 3, 60, 10)
+        assert l1.get("b") is None
+        assert l1.get("a") == 1
+
+        l1.set("grande", "x", 60, 95)
+        assert len(l1) == 1
+        assert l1.current_bytes == 95
+
+
+class TestBeautyCacheSingleFlight:
+
+    @pytest.mark.asyncio
+    async def test_single_flight_coalesce_misses_concurrentes(self):
+        """Tras expirar citas_disponibles, solo una petición concurrente consulta la BD."""
+        import asyncio
+        from app.cache import cache_decorators
+        from app.cache.single_flight import SingleFlight
+
+        consultas = 0
+
+        @cache_result(ttl_type='citas_disponibles', key_prefix='citas_', single_flight=True)
+        async def mock_get_citas_disponibles_db(fecha: str):
+            nonlocal consultas
+            consultas += 1
+            await asyncio.sleep(0.01)
+            return [{"fecha": fecha, "hora": "10:00"}]
+
+        manager = MagicMock()
+        manager.aget_cache = AsyncMock(return_value=None)
+        manager.aset_cache = AsyncMock(return_value=True)
+        group = SingleFlight(manager)
+        with patch.object(cache_decorators, 'cache_manager', manager), \
+                patch.object(cache_decorators, 'single_flight_group', group):
+            results = await asyncio.gather(*[
+                mock_get_citas_disponibles_db(fecha="2025-10-15") for _ in range(10)
+            ])
+
+        assert consultas == 1
+        assert all(r == [{"fecha": "2025-10-15", "hora": "10:00"}] for r in results)
+        assert group.stats['leaders'] == 1
+        assert group.stats['coalesced'] == 9
+        manager.aset_cache.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate_sirve_valor_obsoleto(self):
+        """Entre soft y hard TTL se devuelve el valor obsoleto y se refresca en segundo plano."""
+        import asyncio
+        import time
+        from app.cache import cache_decorators
+        from app.cache.single_flight import SingleFlight
+
+        @cache_result(ttl_type='citas_disponibles', key_prefix='citas_', soft_ttl=120, hard_ttl=300)
+        async def mock_get_citas_disponibles_db(fecha: str):
+            return [{"fecha": fecha, "hora": "11:30"}]
+
+        manager = MagicMock()
+        manager.aset_cache = AsyncMock(return_value=True)
+        manager.aget_cache = AsyncMock()
+        manager.aget_cache.return_value = {
+            cache_decorators.SWR_MARKER: 1,
+            "value": [{"fecha": "2025-10-15", "hora": "10:00"}],
+            "stored_at": time.time() - 150,
+            "delta": 0.05
+        }
+        group = SingleFlight(manager)
+        with patch.object(cache_decorators, 'cache_manager', manager), \
+                patch.object(cache_decorators, 'single_flight_group', group):
+            result = await mock_get_citas_disponibles_db(fecha="2025-10-15")
+            assert result == [{"fecha": "2025-10-15", "hora": "10:00"}]
+            await asyncio.sleep(0)
+            await asyncio.gather(*group._background)
+
+        assert group.stats['background_refreshes'] == 1
+        stored_entry = manager.aset_cache.call_args.args[1]
+        assert stored_entry["value"] == [{"fecha": "2025-10-15", "hora": "11:30"}]
+        assert manager.aset_cache.call_args.kwargs["ttl"] == 300
+
+
+    @pytest.mark.asyncio
+    async def test_refresco_en_segundo_plano_abre_su_propia_sesion(self):
+        """El recálculo SWR no usa la sesión del request, que ya está cerrada."""
+        import asyncio
+        import time
+        from sqlalchemy.orm import Session
+        from app.cache import cache_decorators
+        from app.cache.single_flight import SingleFlight
+
+        sesiones_usadas = []
+        sesion_refresco = MagicMock(spec=Session)
+
+        @cache_result(ttl_type='citas_disponibles', key_prefix='citas_', soft_ttl=120,
+                      session_factory=lambda: sesion_refresco)
+        async def mock_get_citas_disponibles_db(db: Session, fecha: str):
+            sesiones_usadas.append(db)
+            return [{"fecha": fecha, "hora": "11:30"}]
+
+        manager = MagicMock()
+        manager.aset_cache = AsyncMock(return_value=True)
+        manager.aget_cache = AsyncMock(return_value={
+            cache_decorators.SWR_MARKER: 1, "value": [], "stored_at": time.time() - 150, "delta": 0.05
+        })
+        sesion_request = MagicMock(spec=Session)
+        group = SingleFlight(manager)
+        with patch.object(cache_decorators, 'cache_manager', manager), \
+                patch.object(cache_decorators, 'single_flight_group', group):
+            await mock_get_citas_disponibles_db(sesion_request, fecha="2025-10-15")
+            await asyncio.sleep(0)
+            await asyncio.gather(*group._background)
+
+        assert sesiones_usadas == [sesion_refresco]
+        sesion_refresco.close.assert_called_once()
+
+    def test_swr_rechaza_parametros_del_request(self):
+        from fastapi import Request
+
+        with pytest.raises(ValueError):
+            @cache_result(ttl_type='citas_disponibles', soft_ttl=120)
+            async def mock_endpoint(request: Request, fecha: str):
+                return []
+
+
+class TestBeautyCacheCodec:
+
+    def test_codec_lee_entradas_antiguas_en_json(self):
+        """Las entradas escritas antes del byte de formato siguen siendo legibles."""
+        from app.cache.serializers import CacheCodec
+
+        codec = CacheCodec()
+        legacy = json.dumps({"id": 10, "nombre": "Limpieza Facial Profunda"})
+        assert codec.decode(legacy.encode()) == {"id": 10, "nombre": "Limpieza Facial Profunda"}
+        assert codec.decode(legacy) == {"id": 10, "nombre": "Limpieza Facial Profunda"}
+
+    def test_codec_comprime_solo_sobre_el_umbral(self):
+        """El catálogo grande se comprime; la configuración pequeña no."""
+        from app.cache.serializers import CacheCodec, MARKER_FLAG, COMPRESSION_ZLIB
+
+        codec = CacheCodec(compression='zlib', compress_min_bytes=256)
+        catalogo = [{"id": i, "nombre": f"Tratamiento {i}", "precio": 85.5} for i in range(50)]
+        configuracion = {"horario_apertura": "09:00", "horario_cierre": "20:00"}
+
+        encoded_catalogo = codec.encode(catalogo)
+        encoded_configuracion = codec.encode(configuracion)
+        assert encoded_catalogo[0] & MARKER_FLAG
+        assert encoded_catalogo[0] & 0x07 == COMPRESSION_ZLIB
+        assert encoded_configuracion[0] & 0x07 == 0
+        assert len(encoded_catalogo) < len(json.dumps(catalogo))
+        assert codec.decode(encoded_catalogo) == catalogo
+        assert codec.decode(encoded_configuracion) == configuracion
+
+
+class TestBeautyCacheKeys:
+
+    @pytest.mark.asyncio
+    async def test_claves_estables_para_get_citas_disponibles(self):
+        """Llamadas repetidas con sesiones de BD distintas generan la misma clave de cache."""
+        from sqlalchemy.orm import Session
+        from app.cache import cache_decorators
+        from app.routers.beauty_optimized import get_citas_disponibles
+
+        async def load_without_lock(key, load, ttl_type):
+            return await load()
+
+        manager = MagicMock()
+        manager.aget_cache = AsyncMock(return_value=None)
+        manager.aset_cache = AsyncMock(return_value=True)
+        with patch.object(cache_decorators, 'cache_manager', manager), \
+                patch.object(cache_decorators.single_flight_group, '_load_with_lock',
+                             side_effect=load_without_lock):
+            await get_citas_disponibles(db=Session(), fecha="2025-10-01", esteticista_id=1)
+            await get_citas_disponibles(db=Session(), fecha="2025-10-01", esteticista_id=1)
+            await get_citas_disponibles(Session(), "2025-10-01", 1)
+            await get_citas_disponibles(db=Session(), fecha="2025-10-02", esteticista_id=1)
+
+        keys = [call.args[0] for call in manager.aget_cache.call_args_list]
+        assert keys[0] == keys[1] == keys[2]
+        assert keys[3] != keys[0]
+        # Cada miss ejecuta la carga completa (el resultado se guarda en el cache)
+        assert manager.aset_cache.await_count == 4
+        # Hash completo de 128 bits en lugar de 8 caracteres de md5
+        assert len(keys[0].rsplit(":", 1)[1]) == 32
+
+
+@pytest.mark.skipif(fakeredis is None, reason="requiere fakeredis")
+class TestBeautyCacheMetrics:
+
+    @pytest.fixture
+    def metrics(self):
+        from prometheus_client import CollectorRegistry
+        from app.cache.metrics import CacheMetrics
+
+        manager = MagicMock()
+        manager.redis_client = fakeredis.FakeRedis()
+        # fakeredis no implementa INFO
+        manager.redis_client.info = MagicMock(return_value={'keyspace_hits': 0, 'keyspace_misses': 0})
+        manager.async_redis_client = None
+        return CacheMetrics(manager, flush_interval=60, registry=CollectorRegistry())
+
+    def test_registrar_accesos_no_hace_io_y_flush_usa_un_pipeline(self, metrics):
+        """Los hits/misses se acumulan en memoria y se envían juntos al hacer flush."""
+        client = metrics.manager.redis_client
+        for _ in range(3):
+            metrics.record('catalogo_servicios', 'catalogo_', True, 0.002, 400)
+        metrics.record('catalogo_servicios', 'catalogo_', False, 0.004)
+        metrics.track_cache_miss("beauty_:citas_:x", ttl_type='citas_disponibles', key_prefix='citas_')
+        assert client.dbsize() == 0
+
+        with patch.object(client, 'pipeline', wraps=client.pipeline) as pipeline:
+            assert metrics.flush() == 2
+        pipeline.assert_called_once()
+        assert metrics.flush() == 0
+
+        local = metrics.get_namespace_stats()['catalogo_servicios:catalogo_']
+        assert local['hit_ratio'] == 0.75
+        assert local['avg_payload_bytes'] == 400
+        assert local['avg_latency_ms'] == 2.5
+
+        stats = metrics.get_cache_stats()
+        assert stats['namespaces_global']['catalogo_servicios:catalogo_']['hits'] == 3
+        assert stats['namespaces_global']['citas_disponibles:citas_']['misses'] == 1
+        assert metrics.requests.labels(ttl_type='catalogo_servicios', key_prefix='catalogo_',
+                                       result='hit')._value.get() == 3
+
+    def test_flush_fallido_conserva_los_deltas(self, metrics):
+        metrics.record('configuracion_clinica', 'clinica_', True, 0.001, 50)
+        with patch.object(metrics.manager.redis_client, 'pipeline', side_effect=ConnectionError("sin redis")):
+            assert metrics.flush() == 0
+        assert metrics.flush_stats['flush_errors'] == 1
+        assert metrics.flush() == 1
+        assert metrics.get_cache_stats()['namespaces_global']['configuracion_clinica:clinica_']['hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_decorador_registra_hit_con_tamano_del_payload(self, metrics):
+        from app.cache import cache_decorators
+        from app.cache.redis_config import last_payload_size
+
+        @cache_result(ttl_type='catalogo_servicios', key_prefix='catalogo_')
+        async def mock_get_catalogo_db():
+            return [{"id": 1, "nombre": "Peeling Químico"}]
+
+        async def aget_cache(key, ttl_type):
+            last_payload_size.set(128)
+            return [{"id": 1, "nombre": "Peeling Químico"}]
+
+        manager = MagicMock()
+        manager.aget_cache = AsyncMock(side_effect=aget_cache)
+        with patch.object(cache_decorators, 'cache_manager', manager), \
+                patch.object(cache_decorators, 'cache_metrics', metrics):
+            await mock_get_catalogo_db()
+
+        stats = metrics.get_namespace_stats()['catalogo_servicios:catalogo_']
+        assert stats['hits'] == 1
+        assert stats['avg_payload_bytes'] == 128
+
+
+@pytest.mark.skipif(fakeredis is None, reason="requiere fakeredis")
+class TestBeautyCacheWarmup:
+
+    @pytest.fixture
+    def manager(self):
+        manager = DomainCacheConfig("beauty_", l1_enabled=False)
+        manager.redis_client = fakeredis.FakeRedis()
+        manager.async_redis_client = fakeredis.FakeAsyncRedis()
+        return manager
+
+    @pytest.mark.asyncio
+    async def test_refresh_guarda_sin_leer_el_cache(self):
+        from app.cache import cache_decorators
+
+        @cache_result(ttl_type='catalogo_servicios', key_prefix='catalogo_')
+        async def mock_get_catalogo_db():
+            return [{"id": 30, "nombre": "Depilación Láser"}]
+
+        manager = MagicMock()
+        manager.aget_cache = AsyncMock(return_value=None)
+        manager.aset_cache = AsyncMock(return_value=True)
+        with patch.object(cache_decorators, 'cache_manager', manager):
+            assert await mock_get_catalogo_db.refresh() == [{"id": 30, "nombre": "Depilación Láser"}]
+        manager.aget_cache.assert_not_called()
+        manager.aset_cache.assert_awaited_once()
+
+    def test_cadencia_derivada_del_ttl(self, manager):
+        from app.cache.domain_estrategies import CacheWarmupScheduler, WarmupJob
+        from app.routers.beauty_optimized import get_catalogo_tratamientos, get_citas_disponibles
+
+        scheduler = CacheWarmupScheduler(manager, refresh_ratio=0.8, jitter=0.1)
+        catalogo = WarmupJob('catalogo_tratamientos', get_catalogo_tratamientos)
+        citas = WarmupJob('citas_disponibles', get_citas_disponibles)
+        assert scheduler.interval(catalogo) == 3600 * 0.8
+        # Con stale-while-revalidate se refresca antes del soft TTL (120 s)
+        assert scheduler.interval(citas) == 120 * 0.8
+        assert 96 * 0.9 <= scheduler._next_delay(citas) <= 96 * 1.1
+
+    @pytest.mark.asyncio
+    async def test_precalienta_disponibilidad_con_concurrencia_acotada(self, manager):
+        import asyncio
+        from app.cache.domain_estrategies import CacheWarmupScheduler, WarmupJob, availability_targets
+
+        activas = maximo = 0
+        llamadas = []
+
+        async def refresh(**kwargs):
+            nonlocal activas, maximo
+            activas += 1
+            maximo = max(maximo, activas)
+            await asyncio.sleep(0.001)
+            llamadas.append(kwargs)
+            activas -= 1
+
+        async def esteticistas():
+            return [1, 2, 3]
+
+        func = MagicMock(refresh=refresh, ttl_type='citas_disponibles', soft_ttl=120)
+        scheduler = CacheWarmupScheduler(manager, concurrency=2)
+        job = WarmupJob('citas_disponibles', func, availability_targets(esteticistas, days=7))
+        assert await scheduler.warm(job) == 21
+        assert maximo == 2
+        assert {call['esteticista_id'] for call in llamadas} == {1, 2, 3}
+        assert len({call['fecha'] for call in llamadas}) == 7
+
+        # Otro worker en el mismo ciclo no repite el precalentamiento
+        otro_worker = CacheWarmupScheduler(manager, concurrency=2)
+        assert await otro_worker.warm(job) == 0
+        assert otro_worker.stats['skipped_leases'] == 1
+
+    @pytest.mark.asyncio
+    async def test_primer_request_tras_arrancar_no_consulta_la_bd(self, manager):
+        from app.cache import cache_decorators
+        from app.cache.domain_estrategies import CacheWarmupScheduler, WarmupJob
+        from app.cache.single_flight import SingleFlight
+
+        consultas = 0
+
+        @cache_result(ttl_type='configuracion_clinica', key_prefix='clinica_')
+        async def mock_get_configuracion_db():
+            nonlocal consultas
+            consultas += 1
+            return {"horario_apertura": "09:00"}
+
+        scheduler = CacheWarmupScheduler(manager)
+        scheduler.add_job(WarmupJob('configuracion_clinica', mock_get_configuracion_db))
+        with patch.object(cache_decorators, 'cache_manager', manager), \
+                patch.object(cache_decorators, 'single_flight_group', SingleFlight(manager)):
+            await scheduler.start(startup_timeout=5)
+            try:
+                assert await mock_get_configuracion_db() == {"horario_apertura": "09:00"}
+            finally:
+                await scheduler.stop()
+        assert consultas == 1
+
+
+    @pytest.mark.asyncio
+    async def test_arranque_no_bloquea_por_defecto(self, manager, monkeypatch):
+        from app.cache import cache_decorators
+        from app.cache.domain_estrategies import CacheWarmupScheduler, WarmupJob
+
+        liberar = asyncio.Event()
+        precalentado = asyncio.Event()
+
+        @cache_result(ttl_type='configuracion_clinica', key_prefix='clinica_')
+        async def mock_get_configuracion_lenta():
+            await liberar.wait()
+            precalentado.set()
+            return {"horario_apertura": "09:00"}
+
+        scheduler = CacheWarmupScheduler(manager)
+        scheduler.add_job(WarmupJob('configuracion_clinica', mock_get_configuracion_lenta))
+        monkeypatch.delenv('CACHE_WARMUP_STARTUP_TIMEOUT', raising=False)
+        with patch.object(cache_decorators, 'cache_manager', manager):
+            await asyncio.wait_for(scheduler.start(), 1)
+            try:
+                # El arranque no espera a la BD: el precalentamiento sigue en segundo plano
+                assert not precalentado.is_set()
+                liberar.set()
+                await asyncio.wait_for(precalentado.wait(), 1)
+            finally:
+                await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_sin_tabla_de_esteticistas_no_hay_entradas(self, capsys, monkeypatch):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app import dependencies
+        from app.cache.domain_estrategies import get_active_esteticista_ids
+
+        engine = create_engine("sqlite://")
+        monkeypatch.delenv('CACHE_WARMUP_ESTETICISTAS', raising=False)
+        with patch.object(dependencies, 'SessionLocal', sessionmaker(bind=engine)):
+            assert await get_active_esteticista_ids() == []
+        assert "Error" not in capsys.readouterr().out
+
+class TestBeautyHotKeys:
+
+    def test_sketch_estima_frecuencias_y_envejece(self):
+        from app.cache.hot_keys import CountMinSketch
+
+        sketch = CountMinSketch(width=1024, depth=4, sample_size=10_000)
+        for _ in range(40):
+            sketch.increment("beauty_:data:catalogo_:general")
+        for i in range(500):
+            sketch.increment(f"beauty_:data:citas_:{i}")
+        assert sketch.estimate("beauty_:data:catalogo_:general") >= 40
+        assert sketch.estimate("beauty_:data:citas_:7") <= 3
+        assert sketch.estimate("beauty_:data:nunca_leida") <= 2
+
+        sketch._age()
+        assert 20 <= sketch.estimate("beauty_:data:catalogo_:general") <= 22
+
+    @pytest.fixture
+    def manager(self):
+        manager = DomainCacheConfig("beauty_", l1_enabled=True)
+        manager.redis_client = MagicMock()
+        manager.redis_client.get.return_value = None
+        # GET + PTTL en pipeline: la clave no existe
+        manager.redis_client.pipeline.return_value.execute.return_value = [None, -2]
+        return manager
+
+    def read(self, manager, key, ttl_type, times):
+        for _ in range(times):
+            manager.get_cache(key, ttl_type)
+
+    def test_ttl_adaptativo_dentro_de_los_limites(self, manager):
+        # Fría con menos de 2 lecturas previas (por defecto solo las claves nuevas tienen menos de 1)
+        manager.hot_keys.cold_threshold = 2
+        self.read(manager, "tratamientos_:10", 'detalle_tratamiento', 20)
+        self.read(manager, "tratamientos_:99", 'detalle_tratamiento', 2)
+
+        manager.set_cache("tratamientos_:10", {"id": 10}, 'detalle_tratamiento')
+        manager.set_cache("tratamientos_:99", {"id": 99}, 'detalle_tratamiento')
+        manager.set_cache("tratamientos_:50", {"id": 50}, 'detalle_tratamiento')
+        ttls = {call.args[0]: call.args[1] for call in manager.redis_client.setex.call_args_list}
+
+        assert ttls["beauty_:data:tratamientos_:10"] == 3600   # caliente: máximo del ttl_type
+        assert ttls["beauty_:data:tratamientos_:99"] == 120    # fría (una lectura previa): mínimo del ttl_type
+        assert ttls["beauty_:data:tratamientos_:50"] == 600    # nunca leída: TTL base
+        decisions = manager.get_admission_stats()['detalle_tratamiento']
+        assert decisions['ttl_extended'] == 1
+        assert decisions['ttl_shortened'] == 1
+        assert decisions['l1_rejected'] == 1
+
+    def test_primer_set_tras_un_miss_conserva_ttl_base_y_entra_en_l1(self, manager):
+        """La lectura que provocó el miss no clasifica la clave recién calculada como fría."""
+        configuracion = {"horario_apertura": "09:00", "horario_cierre": "20:00"}
+        assert manager.get_cache("clinica_:general", 'configuracion_clinica') is None
+        manager.set_cache("clinica_:general", configuracion, 'configuracion_clinica')
+
+        manager.redis_client.setex.assert_called_once()
+        assert manager.redis_client.setex.call_args.args[1] == 86400
+        manager.redis_client.pipeline.reset_mock()
+        assert manager.get_cache("clinica_:general", 'configuracion_clinica') == configuracion
+        manager.redis_client.pipeline.assert_not_called()
+        decisions = manager.get_admission_stats()['configuracion_clinica']
+        assert decisions == {'l1_admitted': 1, 'ttl_base': 1}
+
+    def test_segunda_lectura_no_se_considera_fria(self, manager):
+        """Una clave que empieza a reutilizarse conserva el TTL base y entra en el L1."""
+        tratamiento = {"id": 10, "nombre": "Limpieza Facial Profunda"}
+        self.read(manager, "tratamientos_:10", 'detalle_tratamiento', 2)
+        manager.set_cache("tratamientos_:10", tratamiento, 'detalle_tratamiento')
+
+        assert manager.redis_client.setex.call_args.args[1] == 600
+        assert manager.hot_keys.temperature(1) == 'warm'
+        assert "beauty_:data:tratamientos_:10" in manager.l1_cache._data
+        assert manager.get_admission_stats()['detalle_tratamiento'] == {'l1_admitted': 1, 'ttl_base': 1}
+
+    def test_clave_caliente_de_citas_se_promueve_al_l1_con_ttl_corto(self, manager):
+        import time
 
-        # Llamar a la función de invalidación
-        DomainCacheInvalidation.on_tratamiento_update(tratamiento_id)
+        self.read(manager, "citas_:2025-10-15", 'citas_disponibles', 20)
+        manager.set_cache("citas_:2025-10-15", [{"hora": "10:00"}], 'citas_disponibles')
+        manager.redis_client.pipeline.reset_mock()
 
-        # Verificar que se intentó borrar la clave específica del tratamiento
-        mock_redis_client.delete.assert_any_call(f"beauty_:data:tratamientos_:{tratamiento_id}:hash123")
-        # Verificar que también se intentó borrar el caché del catálogo
-        mock_redis_client.delete.assert_any_call(f"beauty_:data:catalogo_:general:hashABC")
\ No newline at end of file
+        assert manager.get_cache("citas_:2025-10-15", 'citas_disponibles') == [{"hora": "10:00"}]
+        manager.redis_client.pipeline.assert_not_called()
+        expires_at = manager.l1_cache._data["beauty_:data:citas_:2025-10-15"][0]
+        assert expires_at - time.monotonic() <= manager.hot_keys.hot_l1_ttl
+        assert manager.get_admission_stats()['citas_disponibles']['l1_promoted'] == 1
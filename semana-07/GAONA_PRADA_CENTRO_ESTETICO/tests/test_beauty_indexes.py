@@ -0,0 +1,65 @@
+# tests/test_beauty_indexes.py
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+from app.database.indexes import BEAUTY_INDEXES, BeautyDomainIndexes, IndexManager, IndexSpec
+
+SCHEMA = [
+    "CREATE TABLE beauty_esteticistas (id INTEGER PRIMARY KEY, nombre TEXT)",
+    "CREATE TABLE beauty_tratamientos (id INTEGER PRIMARY KEY, nombre_tratamiento TEXT, tipo_tratamiento TEXT, duracion_minutos INTEGER)",
+    "CREATE TABLE beauty_citas (id INTEGER PRIMARY KEY, tratamiento_id INTEGER, esteticista_id INTEGER, fecha_cita TEXT, hora_inicio TEXT, estado TEXT)",
+    "CREATE TABLE beauty_procedimientos (id INTEGER PRIMARY KEY, cita_id INTEGER, cliente_id INTEGER, fecha_procedimiento TEXT, observaciones TEXT)",
+]
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    return engine
+
+class TestBeautyIndexes:
+
+    def test_sql_por_dialecto(self):
+        spec = BEAUTY_INDEXES[0]
+        assert spec.create_sql('postgresql').startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS")
+        assert "CONCURRENTLY" not in spec.create_sql('sqlite')
+        assert spec.create_sql('sqlite').startswith("CREATE INDEX IF NOT EXISTS idx_beauty_citas_esteticista_fecha")
+        assert BeautyDomainIndexes.create_beauty_indexes()[0] == spec.create_sql('postgresql')
+
+    def test_aplica_indices_y_registra_el_estado(self, engine):
+        manager = IndexManager(engine)
+        assert {r['action'] for r in manager.apply(dry_run=True)} == {'pending'}
+        assert not inspect(engine).get_indexes('beauty_citas')
+
+        assert {r['action'] for r in manager.apply()} == {'created'}
+        assert {r['action'] for r in manager.apply()} == {'unchanged'}
+        status = manager.status()
+        assert all(row['exists'] and row['applied_at'] for row in status)
+        names = {index['name'] for index in inspect(engine).get_indexes('beauty_citas')}
+        assert {'idx_beauty_citas_esteticista_fecha', 'idx_beauty_citas_estado_fecha'} <= names
+
+    def test_recrea_indices_cuya_definicion_cambio(self, engine):
+        IndexManager(engine).apply()
+        modified = [IndexSpec("idx_beauty_citas_esteticista_fecha", "beauty_citas", ("esteticista_id", "fecha_cita", "estado"))]
+        manager = IndexManager(engine, modified)
+        assert manager.status()[0]['outdated']
+
+        result = manager.apply()[0]
+        assert result['action'] == 'created'
+        assert result['sql'][0].startswith("DROP INDEX")
+        columns = next(index['column_names'] for index in inspect(engine).get_indexes('beauty_citas')
+                       if index['name'] == "idx_beauty_citas_esteticista_fecha")
+        assert columns == ['esteticista_id', 'fecha_cita', 'estado']
+
+    def test_asesor_detecta_seq_scans_y_sugiere_indices(self, engine):
+        manager = IndexManager(engine)
+        findings = {finding['query']: finding for finding in manager.advise()}
+        assert findings['citas_disponibles']['table'] == 'beauty_citas'
+        assert findings['citas_disponibles']['suggestion'] == "aplicar idx_beauty_citas_esteticista_fecha (declarado y pendiente)"
+        assert findings['historial_cliente']['table'] == 'beauty_procedimientos'
+
+        manager.apply()
+        assert manager.advise() == []
+        assert "Ninguna consulta recorre tablas completas" in manager.report()
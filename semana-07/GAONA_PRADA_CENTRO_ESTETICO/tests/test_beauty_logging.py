@@ -0,0 +1,163 @@
+# tests/test_beauty_logging.py
+import asyncio
+import gzip
+import json
+import threading
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from app.middleware.domain_logger import DomainLogger
+from app.middleware.log_writer import AsyncLogWriter
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as log_file:
+        return [json.loads(line) for line in log_file]
+
+def blocked_writer(tmp_path, policy):
+    """Escritor cuyo hilo queda bloqueado para poder llenar el buffer"""
+    writer = AsyncLogWriter(str(tmp_path / "beauty.log"), capacity=3, batch_size=1, policy=policy, block_timeout=0.01)
+    gate = threading.Event()
+    original = writer._write_batch
+    writer._write_batch = lambda batch: (gate.wait(), original(batch))
+    writer.write("0")
+    writer.flush(timeout=0.05)  # el hilo toma "0" y se queda esperando
+    return writer, gate
+
+def test_lineas_estructuradas_con_una_serializacion(tmp_path):
+    writer = AsyncLogWriter(str(tmp_path / "beauty.log"))
+    logger = DomainLogger(None, "beauty_", writer=writer)
+    data = logger._serialize({"path": "/beauty_/historial/1", "entity_type": "cliente"})
+    logger._emit("REQUEST_START", "INFO", data)
+    logger._emit("REQUEST_END", "WARNING", data, ',"status_code":404,"process_time":0.002')
+    logger.close()
+
+    start, end = read_lines(tmp_path / "beauty.log")
+    assert start["event"] == "REQUEST_START" and start["path"] == "/beauty_/historial/1"
+    assert end["level"] == "WARNING" and end["status_code"] == 404 and end["entity_type"] == "cliente"
+    assert logger.get_log_stats()["written"] == 2
+
+def test_drop_newest_cuenta_descartes(tmp_path):
+    writer, gate = blocked_writer(tmp_path, 'drop_newest')
+    results = [writer.write(str(i)) for i in range(1, 6)]
+    assert results == [True, True, True, False, False]
+    assert writer.get_stats()["dropped"] == 2 and writer.queue_depth == 3
+    gate.set()
+    writer.close()
+    assert [line for line in (tmp_path / "beauty.log").read_text().split()] == ["0", "1", "2", "3"]
+
+def test_drop_oldest_conserva_lo_reciente(tmp_path):
+    writer, gate = blocked_writer(tmp_path, 'drop_oldest')
+    for i in range(1, 6):
+        writer.write(str(i))
+    gate.set()
+    writer.close()
+    assert (tmp_path / "beauty.log").read_text().split() == ["0", "3", "4", "5"]
+    assert writer.get_stats()["dropped"] == 2
+
+def test_block_aplica_backpressure_y_luego_descarta(tmp_path):
+    writer, gate = blocked_writer(tmp_path, 'block')
+    for i in range(1, 4):
+        writer.write(str(i))
+    assert writer.write("4") is False  # esperó block_timeout sin espacio
+    gate.set()
+    writer.close()
+    assert writer.get_stats()["dropped"] == 1
+
+@pytest.mark.asyncio
+async def test_block_no_detiene_el_event_loop(tmp_path):
+    writer, gate = blocked_writer(tmp_path, 'block')
+    writer.block_timeout = 0.2
+    for i in range(1, 4):
+        writer.write(str(i))
+
+    # En el hilo del event loop write no espera: descarta de inmediato
+    assert writer.write("4") is False
+
+    # awrite espera con asyncio: otra coroutine sigue avanzando mientras tanto
+    ticks = 0
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+    task = asyncio.create_task(ticker())
+    assert await writer.awrite("5") is False
+    task.cancel()
+    assert ticks >= 5 and writer.get_stats()["dropped"] == 2
+
+    # Con espacio disponible awrite encola cuando el escritor drena el buffer
+    pending = asyncio.create_task(writer.awrite("6"))
+    await asyncio.sleep(0.01)
+    gate.set()
+    assert await pending is True
+    writer.close()
+    assert (tmp_path / "beauty.log").read_text().split() == ["0", "1", "2", "3", "6"]
+
+def test_rotacion_comprime_con_gzip(tmp_path):
+    path = tmp_path / "beauty.log"
+    writer = AsyncLogWriter(str(path), batch_size=1, max_bytes=50, backup_count=2)
+    for i in range(12):
+        writer.write(f"linea de log numero {i:02d}")
+        writer.flush()
+    writer.close()
+
+    assert writer.get_stats()["rotations"] >= 2
+    assert (tmp_path / "beauty.log.1.gz").exists() and (tmp_path / "beauty.log.2.gz").exists()
+    assert not (tmp_path / "beauty.log.3.gz").exists()
+    with gzip.open(tmp_path / "beauty.log.1.gz", 'rt') as rotated:
+        assert "linea de log" in rotated.read()
+
+def build_sampled_app(tmp_path, random_value: float):
+    """App con DomainLogger cuyo muestreo de cabeza se controla con `random_value`"""
+    app = FastAPI()
+
+    @app.get("/beauty_/clientes/{cliente_id}/historial")
+    async def historial(cliente_id: int, status: int = 200):
+        return JSONResponse({"cliente_id": cliente_id}, status_code=status)
+
+    logger = DomainLogger(app, "beauty_", writer=AsyncLogWriter(str(tmp_path / "beauty.log")))
+    logger._random = lambda: random_value
+    return logger
+
+async def call(logger, path):
+    transport = httpx.ASGITransport(app=logger)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path)
+
+@pytest.mark.asyncio
+async def test_muestreo_de_cabeza_descarta_exitos(tmp_path):
+    logger = build_sampled_app(tmp_path, random_value=0.99)  # fuera de la tasa 0.05 de /historial
+    for i in range(5):
+        await call(logger, f"/beauty_/clientes/{i}/historial")
+    logger.close()
+
+    assert not (tmp_path / "beauty.log").exists() or read_lines(tmp_path / "beauty.log") == []
+    assert logger.get_log_stats()["sampled_out"] == 5
+
+@pytest.mark.asyncio
+async def test_muestreo_de_cola_conserva_errores_y_lentos(tmp_path):
+    logger = build_sampled_app(tmp_path, random_value=0.99)
+    logger.slow_threshold = 0.0  # todos cuentan como lentos
+    await call(logger, "/beauty_/clientes/1/historial")
+    logger.slow_threshold = 60.0
+    await call(logger, "/beauty_/clientes/2/historial?status=503")
+    logger.close()
+
+    start_slow, end_slow, start_error, end_error = read_lines(tmp_path / "beauty.log")
+    assert start_slow["event"] == "REQUEST_START" and start_slow["sample_reason"] == "slow"
+    assert end_slow["sampling"] == "tail" and end_slow["sample_rate"] == 0.05
+    assert end_error["sample_reason"] == "error" and end_error["status_code"] == 503
+    assert end_error["level"] == "CRITICAL"
+    stats = logger.get_log_stats()
+    assert stats["kept_slow"] == 1 and stats["kept_error"] == 1
+
+@pytest.mark.asyncio
+async def test_muestreo_de_cabeza_registra_la_decision(tmp_path):
+    logger = build_sampled_app(tmp_path, random_value=0.01)
+    await call(logger, "/beauty_/clientes/3/historial")
+    logger.close()
+
+    start, end = read_lines(tmp_path / "beauty.log")
+    assert start["sampling"] == end["sampling"] == "head"
+    assert end["status_code"] == 200 and logger.get_log_stats()["kept_head"] == 1
@@ -0,0 +1,48 @@
+# tests/test_beauty_metrics.py
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from prometheus_client import CollectorRegistry
+from monitoring.metricts import APIMetrics, OVERFLOW_ENDPOINT, UNMATCHED_ENDPOINT, route_template
+
+def sample(registry, name, **labels):
+    return registry.get_sample_value(name, labels) or 0
+
+def build_app(metrics: APIMetrics) -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        response = await call_next(request)
+        metrics.record_request(request.method, route_template(request), response.status_code, 0.01)
+        return response
+
+    @app.get("/beauty_/citas/{cita_id}")
+    async def cita(cita_id: int):
+        return {"id": cita_id}
+
+    return app
+
+@pytest.mark.asyncio
+async def test_etiqueta_es_la_plantilla_de_ruta():
+    registry = CollectorRegistry()
+    metrics = APIMetrics("beauty_clinic_api", "beauty", registry=registry)
+    transport = httpx.ASGITransport(app=build_app(metrics))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for cita_id in range(25):
+            await client.get(f"/beauty_/citas/{cita_id}")
+        await client.get("/beauty_/inexistente/9")
+
+    assert sample(registry, "beauty_requests_total", method="GET", endpoint="/beauty_/citas/{cita_id}", status="200") == 25
+    assert sample(registry, "beauty_requests_total", method="GET", endpoint=UNMATCHED_ENDPOINT, status="404") == 1
+    assert len(metrics._counter_children) == 2
+
+def test_cardinalidad_acotada_con_overflow():
+    registry = CollectorRegistry()
+    metrics = APIMetrics("beauty_clinic_api", "beauty", max_endpoints=3, registry=registry)
+    for i in range(10):
+        metrics.record_request("GET", f"/ruta_{i}", 200, 0.2)
+
+    assert sample(registry, "beauty_requests_total", method="GET", endpoint=OVERFLOW_ENDPOINT, status="200") == 7
+    assert sample(registry, "beauty_response_duration_seconds_count", method="GET", endpoint="/ruta_0") == 1
+    assert len(metrics._histogram_children) == 4  # 3 endpoints + overflow
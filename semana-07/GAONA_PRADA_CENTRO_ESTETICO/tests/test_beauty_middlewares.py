@@ -0,0 +1,166 @@
+# tests/test_beauty_middlewares.py
+from datetime import datetime
+from unittest.mock import patch
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.middleware import domain_validator
+from app.middleware.domain_logger import DomainLogger
+from app.middleware.domain_rate_limiter import DomainRateLimiter
+from app.middleware.domain_validator import DomainValidator
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+class MemoryWriter:
+    """Sustituto de AsyncLogWriter que guarda las líneas en memoria"""
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line: str) -> bool:
+        self.lines.append(line)
+        return True
+
+    async def awrite(self, line: str) -> bool:
+        return self.write(line)
+
+    def get_stats(self):
+        return {"written": len(self.lines)}
+
+    def close(self):
+        pass
+
+class FixedDatetime(datetime):
+    current = datetime(2025, 10, 15, 10, 0)  # miércoles, dentro del horario
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+def build_app(calls: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/beauty_/citas/book/{cita_id}")
+    async def book(cita_id: int):
+        calls.append(cita_id)
+        return {"id": cita_id}
+
+    @app.get("/beauty_/procedimientos/invasivos/{procedimiento_id}")
+    async def invasivo(procedimiento_id: int):
+        calls.append(procedimiento_id)
+        return {"id": procedimiento_id}
+
+    @app.get("/health")
+    async def health():
+        calls.append("health")
+        return {"status": "ok"}
+
+    return app
+
+async def get(asgi_app, path: str, headers=None) -> httpx.Response:
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+@pytest.fixture
+def rate_limited():
+    calls = []
+    middleware = DomainRateLimiter(build_app(calls), "beauty_", redis_client=fakeredis.FakeAsyncRedis(),
+                                   algorithm="sliding_log")
+    middleware.rate_limits["booking"] = {"requests": 2, "window": 60}
+    return middleware, calls
+
+class TestBeautyMiddlewares:
+
+    @pytest.mark.asyncio
+    async def test_scopes_no_http_pasan_sin_cambios(self):
+        received = []
+
+        async def inner(scope, receive, send):
+            received.append((scope, receive, send))
+
+        async def receive():
+            return {"type": "lifespan.startup"}
+
+        async def send(message):
+            pass
+
+        for middleware in (DomainLogger(inner, "beauty_", writer=MemoryWriter()),
+                           DomainRateLimiter(inner, "beauty_", redis_client=fakeredis.FakeAsyncRedis()),
+                           DomainValidator(inner, "beauty_")):
+            for scope in ({"type": "lifespan"}, {"type": "websocket", "path": "/beauty_/citas/book/1"}):
+                received.clear()
+                await middleware(scope, receive, send)
+                assert received == [(scope, receive, send)]
+
+    @pytest.mark.asyncio
+    async def test_rutas_fuera_del_dominio_no_pasan_por_los_middlewares(self, rate_limited):
+        middleware, calls = rate_limited
+        writer = MemoryWriter()
+        stack = DomainLogger(DomainValidator(middleware, "beauty_"), "beauty_", writer=writer)
+
+        for _ in range(5):
+            response = await get(stack, "/health")
+            assert response.status_code == 200
+            assert "x-ratelimit-limit" not in response.headers
+        assert calls == ["health"] * 5 and writer.lines == []
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_inyecta_cabeceras_y_responde_429(self, rate_limited):
+        middleware, calls = rate_limited
+
+        first = await get(middleware, "/beauty_/citas/book/1")
+        assert first.status_code == 200 and first.json() == {"id": 1}
+        assert first.headers["x-ratelimit-limit"] == "2"
+        assert first.headers["x-ratelimit-remaining"] == "1"
+        assert first.headers["x-ratelimit-reset"] == "60"
+
+        await get(middleware, "/beauty_/citas/book/2")
+        rejected = await get(middleware, "/beauty_/citas/book/3")
+        assert rejected.status_code == 429
+        assert rejected.headers["retry-after"] == "60"
+        detail = rejected.json()["detail"]
+        assert detail["error"] == "Rate limit exceeded" and detail["category"] == "booking"
+        assert detail["limit"] == 2 and detail["window"] == 60 and detail["domain"] == "beauty_"
+        assert calls == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_validador_responde_antes_de_ejecutar_la_app(self):
+        calls = []
+        validator = DomainValidator(build_app(calls), "beauty_")
+        headers = {"X-Beauty-Cliente-ID": "7"}
+
+        with patch.object(domain_validator, "datetime", FixedDatetime):
+            missing = await get(validator, "/beauty_/citas/book/1")
+            assert missing.status_code == 400
+            assert missing.json()["detail"]["required_headers"] == ["X-Beauty-Cliente-ID"]
+
+            consent = await get(validator, "/beauty_/procedimientos/invasivos/4", headers=headers)
+            assert consent.status_code == 400
+            assert consent.json()["detail"]["error"] == "Procedimiento invasivo requiere consentimiento"
+
+            FixedDatetime.current = datetime(2025, 10, 15, 22, 0)
+            try:
+                closed = await get(validator, "/beauty_/citas/book/1", headers=headers)
+            finally:
+                FixedDatetime.current = datetime(2025, 10, 15, 10, 0)
+            assert closed.status_code == 403
+            assert closed.json()["detail"]["error"] == "Fuera de horario de atención"
+            assert calls == []
+
+            ok = await get(validator, "/beauty_/citas/book/1", headers=headers)
+            assert ok.status_code == 200 and calls == [1]
+
+    @pytest.mark.asyncio
+    async def test_logger_registra_el_estado_de_la_respuesta(self):
+        calls = []
+        writer = MemoryWriter()
+        logger = DomainLogger(build_app(calls), "beauty_", writer=writer)
+        logger.sampling_enabled = False
+
+        response = await get(logger, "/beauty_/citas/book/9")
+        assert response.status_code == 200 and calls == [9]
+        start, end = writer.lines
+        assert '"event":"REQUEST_START"' in start
+        assert '"event":"REQUEST_END"' in end and '"status_code":200' in end
@@ -0,0 +1,169 @@
+# tests/test_beauty_profiler.py
+import time
+import tracemalloc
+import pytest
+from unittest.mock import patch
+from monitoring.profiler import APIProfiler, ExecutionWindow
+
+def busy_loop(seconds: float):
+    """Trabajo de CPU para que el muestreador encuentre la pila"""
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+def build_profiler() -> APIProfiler:
+    profiler = APIProfiler(domain="beauty_", mode="sampling")
+    profiler.sampler.interval = 0.002
+
+    @profiler.profile_function("calcular_agenda")
+    async def calcular_agenda():
+        return busy_loop(0.15)
+
+    return profiler, calcular_agenda
+
+@pytest.mark.asyncio
+async def test_muestreo_inactivo_no_registra_pilas():
+    profiler, calcular_agenda = build_profiler()
+    await calcular_agenda()
+    assert profiler.export_flamegraph() == ""
+    assert profiler.get_profile_report("calcular_agenda")["sampled_calls"] == 0
+
+@pytest.mark.asyncio
+async def test_activacion_por_segundos_exporta_collapsed():
+    profiler, calcular_agenda = build_profiler()
+    profiler.activate_sampling(seconds=5)
+    await calcular_agenda()
+    profiler.sampler.stop()
+
+    lines = profiler.export_flamegraph("calcular_agenda").splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    frames = stack.split(";")
+    assert frames[0] == "calcular_agenda" and int(count) > 0
+    assert any(frame.startswith("busy_loop") for line in lines for frame in line.split(";"))
+
+@pytest.mark.asyncio
+async def test_uno_de_cada_k_requests():
+    profiler = APIProfiler(domain="beauty_", mode="sampling")
+    noop = profiler.profile_function("noop")(lambda: None)
+    profiler.activate_sampling(one_in=3)
+    sampled = []
+    for _ in range(6):
+        await noop()
+        sampled.append(profiler.get_profile_report("noop")["sampled_calls"])
+    profiler.sampler.stop()
+    assert sampled == [0, 0, 1, 1, 1, 2]
+
+def test_ventana_acotada_con_percentiles():
+    window = ExecutionWindow(size=100)
+    now = time.time()
+    for i in range(1, 251):
+        window.add(i / 1000, now)
+
+    summary = window.summary()
+    assert summary["calls"] == 250 and summary["window"] == 100
+    # Solo quedan las 100 últimas duraciones: 151..250 ms
+    assert summary["p50"] == 0.2 and summary["p95"] == 0.245 and summary["p99"] == 0.249
+    assert summary["max"] == 0.25 and summary["last"] == 0.25
+    # La tasa cuenta las 250 llamadas aunque el ring solo guarde 100 duraciones
+    assert summary["calls_per_second"] == round(250 / 60, 3)
+    assert len(window.durations) == 100
+
+def test_llamadas_por_segundo_sin_tope_del_ring():
+    window = ExecutionWindow(size=16, rate_window=60)
+    for second in range(120):
+        for _ in range(50):
+            window.add(0.001, 1000 + second)
+
+    # 50 llamadas/s sostenidas, muy por encima de size / rate_window
+    assert window.calls_per_second(now=1119) == 50.0
+    # Los segundos sin llamadas bajan la media
+    assert window.calls_per_second(now=1149) == 25.0
+    assert window.calls_per_second(now=1300) == 0.0
+
+@pytest.mark.asyncio
+async def test_funciones_calientes_acumuladas_entre_llamadas():
+    profiler = APIProfiler(domain="beauty_", mode="cprofile")
+    endpoint = profiler.profile_function("calcular_agenda")(lambda: busy_loop(0.01))
+    for _ in range(3):
+        await endpoint()
+
+    hot = profiler.get_hot_functions(top_n=5)
+    busy = next(entry for entry in hot if entry["function"].startswith("busy_loop"))
+    assert busy["calls"] == 3
+    assert profiler.get_profile_report()["calcular_agenda"]["calls"] == 3
+
+@pytest.mark.asyncio
+async def test_funciones_calientes_en_modo_muestreo():
+    profiler, calcular_agenda = build_profiler()
+    profiler.activate_sampling(seconds=5)
+    await calcular_agenda()
+    profiler.sampler.stop()
+
+    hot = profiler.get_hot_functions(top_n=3)
+    assert hot and hot[0]["self_samples"] > 0
+    assert any(entry["function"].startswith("busy_loop") and entry["inclusive_samples"] > 0
+               for entry in profiler.get_hot_functions(top_n=10))
+
+@pytest.mark.asyncio
+async def test_memoria_peak_net_y_lineas():
+    profiler = APIProfiler(domain="beauty_", mode="sampling")
+    retenidos = []
+
+    @profiler.profile_memory("historial_cliente", sample_every=1)
+    async def historial_cliente():
+        temporal = [bytes(1000) for _ in range(500)]   # ~0.5 MB liberado al terminar
+        retenidos.append(bytearray(200_000))             # 200 KB que sobreviven al request
+        return len(temporal)
+
+    await historial_cliente()
+    report = profiler.get_memory_report("historial_cliente")
+    assert report["samples"] == 1
+    assert report["peak_bytes_max"] >= 500 * 1000
+    assert 200_000 <= report["net_bytes_avg"] < 500 * 1000
+    assert report["top_lines"][0]["line"].startswith("test_beauty_profiler.py:")
+    assert "historial_cliente" in profiler.memory_profiles
+
+@pytest.mark.asyncio
+async def test_memoria_muestreada_uno_de_cada_k():
+    profiler = APIProfiler(domain="beauty_", mode="sampling")
+    endpoint = profiler.profile_memory("catalogo", sample_every=3)(lambda: [0] * 1000)
+    for _ in range(7):
+        await endpoint()
+    assert profiler.get_memory_report("catalogo")["samples"] == 2
+
+@pytest.mark.asyncio
+async def test_memoria_con_tracemalloc_ya_activo():
+    """Si tracemalloc ya estaba activo se resta la foto inicial y no se detiene al terminar"""
+    profiler = APIProfiler(domain="beauty_", mode="sampling")
+    retenidos = []
+    endpoint = profiler.profile_memory("agenda", sample_every=1)(lambda: retenidos.append(bytearray(300_000)))
+    tracemalloc.start()
+    try:
+        await endpoint()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    report = profiler.get_memory_report("agenda")
+    assert report["net_bytes_avg"] >= 300_000
+    assert report["top_lines"][0]["bytes"] >= 300_000
+
+def test_activacion_del_profiler_requiere_token_de_administracion():
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    with patch.object(main, "PROFILER_ADMIN_TOKEN", None):
+        assert client.post("/metrics-dashboard/profiler/activate").status_code == 404
+    with patch.object(main, "PROFILER_ADMIN_TOKEN", "secreto"), \
+            patch.object(main.profiler, "activate_sampling") as activate:
+        assert client.post("/metrics-dashboard/profiler/activate").status_code == 403
+        assert client.post("/metrics-dashboard/profiler/activate",
+                           headers={"X-Admin-Token": "otro"}).status_code == 403
+        activate.assert_not_called()
+        response = client.post("/metrics-dashboard/profiler/activate?seconds=5",
+                               headers={"X-Admin-Token": "secreto"})
+        assert response.status_code == 200
+        activate.assert_called_once_with(seconds=5, one_in=None)
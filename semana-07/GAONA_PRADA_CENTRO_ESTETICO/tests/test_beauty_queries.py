@@ -0,0 +1,46 @@
+# tests/test_beauty_queries.py
+from sqlalchemy import Integer, String, create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from app.database.optimized_queries import BEAUTY_STATEMENTS, BeautyOptimizedQueries
+from app.services.beauty_services import OptimizedBeautyService
+
+def build_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE beauty_tratamientos (id INTEGER PRIMARY KEY, nombre_tratamiento TEXT)"))
+        connection.execute(text("CREATE TABLE beauty_citas (id INTEGER PRIMARY KEY, tratamiento_id INTEGER, esteticista_id INTEGER, "
+                                "fecha_cita TEXT, hora_inicio TEXT, estado TEXT)"))
+        connection.execute(text("INSERT INTO beauty_tratamientos VALUES (10, 'Limpieza Facial Profunda')"))
+        connection.execute(text("INSERT INTO beauty_citas VALUES (1, 10, 3, '2025-01-10', '11:30', 'disponible'), "
+                                "(2, 10, 3, '2025-01-10', '10:00', 'disponible'), (3, 10, 3, '2025-01-10', '12:00', 'completada')"))
+    return engine
+
+class TestBeautyQueryRegistry:
+
+    def test_registro_con_parametros_tipados(self):
+        statement = BeautyOptimizedQueries.get_statement('citas_disponibles')
+        assert statement is BEAUTY_STATEMENTS['citas_disponibles']
+        assert isinstance(statement._bindparams['esteticista_id'].type, Integer)
+        assert isinstance(statement._bindparams['fecha_cita'].type, String)
+        assert set(BEAUTY_STATEMENTS) == set(BeautyOptimizedQueries.get_queries_for_domain())
+
+    def test_resultados_como_mappings_y_tuplas(self):
+        engine = build_engine()
+        with Session(engine) as db:
+            service = OptimizedBeautyService(db)
+            citas = service.get_citas_disponibles("2025-01-10", 3)
+            assert [cita["hora_inicio"] for cita in citas] == ["10:00", "11:30"]
+            assert citas[0]["nombre_tratamiento"] == "Limpieza Facial Profunda"
+            tuplas = service.get_citas_disponibles("2025-01-10", 3, as_tuples=True)
+            assert tuplas[0].hora_inicio == "10:00"
+
+    def test_sentencia_se_compila_una_vez_por_dialecto(self):
+        engine = build_engine()
+        with Session(engine) as db:
+            service = OptimizedBeautyService(db)
+            service.get_citas_disponibles("2025-01-10", 3)
+            compiled_entries = len(engine._compiled_cache)
+            for esteticista_id in range(5):
+                OptimizedBeautyService(db).get_citas_disponibles("2025-01-11", esteticista_id)
+            assert len(engine._compiled_cache) == compiled_entries
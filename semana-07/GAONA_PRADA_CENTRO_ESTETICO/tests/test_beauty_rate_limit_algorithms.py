@@ -0,0 +1,101 @@
+# tests/test_beauty_rate_limit_algorithms.py
+import pytest
+from app.middleware.rate_limit_algorithms import RedisRateLimiter
+
+# Redis en memoria con soporte de scripts Lua
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+KEY = "beauty_:rate_limit:availability:10.0.0.1"
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def build_limiter(algorithm: str, now: float, is_async_client: bool = True):
+    clock = FakeClock(now)
+    client = fakeredis.FakeAsyncRedis() if is_async_client else fakeredis.FakeRedis()
+    return RedisRateLimiter(client, algorithm, is_async_client=is_async_client, clock=clock), clock, client
+
+class TestBeautyRateLimitAlgorithms:
+
+    def test_algoritmo_desconocido(self):
+        with pytest.raises(ValueError):
+            RedisRateLimiter(fakeredis.FakeAsyncRedis(), 'leaky_bucket')
+
+    @pytest.mark.asyncio
+    async def test_sliding_log_mismo_milisegundo_y_limite(self):
+        """Requests en el mismo milisegundo cuentan por separado y el limit+1 se rechaza."""
+        limiter, clock, client = build_limiter('sliding_log', 1000.0)
+
+        results = [await limiter.hit(KEY, 3, 60) for _ in range(4)]
+
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert [r.remaining for r in results] == [2, 1, 0, 0]
+        assert await client.zcard(KEY) == 3  # ningún miembro se colapsó
+        assert results[2].reset_after == 60.0
+        assert results[2].headers() == {"X-RateLimit-Limit": "3", "X-RateLimit-Remaining": "0",
+                                        "X-RateLimit-Reset": "60"}
+        assert results[3].headers()["Retry-After"] == "60"
+
+    @pytest.mark.asyncio
+    async def test_sliding_log_cambio_de_ventana(self):
+        limiter, clock, _ = build_limiter('sliding_log', 1000.0)
+        for _ in range(3):
+            await limiter.hit(KEY, 3, 60)
+
+        # A mitad de ventana sigue lleno; el reset es lo que falta para que salga el más antiguo
+        clock.now = 1030.0
+        rejected = await limiter.hit(KEY, 3, 60)
+        assert not rejected.allowed and rejected.reset_after == 30.0
+        assert rejected.headers()["Retry-After"] == "30"
+
+        # Cuando el más antiguo sale de la ventana vuelve a haber cupo
+        clock.now = 1060.0
+        allowed = await limiter.hit(KEY, 3, 60)
+        assert allowed.allowed and allowed.remaining == 2
+
+    @pytest.mark.asyncio
+    async def test_sliding_window_limite_y_cambio_de_ventana(self):
+        limiter, clock, _ = build_limiter('sliding_window', 1200.0)
+
+        results = [await limiter.hit(KEY, 4, 60) for _ in range(5)]
+        assert [r.allowed for r in results] == [True, True, True, True, False]
+        assert [r.remaining for r in results] == [3, 2, 1, 0, 0]
+        assert results[4].reset_after == 60.0
+        assert results[4].headers() == {"X-RateLimit-Limit": "4", "X-RateLimit-Remaining": "0",
+                                        "X-RateLimit-Reset": "60", "Retry-After": "60"}
+
+        # 15 s en la ventana siguiente: la anterior pesa 45/60 -> 4 * 0.75 = 3 estimados
+        clock.now = 1275.0
+        rollover = await limiter.hit(KEY, 4, 60)
+        assert rollover.allowed and rollover.remaining == 0
+        assert rollover.reset_after == 45.0
+        assert not (await limiter.hit(KEY, 4, 60)).allowed
+
+    @pytest.mark.asyncio
+    async def test_gcra_espaciado_y_retry_after(self):
+        """2 requests por minuto: ráfaga de 2 y después un request cada 30 s."""
+        limiter, clock, _ = build_limiter('gcra', 1000.0)
+
+        first, second, third = [await limiter.hit(KEY, 2, 60) for _ in range(3)]
+        assert (first.allowed, first.remaining, first.reset_after) == (True, 1, 30.0)
+        assert (second.allowed, second.remaining, second.reset_after) == (True, 0, 60.0)
+        assert (third.allowed, third.remaining, third.reset_after) == (False, 0, 30.0)
+        assert third.headers() == {"X-RateLimit-Limit": "2", "X-RateLimit-Remaining": "0",
+                                   "X-RateLimit-Reset": "30", "Retry-After": "30"}
+
+        clock.now = 1029.999
+        assert not (await limiter.hit(KEY, 2, 60)).allowed
+        clock.now = 1030.0
+        assert (await limiter.hit(KEY, 2, 60)).allowed
+
+    @pytest.mark.asyncio
+    async def test_cliente_sincrono_en_un_hilo(self):
+        limiter, _, client = build_limiter('sliding_log', 1000.0, is_async_client=False)
+        results = [await limiter.hit(KEY, 2, 60) for _ in range(3)]
+        assert [r.allowed for r in results] == [True, True, False]
+        assert client.zcard(KEY) == 2
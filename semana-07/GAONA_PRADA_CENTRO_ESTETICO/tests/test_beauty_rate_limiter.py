@@ -0,0 +1,114 @@
+# tests/test_beauty_rate_limiter.py
+import pytest
+from app.middleware.local_rate_limiter import LeasedRateLimiter
+
+# Redis en memoria con soporte de scripts Lua para simular varios workers
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def build_workers(redis_client, clock, workers: int = 4, max_over_admission: float = 0.05):
+    return [
+        LeasedRateLimiter(redis_client, max_over_admission=max_over_admission, expected_workers=workers,
+                          lease_ttl=1.0, reconcile_interval=5.0, clock=clock)
+        for _ in range(workers)
+    ]
+
+async def send_requests(limiters, total: int, key: str = "beauty_:rate_limit:availability:10.0.0.1") -> int:
+    """Reparte `total` requests en round robin entre los workers y devuelve cuántos se admiten"""
+    allowed = 0
+    for i in range(total):
+        result = await limiters[i % len(limiters)].hit(key, 400, 60)
+        allowed += result.allowed
+    return allowed
+
+class TestBeautyLocalRateLimiter:
+
+    @pytest.mark.asyncio
+    async def test_respeta_limite_global_con_pocas_llamadas_a_redis(self):
+        """400 req/min de disponibilidad entre 4 workers, casi sin round trips a Redis."""
+        clock = FakeClock(120.0)
+        limiters = build_workers(fakeredis.FakeAsyncRedis(), clock)
+
+        allowed = await send_requests(limiters, 2000)
+
+        assert allowed == 400
+        leases = sum(limiter.stats['leases'] for limiter in limiters)
+        local_hits = sum(limiter.stats['local_hits'] for limiter in limiters)
+        assert local_hits > 3 * leases
+
+    @pytest.mark.asyncio
+    async def test_sobre_admision_acotada_en_cambio_de_ventana(self):
+        """Los tokens sobrantes al cambiar de ventana no superan el error configurado."""
+        max_over_admission = 0.05
+        clock = FakeClock(179.5)
+        limiters = build_workers(fakeredis.FakeAsyncRedis(), clock, max_over_admission=max_over_admission)
+
+        # Final de una ventana: los workers quedan con tokens locales sin gastar
+        await send_requests(limiters, 390)
+        leftover = sum(limiter._buckets[next(iter(limiter._buckets))].tokens for limiter in limiters)
+        assert leftover > 0
+
+        # Nueva ventana con los leases todavía vigentes
+        clock.now = 180.2
+        allowed_next_window = await send_requests(limiters, 1000)
+
+        measured_error = (allowed_next_window - 400) / 400
+        assert 0 < measured_error <= max_over_admission
+
+    @pytest.mark.asyncio
+    async def test_reconciliacion_devuelve_tokens_no_usados(self):
+        """Los tokens de leases expirados se devuelven al cupo global."""
+        redis_client = fakeredis.FakeAsyncRedis()
+        clock = FakeClock(240.0)
+        limiter = build_workers(redis_client, clock, workers=1)[0]
+        key = "beauty_:rate_limit:availability:10.0.0.2"
+
+        await limiter.hit(key, 400, 60)
+        assert int(await redis_client.get(f"{key}:4")) == limiter.lease_size(400)
+
+        clock.now = 246.0
+        await limiter.reconcile()
+        assert limiter.stats['tokens_returned'] == limiter.lease_size(400) - 1
+        assert int(await redis_client.get(f"{key}:4")) == 1
+
+    @pytest.mark.asyncio
+    async def test_reconciliacion_no_recrea_ventanas_expiradas(self):
+        """Si la ventana ya expiró en Redis no se crea una clave negativa sin TTL."""
+        redis_client = fakeredis.FakeAsyncRedis()
+        clock = FakeClock(300.0)
+        limiter = build_workers(redis_client, clock, workers=1)[0]
+        vigente, expirada = "beauty_:rate_limit:availability:10.0.0.3", "beauty_:rate_limit:availability:10.0.0.4"
+
+        await limiter.hit(vigente, 400, 60)
+        await limiter.hit(expirada, 400, 60)
+        await redis_client.delete(f"{expirada}:5")
+
+        clock.now = 306.0
+        await limiter.reconcile()
+        assert await redis_client.exists(f"{expirada}:5") == 0
+        assert int(await redis_client.get(f"{vigente}:5")) == 1
+        assert await redis_client.pttl(f"{vigente}:5") > 0
+        assert limiter.stats['tokens_returned'] == limiter.lease_size(400) - 1
+
+    @pytest.mark.asyncio
+    async def test_hit_reconcilia_en_segundo_plano(self):
+        """El request que dispara la reconciliación no espera la devolución de tokens."""
+        redis_client = fakeredis.FakeAsyncRedis()
+        clock = FakeClock(360.0)
+        limiter = build_workers(redis_client, clock, workers=1)[0]
+        key = "beauty_:rate_limit:availability:10.0.0.5"
+
+        await limiter.hit(key, 400, 60)
+        clock.now = 366.0
+        await limiter.hit("beauty_:rate_limit:availability:10.0.0.6", 400, 60)
+        assert limiter._reconcile_task is not None and key not in limiter._buckets
+
+        await limiter._reconcile_task
+        assert int(await redis_client.get(f"{key}:6")) == 1
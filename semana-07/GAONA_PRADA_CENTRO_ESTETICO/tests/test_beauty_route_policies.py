@@ -0,0 +1,41 @@
+# tests/test_beauty_route_policies.py
+import random
+from app.middleware.route_policies import DOMAIN_ROUTE_PATTERNS, PatternTrie, RoutePolicyMatcher, get_route_policy_matcher
+
+def test_trie_encuentra_patrones_solapados():
+    """Aho-Corasick debe reportar patrones que se solapan o contienen entre sí"""
+    trie = PatternTrie(["/citas", "/citas/book", "tas/bo", "/historial"])
+    assert trie.find_all("/beauty_/citas/book/3") == {0, 1, 2}
+    assert trie.find_all("/beauty_/clientes/9") == set()
+
+def test_politicas_beauty_conservan_prioridad():
+    """El primer patrón configurado gana, igual que los escaneos lineales anteriores"""
+    matcher = RoutePolicyMatcher.for_domain("beauty_")
+    policy = matcher.resolve("/beauty_/admin/clientes/5/historial/precios")
+    assert policy.should_log and policy.log_level == "INFO"
+    assert policy.rate_limit_category == "history"
+
+    invasivo = matcher.resolve("/beauty_/procedimientos/invasivos/7")
+    assert invasivo.consent_required and not invasivo.restricted_days
+    assert matcher.resolve("/beauty_/servicios").rate_limit_category == "general"
+
+def test_matcher_equivale_a_busqueda_lineal():
+    """Con rutas aleatorias el resultado coincide con la semántica de subcadena original"""
+    config = DOMAIN_ROUTE_PATTERNS["beauty_"]
+    matcher = RoutePolicyMatcher.for_domain("beauty_")
+    fragments = ["/citas", "/book", "/disponibles", "/cancel", "/historial", "/admin", "/precios",
+                 "/procedimientos", "/invasivos", "/especializados", "/create", "/update", "/42"]
+    random.seed(11)
+    for _ in range(500):
+        path = "/beauty_" + "".join(random.choices(fragments, k=4))
+        policy = matcher.resolve(path)
+        level = next((lvl for pattern, lvl in config["log_levels"].items() if pattern in path), None)
+        category = next((cat for pattern, cat in config["rate_limit_categories"] if pattern in path), "general")
+        assert policy.should_log == (level is not None)
+        assert policy.log_level == (level or "INFO")
+        assert policy.rate_limit_category == category
+        assert policy.consent_required == any(p in path for p in config["consent_required"])
+        assert policy.restricted_days == any(p in path for p in config["restricted_days"])
+
+def test_matcher_compartido_por_dominio():
+    assert get_route_policy_matcher("beauty_") is get_route_policy_matcher("beauty_")
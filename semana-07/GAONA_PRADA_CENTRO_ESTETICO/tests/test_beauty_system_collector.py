@@ -0,0 +1,46 @@
+# tests/test_beauty_system_collector.py
+import asyncio
+import gc
+import time
+from unittest.mock import MagicMock
+import pytest
+from prometheus_client import CollectorRegistry
+from monitoring.metricts import APIMetrics
+from monitoring.system_collector import SystemMetricsCollector
+
+def build_collector(**options):
+    registry = CollectorRegistry()
+    metrics = APIMetrics("beauty_clinic_api", "beauty", registry=registry)
+    alert_manager = MagicMock()
+    collector = SystemMetricsCollector(metrics, alert_manager, interval=3600, **options)
+    return collector, alert_manager, registry
+
+@pytest.mark.asyncio
+async def test_muestra_actualiza_gauges_y_alertas():
+    collector, alert_manager, registry = build_collector()
+    collector.sources.append(lambda: {"citas_pendientes": 12})
+    sample = await collector.collect_once()
+
+    assert sample["process_rss"] > 0 and sample["open_fds"] > 0
+    assert sample["citas_pendientes"] == 12
+    assert registry.get_sample_value("beauty_process_rss_bytes") == sample["process_rss"]
+    alert_manager.check_alerts.assert_called_once_with(sample)
+
+@pytest.mark.asyncio
+async def test_lag_del_event_loop_y_pausas_de_gc():
+    collector, alert_manager, _ = build_collector(lag_interval=0.01)
+    await collector.start()
+    try:
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)  # bloquea el event loop
+        await asyncio.sleep(0.02)
+        gc.collect()
+        sample = await collector.collect_once()
+    finally:
+        await collector.stop()
+
+    assert sample["event_loop_lag"] >= 0.05
+    assert sample["gc_collections"] >= 1 and sample["gc_pause_max"] > 0
+    assert collector._on_gc not in gc.callbacks
+    # Los acumulados del intervalo se reinician tras cada muestra
+    assert collector._max_loop_lag < 0.05 and collector._gc_collections == 0